@@ -1,31 +1,58 @@
 import sys
+import csv
 import json
 import os
+import sqlite3
+import threading
+import time
+import itertools
+import string
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Single instance: hand the launch to a running CopyCat before loading Qt ---
+if __name__ == "__main__":
+    from copycat_core import launch_request, send_to_running_instance
+    LAUNCH_REQUEST, NEW_INSTANCE = launch_request(sys.argv[1:])
+    if not NEW_INSTANCE:
+        handed_off = send_to_running_instance(LAUNCH_REQUEST)
+        if handed_off is None:
+            print("CopyCat is running but did not answer; it will handle the request when it can.",
+                  file=sys.stderr)
+            sys.exit(1)
+        if handed_off:
+            sys.exit(0)
+
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QPushButton, QLabel, QLineEdit,
     QScrollArea, QGridLayout, QHBoxLayout, QVBoxLayout, QDialog, QFrame,
-    QSizePolicy, QCheckBox, QStyle, QGraphicsOpacityEffect, QMenu
+    QSizePolicy, QCheckBox, QStyle, QMenu, QProgressBar,
+    QInputDialog,
+    QTableView, QHeaderView, QStyledItemDelegate, QAbstractItemDelegate,
+    QAbstractItemView, QComboBox, QListView, QPlainTextEdit, QFileDialog
 )
 from PySide6.QtCore import (
-    Qt, QSize, Signal, QPropertyAnimation, QEasingCurve, QByteArray,
-    QStandardPaths, QMimeData
+    Qt, QSize, Signal, QEasingCurve, QByteArray,
+    QMimeData, QAbstractListModel, QModelIndex,
+    QPersistentModelIndex, QVariantAnimation, QRect, QRectF, QEvent,
+    QAbstractProxyModel, QTimer, QSettings, QObject, QAbstractNativeEventFilter,
+    QFileSystemWatcher, QBuffer, QIODevice, QUrl
 )
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
 from PySide6.QtGui import (
     QClipboard, QIcon, QIntValidator, QDrag, QPixmap, 
-    QPainter, QColor, QCursor
+    QPainter, QColor, QCursor, QFontMetrics, QPen, QTextLayout, QShortcut,
+    QKeySequence, QFont, QPalette, QImage, QTextDocumentFragment, QActionGroup
+)
+from copycat_perf import perf
+from copycat_core import (
+    app_data_dir, HISTORY_FILE, Sentence, SentenceColumn, contiguous_runs,
+    open_store, ClipboardHistory, ClipboardHistoryStore, SearchIndex, FrecencyIndex,
+    DEFAULT_LIBRARY, list_libraries, create_library, search_libraries,
+    TransferProgress, content_key, dedup_rows, iter_import, export_texts, instance_server_name,
+    UndoStack, UndoCommand, BlobStore, make_payload, payload_formats, THUMBNAILS_DIR,
+    SORT_ORDERS, UsageStats, TemplateCache, compile_template, DEFAULT_THEME, list_themes, load_theme
 )
-
-# --- Global constant for the save file ---
-# (Unchanged)
-app_data_dir = QStandardPaths.writableLocation(QStandardPaths.StandardLocation.AppDataLocation)
-app_data_dir = os.path.join(app_data_dir, "CopyCat") 
-if not os.path.exists(app_data_dir):
-    try:
-        os.makedirs(app_data_dir)
-    except OSError as e:
-        print(f"Error creating AppData directory: {e}")
-DATA_FILE = os.path.join(app_data_dir, "sentences.json")
-print(f"Data file location: {DATA_FILE}")
 
 # --- (Unchanged)
 def resource_path(relative_path):
@@ -36,170 +63,1577 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-# --- 1. Custom Widget for each Sentence Card ---
-# <--- HEAVILY MODIFIED: REMOVED DRAG/DROP, ADDED BUTTONS --->
-class SentenceCard(QFrame):
-    delete_requested = Signal()
-    # --- NEW SIGNALS ---
-    move_up_requested = Signal()
-    move_down_requested = Signal()
-    switch_col_requested = Signal()
+# --- 1. Model/View for the Sentence Columns ---
+# <--- REPLACES SentenceCard: one model per column, one shared delegate --->
+# Each column is a table view over a flat list of Sentences. Nothing is built per
+# row any more; the delegate paints the card, its buttons and the copy flash
+# for the rows that are actually on screen.
+PAYLOAD_ROLE = Qt.ItemDataRole.UserRole + 1  # Sentence.payload, for the card's preview
+
+
+class SentenceListModel(QAbstractListModel):
+    text_edited = Signal(object, str)  # sentence, its full text before the edit
+    # Above this many separate runs a removal resets the view instead of
+    # notifying it run by run
+    MAX_REMOVE_RUNS = 64
+
+    def __init__(self, column_index=0, parent=None, store=None):
+        super().__init__(parent)
+        self.column_index = column_index
+        self.items = SentenceColumn(column_index)
+        self.store = store  # edits go through store.set_text(), which splits off large texts
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.items)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self.items[index.row()].text
+        if role == PAYLOAD_ROLE:
+            return self.items[index.row()].payload
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or not index.isValid():
+            return False
+        text = str(value)
+        sentence = self.items[index.row()]
+        if text == sentence.text:
+            return False
+        if self.store is not None:
+            old_text = self.store.full_text(sentence)
+            self.store.set_text(sentence, text)
+        else:
+            old_text, sentence.text = sentence.text, text
+        self.dataChanged.emit(index, index, [Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole])
+        self.text_edited.emit(sentence, old_text)
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsEditable | Qt.ItemFlag.ItemIsSelectable
+
+    def sentence(self, row):
+        return self.items[row]
+
+    def sentences(self):
+        return list(self.items)
+
+    def texts(self):
+        return [s.text for s in self.items]
+
+    def row_of(self, sentence_id):
+        """Row of a sentence in this column, or -1. O(log n)."""
+        return self.items.row_of(sentence_id)
+
+    def ranked_rows(self, scores):
+        """Rows whose sentence id is in `scores`, highest score first and in
+        manual order between equal scores."""
+        if len(scores) < len(self.items) // 8:
+            hits = [(-score, row) for row, score in
+                    ((self.items.row_of(i), score) for i, score in scores.items()) if row >= 0]
+        else:
+            hits = [(-scores[s.id], row) for row, s in enumerate(self.items) if s.id in scores]
+        hits.sort()
+        return [row for _, row in hits]
+
+    def set_sentences(self, sentences):
+        """Replaces the whole column in one reset.
+
+        The sentences must already be sorted by position.
+        """
+        self.beginResetModel()
+        self.items.reset(sentences)
+        self.endResetModel()
+
+    def append_sentences(self, sentences):
+        """Appends a batch (already sorted by position) as one insert."""
+        if not sentences:
+            return
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(sentences) - 1)
+        self.items.extend(sentences)
+        self.endInsertRows()
+
+    def insert_sentence(self, row, sentence):
+        """Inserts at row (-1 = end). Returns the sentences whose stored
+        column/position changed (normally just the new one)."""
+        return self.insert_sentences(row, [sentence])
+
+    def insert_sentences(self, row, sentences):
+        """Inserts a block at row (-1 = end) as one insert."""
+        if not sentences:
+            return []
+        if row < 0 or row > len(self.items):
+            row = len(self.items)
+        self.beginInsertRows(QModelIndex(), row, row + len(sentences) - 1)
+        changed = self.items.insert(row, sentences)
+        self.endInsertRows()
+        return changed
+
+    def place_sentence(self, sentence):
+        """Inserts a sentence where its position puts it (see SentenceColumn.place)."""
+        row = self.items.insertion_row(sentence.position)
+        self.beginInsertRows(QModelIndex(), row, row)
+        changed = self.items.place(sentence)
+        self.endInsertRows()
+        return changed
+
+    def take_row(self, row):
+        return self.take_rows([row])[0]
+
+    def take_rows(self, rows):
+        """Removes the given rows (one remove per contiguous run) and
+        returns their sentences in row order."""
+        runs = contiguous_runs(rows)
+        if len(runs) > self.MAX_REMOVE_RUNS:
+            self.beginResetModel()
+            taken = self.items.remove_rows(rows)
+            self.endResetModel()
+            return taken
+        taken = []
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            taken[:0] = self.items.remove(first, last - first + 1)
+            self.endRemoveRows()
+        return taken
+
+    def move_row(self, source_row, target_row):
+        """Moves one row. Returns the sentences whose position changed."""
+        if source_row == target_row:
+            return []
+        if not (0 <= source_row < len(self.items) and 0 <= target_row < len(self.items)):
+            return []
+        # beginMoveRows wants the row the item lands *before*
+        destination = target_row + 1 if target_row > source_row else target_row
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row, QModelIndex(), destination):
+            return []
+        changed = self.items.move([source_row], target_row)
+        self.endMoveRows()
+        return changed
+
+    def move_rows(self, rows, target_row):
+        """Moves many rows as one block in a single layout change.
+
+        `target_row` is where the block starts once it has been taken out.
+        Returns the sentences whose position changed.
+        """
+        if not rows:
+            return []
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        persistent_ids = [self.items[index.row()].id for index in persistent]
+        changed = self.items.move(rows, target_row)
+        self.changePersistentIndexList(
+            persistent, [self.index(self.items.row_of(i)) for i in persistent_ids]
+        )
+        self.layoutChanged.emit()
+        return changed
+
+
+class SentenceFilterModel(QAbstractProxyModel):
+    """Search results for one column, best match first.
+
+    Only shown while a search is active; the view switches back to the plain
+    column model afterwards, so normal editing never goes through a proxy.
+
+    Source changes are followed right away: removed rows leave the results
+    and the others are renumbered, so the view never gets a stale row. New
+    rows only show up when the owner re-scores (set_rows) later.
+    """
+    def __init__(self, source, parent=None):
+        super().__init__(parent)
+        self._rows = []        # proxy row -> source row
+        self._proxy_rows = {}  # source row -> proxy row
+        self._ids = []         # sentence ids of _rows across a source layout change or reset
+        self.setSourceModel(source)
+        source.dataChanged.connect(self._on_source_data_changed)
+        source.rowsAboutToBeRemoved.connect(self._on_source_rows_about_to_be_removed)
+        source.rowsRemoved.connect(self._on_source_rows_removed)
+        source.rowsInserted.connect(self._on_source_rows_inserted)
+        source.rowsMoved.connect(self._on_source_rows_moved)
+        source.layoutAboutToBeChanged.connect(self._on_source_layout_about_to_change)
+        source.layoutChanged.connect(self._on_source_layout_changed)
+        source.modelAboutToBeReset.connect(self._on_source_about_to_reset)
+        source.modelReset.connect(self._on_source_reset)
+
+    def set_scores(self, scores):
+        self.set_rows(self.sourceModel().ranked_rows(scores))
+
+    def set_rows(self, rows):
+        """Shows the given source rows, in this order, in one reset (which
+        keeps the view's scroll position)."""
+        self.beginResetModel()
+        self._rows = rows
+        self._rows_changed()
+        self.endResetModel()
+
+    def _rows_changed(self):
+        self._proxy_rows = {row: proxy_row for proxy_row, row in enumerate(self._rows)}
+
+    # --- Following the source ---
+    def _on_source_data_changed(self, top_left, bottom_right, roles=()):
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            index = self.mapFromSource(self.sourceModel().index(row, 0))
+            if index.isValid():
+                self.dataChanged.emit(index, index, roles)
+
+    def _on_source_rows_about_to_be_removed(self, parent, first, last):
+        gone = [proxy_row for proxy_row, row in enumerate(self._rows) if first <= row <= last]
+        for proxy_first, proxy_last in reversed(contiguous_runs(gone)):
+            self.beginRemoveRows(QModelIndex(), proxy_first, proxy_last)
+            del self._rows[proxy_first:proxy_last + 1]
+            self._rows_changed()
+            self.endRemoveRows()
+
+    def _on_source_rows_removed(self, parent, first, last):
+        if self._rows:
+            count = last - first + 1
+            self._rows = [row - count if row > last else row for row in self._rows]
+            self._rows_changed()
+
+    def _on_source_rows_inserted(self, parent, first, last):
+        if self._rows:
+            count = last - first + 1
+            self._rows = [row + count if row >= first else row for row in self._rows]
+            self._rows_changed()
+
+    def _on_source_rows_moved(self, parent, start, end, destination_parent, destination):
+        # Rows start..end now sit before what was row `destination`
+        if not self._rows:
+            return
+        count = end - start + 1
+        new_start = destination if destination < start else destination - count
+
+        def moved(row):
+            if start <= row <= end:
+                return new_start + row - start
+            if destination > end and end < row < destination:
+                return row - count
+            if destination < start and destination <= row < start:
+                return row + count
+            return row
+        self._rows = [moved(row) for row in self._rows]
+        self._rows_changed()
+
+    def _on_source_layout_about_to_change(self, *args):
+        source = self.sourceModel()
+        self._ids = [source.sentence(row).id for row in self._rows]
+        self.layoutAboutToBeChanged.emit()
+
+    def _on_source_layout_changed(self, *args):
+        # The source only reorders, so every row is still there; the proxy
+        # rows keep their order, so persistent indexes stay put
+        source = self.sourceModel()
+        self._rows = [source.row_of(sentence_id) for sentence_id in self._ids]
+        self._ids = []
+        self._rows_changed()
+        self.layoutChanged.emit()
+
+    def _on_source_about_to_reset(self):
+        source = self.sourceModel()
+        self._ids = [source.sentence(row).id for row in self._rows]
+        self.beginResetModel()
+
+    def _on_source_reset(self):
+        source = self.sourceModel()
+        self._rows = [row for row in map(source.row_of, self._ids) if row >= 0]
+        self._ids = []
+        self._rows_changed()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 1
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or column != 0 or not 0 <= row < len(self._rows):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        return self.sourceModel().index(self._rows[proxy_index.row()], 0)
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = self._proxy_rows.get(source_index.row())
+        return QModelIndex() if row is None else self.createIndex(row, 0)
+
+
+class SentenceSortModel(SentenceFilterModel):
+    """Every row of one column in a sort order other than the manual one.
+
+    Shown in place of the column model while such an order is picked, the
+    same way search results are. Sorting only rebuilds this proxy's row
+    map: the column, its stored positions and the view stay as they are.
+    """
+    def __init__(self, source, parent=None):
+        super().__init__(source, parent)
+        self.order = "manual"
+
+    def sort_by(self, order):
+        self.order = order
+        self.set_rows(self.sourceModel().items.sorted_rows(order))
+
+    def _rows_changed(self):
+        # Every row is in here, so the source -> proxy map is built only
+        # when something asks for it (a flash, a selection)
+        self._proxy_rows = None
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        if self._proxy_rows is None:
+            self._proxy_rows = {row: proxy_row for proxy_row, row in enumerate(self._rows)}
+        return super().mapFromSource(source_index)
+
+
+class ClipboardHistoryModel(QAbstractListModel):
+    """Read-only view of a ClipboardHistory, most recent first.
+
+    The history is bounded (a few hundred rows), so every change is a reset.
+    """
+    def __init__(self, history=None, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self._entries = []
+
+    def set_history(self, history):
+        self.history = history
+        self.refresh()
+
+    def refresh(self):
+        self.beginResetModel()
+        self._entries = self.history.entries() if self.history is not None else []
+        self.endResetModel()
+
+    def entry(self, row):
+        return self._entries[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._entries):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self._entries[index.row()].text
+        return None
+
+
+def system_prefers_reduced_motion():
+    """The desktop's "show animations" switch, where it can be read cheaply (Windows)."""
+    if sys.platform != "win32":
+        return False
+    import ctypes
+    SPI_GETCLIENTAREAANIMATION = 0x1042
+    enabled = ctypes.c_int(1)
+    if not ctypes.windll.user32.SystemParametersInfoW(SPI_GETCLIENTAREAANIMATION, 0, ctypes.byref(enabled), 0):
+        return False
+    return not enabled.value
+
+
+class FeedbackLayer(QObject):
+    """The copy flash for the whole window: one animation, whichever view
+    and row it lands on.
+
+    Delegates ask opacity() while painting a row, so nothing exists per row.
+    A new flash moves the one in progress instead of stacking a second on
+    top. In reduced-motion mode the row is highlighted for a moment,
+    without fading.
+    """
+    DURATION_MS = 400
+    PEAK_OPACITY = 0.8
+    STILL_MS = 250  # reduced motion: how long the steady highlight stays
+    STILL_OPACITY = 0.35
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.reduced_motion = False
+        self._view = None
+        self._index = QPersistentModelIndex()
+        self._opacity = 0.0
+        self.animation = QVariantAnimation(self)
+        self.animation.setDuration(self.DURATION_MS)
+        self.animation.setStartValue(0.0)
+        self.animation.setKeyValueAt(0.1, self.PEAK_OPACITY)
+        self.animation.setEndValue(0.0)
+        self.animation.setEasingCurve(QEasingCurve.Type.InOutQuad)
+        self.animation.valueChanged.connect(self._set_opacity)
+        self._still_timer = QTimer(self)
+        self._still_timer.setSingleShot(True)
+        self._still_timer.setInterval(self.STILL_MS)
+        self._still_timer.timeout.connect(lambda: self._set_opacity(0.0))
+
+    def flash(self, view, index):
+        self.animation.stop()
+        self._still_timer.stop()
+        self._set_opacity(0.0) # Clear the previous row, in whatever view
+        self._view = view
+        self._index = QPersistentModelIndex(index)
+        if self.reduced_motion:
+            self._set_opacity(self.STILL_OPACITY)
+            self._still_timer.start()
+        else:
+            self.animation.start()
+
+    def opacity(self, index):
+        """How strongly to paint the flash over `index` (0: not at all)."""
+        if self._opacity > 0.0 and QModelIndex(self._index) == index:
+            return self._opacity
+        return 0.0
+
+    def _set_opacity(self, value):
+        self._opacity = float(value)
+        view = self._view
+        if view is not None and self._index.isValid():
+            view.viewport().update(view.visualRect(QModelIndex(self._index)))
+
+
+# --- Themes ---
+# The stylesheet for every theme; $names are the theme's colours (see
+# BUILTIN_THEMES). Sentence rows are not widgets, so none of this is
+# resolved per row: the delegates paint them from Theme.colors.
+STYLESHEET = string.Template("""
+        QMainWindow, QWidget {
+            background-color: $window; color: $text;
+            font-family: Inter, Segoe UI, sans-serif; font-size: 10pt;
+        }
+        QPushButton {
+            background-color: $button; color: $text;
+            border: 1px solid $border; border-radius: 8px;
+            padding: 8px 16px; font-weight: 500;
+        }
+        QPushButton:hover { background-color: $button_hover; }
+        QPushButton:pressed { background-color: $button_pressed; }
+        QPushButton#AddButton {
+            background-color: $accent; color: $accent_text; border: none;
+        }
+        QPushButton#AddButton:hover {
+            background-color: $accent_hover;
+        }
+        QCheckBox {
+            spacing: 8px; padding: 8px 0; color: $text;
+        }
+        QCheckBox::indicator { width: 20px; height: 20px; }
+        QProgressBar#LoadProgress {
+            background-color: $field; border: none; border-radius: 2px;
+        }
+        QProgressBar#LoadProgress::chunk { background-color: $accent; border-radius: 2px; }
+        QScrollArea { border: none; }
+        QScrollArea QWidget { background-color: transparent; }
+        QTableView#SentenceColumn { border: none; background-color: transparent; }
+        QLabel#PerfOverlay {
+            background-color: rgba(20, 20, 20, 220); color: #9FE870;
+            border: 1px solid #333333; border-radius: 6px; padding: 8px;
+        }
+        QLabel#HistoryLabel { color: $muted_text; font-weight: bold; padding: 0px 4px 4px 4px; }
+        QWidget#QuickPalette { background-color: $popup; border: 1px solid $border; border-radius: 10px; }
+        QListView#PaletteResults { background-color: transparent; border: none; outline: none; }
+        QListView#PaletteResults::item { padding: 6px 8px; border-radius: 6px; }
+        QListView#PaletteResults::item:selected { background-color: $accent; color: $accent_text; }
+        QLabel#PaletteHint { color: $hint_text; font-size: 8pt; padding: 0px 4px; }
+
+        QScrollBar:vertical {
+            border: none; background-color: $window;
+            width: 10px; margin: 0px 0px 0px 0px;
+        }
+        QScrollBar::handle:vertical {
+            background-color: $scrollbar; border-radius: 5px;
+            min-height: 20px;
+        }
+
+        QLabel { background-color: transparent; color: $text; }
+        QLabel#PlaceholderLabel {
+            color: $placeholder_text; font-size: 14pt;
+        }
+
+        /* --- Text Input Fields --- */
+        QLineEdit {
+            background-color: $field; border: 1px solid $border;
+            border-radius: 8px; padding: 8px 12px;
+            font-size: 10pt; color: $text;
+        }
+        QLineEdit:focus { border: 1px solid $accent; }
+        QComboBox#LibrarySwitcher, QComboBox#SortSwitcher {
+            background-color: $field; border: 1px solid $border;
+            border-radius: 8px; padding: 7px 12px; min-width: 120px; color: $text;
+        }
+        QComboBox#LibrarySwitcher QAbstractItemView, QComboBox#SortSwitcher QAbstractItemView {
+            background-color: $field; selection-background-color: $accent;
+        }
+        QPushButton#NewLibraryButton, QPushButton#LibraryMenuButton { padding: 8px 12px; }
+        QPushButton#LibraryMenuButton::menu-indicator { width: 0px; }
+
+        /* --- Add Sentence Dialog --- */
+        QDialog#AddDialog { background-color: $window; }
+        QPlainTextEdit#DialogEntry {
+            background-color: $field; border: 1px solid $border;
+            border-radius: 8px; padding: 8px; font-size: 11pt; color: $text;
+        }
+        QPlainTextEdit#DialogEntry:focus { border: 1px solid $accent; }
+        QPushButton#DialogSaveButton {
+            background-color: $accent; color: $accent_text; border: none;
+            font-weight: 600; padding: 10px 20px;
+        }
+        QPushButton#DialogSaveButton:hover { background-color: $accent_hover; }
+        """)
+
+
+class Theme:
+    """A theme compiled once: QColors for the painted cards, a QPalette and
+    the stylesheet with its colours filled in.
+
+    Compiled themes are cached by name and colours, so switching back to a
+    theme (or re-picking an unchanged user theme) reuses all three; an
+    edited user theme file compiles again.
+    """
+    _compiled = {}
+
+    def __init__(self, name, colors):
+        self.name = name
+        self.colors = {key: QColor(value) for key, value in colors.items()}
+        self.stylesheet = STYLESHEET.substitute(colors)
+        self.palette = QPalette()
+        for role, key in ((QPalette.ColorRole.Window, "window"), (QPalette.ColorRole.Base, "field"),
+                          (QPalette.ColorRole.AlternateBase, "card"), (QPalette.ColorRole.Button, "button"),
+                          (QPalette.ColorRole.WindowText, "text"), (QPalette.ColorRole.Text, "text"),
+                          (QPalette.ColorRole.ButtonText, "text"), (QPalette.ColorRole.PlaceholderText, "hint_text"),
+                          (QPalette.ColorRole.Highlight, "accent"), (QPalette.ColorRole.HighlightedText, "accent_text"),
+                          (QPalette.ColorRole.ToolTipBase, "popup"), (QPalette.ColorRole.ToolTipText, "text")):
+            self.palette.setColor(role, self.colors[key])
+
+    @classmethod
+    def load(cls, name):
+        """The compiled theme `name` (see copycat_core.load_theme)."""
+        colors = load_theme(name)
+        key = (name, tuple(sorted(colors.items())))
+        theme = cls._compiled.get(key)
+        if theme is None:
+            with perf.span("theme.compile"):
+                theme = cls._compiled[key] = cls(name, colors)
+        return theme
+
+
+# --- Rich snippets (images, HTML, files) ---
+def rich_clipboard_formats(mime):
+    """(text, {mime type: bytes}) for clipboard content that is more than
+    plain text: an image, a list of files or HTML. None for plain text."""
+    formats = {}
+    if mime.hasImage():
+        image = QImage(mime.imageData())
+        if image.isNull():
+            return None
+        buffer = QBuffer()
+        buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+        image.save(buffer, "PNG")
+        formats["image/png"] = bytes(buffer.data())
+        text = mime.text() or f"Image {image.width()} × {image.height()}"
+    elif mime.hasUrls():
+        urls = mime.urls()
+        formats["text/uri-list"] = b"".join(bytes(url.toEncoded()) + b"\r\n" for url in urls)
+        text = "\n".join(url.toLocalFile() or url.toString() for url in urls)
+    elif mime.hasHtml():
+        formats["text/html"] = mime.html().encode("utf-8")
+        text = mime.text() or QTextDocumentFragment.fromHtml(mime.html()).toPlainText()
+    else:
+        return None
+    if mime.hasText() and mime.text():
+        formats["text/plain"] = mime.text().encode("utf-8")
+    return text, formats
+
+
+def mime_data_for(blobs, payload):
+    """A QMimeData holding a rich snippet's formats, read from `blobs` now."""
+    mime = QMimeData()
+    for mime_type, key in payload_formats(payload).items():
+        try:
+            data = blobs.get(key)
+        except (OSError, ValueError) as e:
+            print(f"Missing {mime_type} content: {e}")
+            continue
+        if mime_type == "image/png":
+            mime.setImageData(QImage.fromData(data, "PNG"))
+        elif mime_type == "text/uri-list":
+            mime.setUrls([QUrl.fromEncoded(QByteArray(line)) for line in data.split(b"\r\n") if line])
+        elif mime_type == "text/html":
+            mime.setHtml(data.decode("utf-8"))
+        elif mime_type == "text/plain":
+            mime.setText(data.decode("utf-8"))
+        else:
+            mime.setData(mime_type, QByteArray(data))
+    return mime
+
+
+class ThumbnailCache(QObject):
+    """Previews for image snippets, shared by every view.
+
+    Delegates call get() while painting; a miss hands the work to a small
+    pool of threads, which read the PNG cached in THUMBNAILS_DIR or make it
+    from the blob once. `ready` then repaints. Only rows that are painted
+    are ever thumbnailed, and while paused (a library is loading) the
+    requests just wait, so images never slow a load down.
+    """
+    ready = Signal(str)  # blob key
+    _loaded = Signal(str, object)  # blob key, QImage (from a worker thread)
+    SIZE = 128  # pixels, on disk; cards scale it down
+    MAX_PIXMAPS = 256
+
+    def __init__(self, blobs, parent=None):
+        super().__init__(parent)
+        self.blobs = blobs
+        self._pixmaps = OrderedDict()  # key -> QPixmap (null if it can't be read), LRU order
+        self._queued = set()
+        self._waiting = []  # asked for while paused
+        self.paused = False
+        self._pool = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1),
+                                        thread_name_prefix="CopyCatThumbnails")
+        self._loaded.connect(self._on_loaded)
+
+    def get(self, key):
+        """The thumbnail for blob `key`, or None until it has been made."""
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+            return None if pixmap.isNull() else pixmap
+        if key not in self._queued:
+            self._queued.add(key)
+            if self.paused:
+                self._waiting.append(key)
+            else:
+                self._pool.submit(self._load, key)
+        return None
+
+    def pause(self):
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+        waiting, self._waiting = self._waiting, []
+        for key in waiting:
+            self._pool.submit(self._load, key)
+
+    def _load(self, key):
+        # --- Runs in the pool ---
+        path = os.path.join(THUMBNAILS_DIR, f"{key}-{self.SIZE}.png")
+        image = QImage(path)
+        if image.isNull():
+            try:
+                image = QImage.fromData(self.blobs.get(key))
+            except (OSError, ValueError):
+                image = QImage()
+            if not image.isNull():
+                image = image.scaled(self.SIZE, self.SIZE, Qt.AspectRatioMode.KeepAspectRatio,
+                                     Qt.TransformationMode.SmoothTransformation)
+                try:
+                    os.makedirs(THUMBNAILS_DIR, exist_ok=True)
+                    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                    if image.save(tmp_path, "PNG"):
+                        os.replace(tmp_path, path)
+                except OSError as e:
+                    print(f"Could not cache thumbnail: {e}")
+        self._loaded.emit(key, image)
+
+    def _on_loaded(self, key, image):
+        self._queued.discard(key)
+        self._pixmaps[key] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self.MAX_PIXMAPS:
+            self._pixmaps.popitem(last=False)
+        self.ready.emit(key)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class SentenceDelegate(QStyledItemDelegate):
+    copy_requested = Signal(QModelIndex)
+    edit_requested = Signal(QModelIndex)  # long or multi-line rows edit in a dialog
+    delete_requested = Signal(QModelIndex)
+    move_up_requested = Signal(QModelIndex)
+    move_down_requested = Signal(QModelIndex)
+    switch_col_requested = Signal(QModelIndex)
+
+    # Card geometry (matches the old SentenceCard layout)
+    CARD_SPACING = 8
+    CARD_MARGIN_H = 10
+    CARD_MARGIN_V = 5
+    TEXT_PADDING = 8
+    BUTTON_SPACING = 6
+    COPY_BUTTON_WIDTH = 40
+    MOVE_BUTTON_SIZE = 30
+    DELETE_BUTTON_WIDTH = 40
+    MIN_CARD_HEIGHT = 46
+    PREVIEW_LINES = 2
+    PAINT_CHARS = 400        # never lay out more text than two lines can show
+    INLINE_EDIT_CHARS = 200  # longer (or multi-line) rows open the editor dialog
+
+    MOVE_BUTTONS = (("up", "▲"), ("down", "▼"), ("switch", "↔"))
+    BUTTON_LABELS = dict(MOVE_BUTTONS)
+    # Rich snippets without an image get a badge in place of the thumbnail
+    PREVIEW_BADGES = (("text/uri-list", "Files"), ("text/html", "HTML"))
+
+    def __init__(self, parent=None, feedback=None, thumbnails=None, theme=None):
+        super().__init__(parent)
+        self.feedback = feedback if feedback is not None else FeedbackLayer(self)
+        self.thumbnails = thumbnails
+        self.theme = theme if theme is not None else Theme.load(DEFAULT_THEME)  # card colours
+        self.edit_mode = False
+        self.reorder_enabled = True  # off while a column is sorted: ▲/▼ would move rows out of sight
+        self.copy_icon = QIcon.fromTheme("edit-copy", QApplication.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon))
+        self.delete_icon = QApplication.style().standardIcon(QStyle.StandardPixmap.SP_TrashIcon)
+        self._active_editor = None
+        self._editor_serial = 0
+
+    # --- Geometry ---
+    def card_rect(self, rect):
+        return rect.adjusted(0, 0, 0, -self.CARD_SPACING)
+
+    def button_rects(self, card_rect):
+        """Returns {name: QRect} for the buttons shown in the current mode."""
+        inner = card_rect.adjusted(self.CARD_MARGIN_H, self.CARD_MARGIN_V, -self.CARD_MARGIN_H, -self.CARD_MARGIN_V)
+        rects = {}
+        right = inner.right() + 1
+        if not self.edit_mode:
+            rects["copy"] = QRect(right - self.COPY_BUTTON_WIDTH, inner.top(), self.COPY_BUTTON_WIDTH, inner.height())
+            return rects
+        rects["delete"] = QRect(right - self.DELETE_BUTTON_WIDTH, inner.top(), self.DELETE_BUTTON_WIDTH, inner.height())
+        right -= self.DELETE_BUTTON_WIDTH + self.BUTTON_SPACING
+        top = inner.top() + (inner.height() - self.MOVE_BUTTON_SIZE) // 2
+        for name, _ in reversed(self.MOVE_BUTTONS):
+            if name in ("up", "down") and not self.reorder_enabled:
+                continue
+            rects[name] = QRect(right - self.MOVE_BUTTON_SIZE, top, self.MOVE_BUTTON_SIZE, self.MOVE_BUTTON_SIZE)
+            right -= self.MOVE_BUTTON_SIZE + self.BUTTON_SPACING
+        return rects
+
+    def text_rect(self, card_rect, payload=None):
+        inner = card_rect.adjusted(self.CARD_MARGIN_H, self.CARD_MARGIN_V, -self.CARD_MARGIN_H, -self.CARD_MARGIN_V)
+        buttons = self.button_rects(card_rect).values()
+        right = min(rect.left() for rect in buttons) - self.BUTTON_SPACING
+        left = inner.left() + 4
+        if payload:
+            left = self.preview_rect(card_rect).right() + 1 + self.TEXT_PADDING
+        return QRect(left, inner.top(), right - left, inner.height())
+
+    def preview_rect(self, card_rect):
+        """The square a rich snippet's thumbnail or badge goes in."""
+        inner = card_rect.adjusted(self.CARD_MARGIN_H, self.CARD_MARGIN_V, -self.CARD_MARGIN_H, -self.CARD_MARGIN_V)
+        return QRect(inner.left(), inner.top(), inner.height(), inner.height())
+
+    def row_height(self, font):
+        """Every row has the same height, so the view never measures rows."""
+        line_height = QFontMetrics(font).lineSpacing()
+        card_height = max(self.PREVIEW_LINES * line_height + 2 * (self.CARD_MARGIN_V + self.TEXT_PADDING),
+                          self.MIN_CARD_HEIGHT)
+        return card_height + self.CARD_SPACING
+
+    def sizeHint(self, option, index):
+        return QSize(0, self.row_height(option.font))
+
+    def preview_lines(self, text, font, width):
+        """Wraps text into at most PREVIEW_LINES lines, eliding the last one."""
+        metrics = QFontMetrics(font)
+        layout = QTextLayout(text, font)
+        layout.beginLayout()
+        lines = []
+        while True:
+            line = layout.createLine()
+            if not line.isValid():
+                break
+            line.setLineWidth(width)
+            if len(lines) == self.PREVIEW_LINES - 1:
+                # QTextLayout positions are UTF-16 offsets
+                rest = text.encode("utf-16-le")[2 * line.textStart():].decode("utf-16-le", "ignore")
+                lines.append(metrics.elidedText(rest, Qt.TextElideMode.ElideRight, width))
+                break
+            start = text.encode("utf-16-le")[2 * line.textStart():2 * (line.textStart() + line.textLength())]
+            lines.append(start.decode("utf-16-le", "ignore").rstrip())
+        layout.endLayout()
+        return lines
+
+    # --- Painting ---
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        colors = self.theme.colors
+        card = self.card_rect(option.rect)
+        if option.state & QStyle.StateFlag.State_Selected:
+            painter.setPen(QPen(colors["accent"], 2))
+        else:
+            painter.setPen(QPen(colors["card_border"], 1))
+        painter.setBrush(colors["card"])
+        painter.drawRoundedRect(QRectF(card).adjusted(0.5, 0.5, -0.5, -0.5), 12, 12)
+
+        hover_pos = None
+        if option.state & QStyle.StateFlag.State_MouseOver and option.widget is not None:
+            hover_pos = option.widget.viewport().mapFromGlobal(QCursor.pos())
+
+        text = (index.data(Qt.ItemDataRole.DisplayRole) or "")[:self.PAINT_CHARS]
+        payload = index.data(PAYLOAD_ROLE)
+        if payload:
+            self._paint_preview(painter, self.preview_rect(card), payload_formats(payload))
+        painter.setFont(option.font)
+        painter.setPen(colors["text"])
+        text_rect = self.text_rect(card, payload)
+        if self.edit_mode:
+            # Edit rows show a single elided line, like the old QLineEdit
+            elided = QFontMetrics(option.font).elidedText(text.replace("\n", " "), Qt.TextElideMode.ElideRight, text_rect.width())
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, elided)
+        else:
+            lines = self.preview_lines(text.replace("\n", " "), option.font, text_rect.width())
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, "\n".join(lines))
+
+        for name, rect in self.button_rects(card).items():
+            hovered = hover_pos is not None and rect.contains(hover_pos)
+            self._paint_button(painter, name, rect, hovered)
+
+        flash = self.feedback.opacity(index)
+        if flash > 0.0:
+            painter.setOpacity(flash)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(colors["flash"])
+            painter.drawRoundedRect(QRectF(card), 12, 12)
+        painter.restore()
+
+    def _paint_preview(self, painter, rect, formats):
+        painter.save()
+        colors = self.theme.colors
+        image_key = formats.get("image/png")
+        pixmap = self.thumbnails.get(image_key) if image_key and self.thumbnails is not None else None
+        if pixmap is not None:
+            size = pixmap.size().scaled(rect.size(), Qt.AspectRatioMode.KeepAspectRatio)
+            target = QRect(0, 0, size.width(), size.height())
+            target.moveCenter(rect.center())
+            painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+            painter.drawPixmap(target, pixmap)
+        else:
+            # Until the thumbnail is ready, or for HTML and files
+            painter.setPen(QPen(colors["move_button_border"], 1))
+            painter.setBrush(colors["move_button"])
+            painter.drawRoundedRect(QRectF(rect).adjusted(0.5, 0.5, -0.5, -0.5), 6, 6)
+            label = next((badge for mime_type, badge in self.PREVIEW_BADGES if mime_type in formats), "")
+            if not image_key and label:
+                font = painter.font()
+                font.setPointSizeF(max(font.pointSizeF() * 0.8, 6.0))
+                painter.setFont(font)
+                painter.setPen(colors["move_button_text"])
+                painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, label)
+        painter.restore()
+
+    def _paint_button(self, painter, name, rect, hovered):
+        painter.save()
+        colors = self.theme.colors
+        if name == "copy":
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(colors["copy_button_hover" if hovered else "copy_button"])
+            painter.drawRoundedRect(QRectF(rect), 6, 6)
+            self.copy_icon.paint(painter, self._icon_rect(rect))
+        elif name == "delete":
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(colors["delete_button_hover" if hovered else "delete_button"])
+            painter.drawRoundedRect(QRectF(rect), 6, 6)
+            self.delete_icon.paint(painter, self._icon_rect(rect))
+        else:
+            painter.setPen(QPen(colors["move_button_border"], 1))
+            painter.setBrush(colors["move_button_hover" if hovered else "move_button"])
+            painter.drawRoundedRect(QRectF(rect).adjusted(0.5, 0.5, -0.5, -0.5), 6, 6)
+            painter.setPen(colors["move_button_text_hover" if hovered else "move_button_text"])
+            label = self.BUTTON_LABELS[name]
+            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, label)
+        painter.restore()
+
+    def _icon_rect(self, rect, size=16):
+        return QRect(rect.center().x() - size // 2 + 1, rect.center().y() - size // 2 + 1, size, size)
+
+    # --- Mouse handling ---
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QEvent.Type.MouseButtonPress, QEvent.Type.MouseButtonDblClick,
+                                QEvent.Type.MouseButtonRelease):
+            return super().editorEvent(event, model, option, index)
+        if event.button() != Qt.MouseButton.LeftButton:
+            return False
+        # A double click is treated as a second press, as QWidget does
+        is_press = event.type() != QEvent.Type.MouseButtonRelease
+
+        card = self.card_rect(option.rect)
+        pos = event.position().toPoint()
+        hit = None
+        for name, rect in self.button_rects(card).items():
+            if rect.contains(pos):
+                hit = name
+                break
+
+        if not self.edit_mode:
+            # Clicking anywhere on a card copies it (on press, as before);
+            # the window flashes the card once the copy has happened
+            if is_press and card.contains(pos):
+                self.copy_requested.emit(index)
+            return True
+
+        if is_press:
+            if hit is None and event.modifiers() & (Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier):
+                return False # Let the view extend the selection
+            text_rect = self.text_rect(card, index.data(PAYLOAD_ROLE))
+            if hit is None and text_rect.contains(pos) and option.widget is not None:
+                # One editor at a time: finish the previous row first
+                self.commit_active_editor()
+                text = index.data(Qt.ItemDataRole.DisplayRole) or ""
+                if "\n" in text or len(text) > self.INLINE_EDIT_CHARS:
+                    self.edit_requested.emit(index)
+                    return True
+                option.widget.setCurrentIndex(index)
+                option.widget.edit(index)
+                return True
+            return hit is not None
+
+        # Buttons fire on release, like QPushButton.clicked
+        if hit == "up":
+            self.move_up_requested.emit(index)
+        elif hit == "down":
+            self.move_down_requested.emit(index)
+        elif hit == "switch":
+            self.switch_col_requested.emit(index)
+        elif hit == "delete":
+            self.delete_requested.emit(index)
+        return True
+
+    # --- Editing (one QLineEdit at a time, only while editing a row) ---
+    def createEditor(self, parent, option, index):
+        editor = QLineEdit(parent)
+        self._editor_serial += 1
+        serial = self._editor_serial
+        editor.destroyed.connect(lambda *args: self._on_editor_destroyed(serial))
+        self._active_editor = editor
+        return editor
+
+    def setEditorData(self, editor, index):
+        editor.setText(index.data(Qt.ItemDataRole.EditRole) or "")
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.text(), Qt.ItemDataRole.EditRole)
+
+    def updateEditorGeometry(self, editor, option, index):
+        rect = self.text_rect(self.card_rect(option.rect), index.data(PAYLOAD_ROLE))
+        height = min(rect.height(), max(editor.sizeHint().height(), self.MOVE_BUTTON_SIZE))
+        editor.setGeometry(rect.left(), rect.top() + (rect.height() - height) // 2, rect.width(), height)
+
+    def commit_active_editor(self):
+        """Writes back and closes the open line edit, if any."""
+        editor = self._active_editor
+        if editor is None:
+            return
+        # The delegate is shared, so talk to the view that owns the editor
+        view = editor.parentWidget().parentWidget()
+        view.commitData(editor)
+        view.closeEditor(editor, QAbstractItemDelegate.EndEditHint.NoHint)
+        self._active_editor = None
+
+    def _on_editor_destroyed(self, serial):
+        # Opening a second row destroys the first editor after the new one exists
+        if serial == self._editor_serial:
+            self._active_editor = None
+
+    def set_edit_mode(self, is_edit):
+        """Switches how rows paint. O(1): nothing exists per row to update."""
+        if not is_edit:
+            self.commit_active_editor()
+        self.edit_mode = is_edit
+
+
+class HistoryDelegate(SentenceDelegate):
+    """Clipboard history rows: click copies, + promotes to a saved sentence."""
+    promote_requested = Signal(QModelIndex)
+
+    BUTTON_LABELS = {"promote": "+"}
+
+    def button_rects(self, card_rect):
+        rects = super().button_rects(card_rect)
+        copy = rects["copy"]
+        top = copy.top() + (copy.height() - self.MOVE_BUTTON_SIZE) // 2
+        rects["promote"] = QRect(copy.left() - self.BUTTON_SPACING - self.MOVE_BUTTON_SIZE, top,
+                                 self.MOVE_BUTTON_SIZE, self.MOVE_BUTTON_SIZE)
+        return rects
+
+    def editorEvent(self, event, model, option, index):
+        if (event.type() in (QEvent.Type.MouseButtonPress, QEvent.Type.MouseButtonDblClick)
+                and event.button() == Qt.MouseButton.LeftButton):
+            promote = self.button_rects(self.card_rect(option.rect))["promote"]
+            if promote.contains(event.position().toPoint()):
+                self.promote_requested.emit(index)
+                self.feedback.flash(option.widget, index)
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+class SentenceColumnView(QTableView):
+    """A scrolling column of sentence rows, painted by SentenceDelegate.
+
+    A one-column QTableView with fixed-height rows: inserting, moving or
+    removing a row is O(1) for the view, and only visible rows are painted.
+    """
+    def __init__(self, model, delegate, parent=None):
+        super().__init__(parent)
+        self.setObjectName("SentenceColumn")
+        self.setModel(model)
+        self.setItemDelegate(delegate)
+        self.setFrameShape(QFrame.Shape.NoFrame)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setCornerButtonEnabled(False)
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setMouseTracking(True)
+
+    def show_model(self, model):
+        """Switches between the column model and its search results."""
+        if self.model() is model:
+            return
+        old_selection = self.selectionModel()
+        self.setModel(model)
+        if old_selection is not None:
+            old_selection.deleteLater()
+
+    def set_edit_mode(self, is_edit):
+        """Shift/Ctrl-click multi-select is only available in edit mode."""
+        self.clearSelection()
+        if is_edit:
+            self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        else:
+            self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.viewport().update()
+
+    def update_row_height(self):
+        """Re-reads the (stylesheet) font and sizes every row at once."""
+        self.ensurePolished()
+        self.verticalHeader().setDefaultSectionSize(self.itemDelegate().row_height(self.font()))
+
+    def paintEvent(self, event):
+        if not perf.enabled:
+            return super().paintEvent(event)
+        with perf.span("paint"):
+            super().paintEvent(event)
+
+    def mouseMoveEvent(self, event):
+        # Repaint the hovered row so its buttons can show their hover colour
+        index = self.indexAt(event.position().toPoint())
+        if index.isValid():
+            self.viewport().update(self.visualRect(index))
+        super().mouseMoveEvent(event)
+
+
+# --- Libraries ---
+class Library:
+    """An opened library: its store, column models and search index.
+
+    Created when the library is first opened and kept while it fits in
+    MainWindow's memory budget; evicting it closes the store and drops the
+    models, and reopening loads it again from disk.
+    """
+    ROW_OVERHEAD_BYTES = 600  # Sentence, list/dict slots and index entries per row
+
+    def __init__(self, name, parent, undo_bytes):
+        self.name = name
+        self.store = open_store(library=name)
+        self.column_models = [SentenceListModel(0, parent, self.store), SentenceListModel(1, parent, self.store)]
+        self.column_filters = [SentenceFilterModel(model, parent) for model in self.column_models]
+        self.column_sorts = [SentenceSortModel(model, parent) for model in self.column_models]
+        self.search_index = SearchIndex()
+        self.frecency = FrecencyIndex()
+        self.usage = UsageStats()
+        self.templates = TemplateCache()
+        self.undo = UndoStack(undo_bytes)
+        self.loading = False
+        self.indexed = False  # search_index is built
+        self.load_cancelled = False
+        self.load_started = 0.0
+        self.closed = False
+        self.estimated_bytes = 0
+
+    def sentence_count(self):
+        return sum(model.rowCount() for model in self.column_models)
+
+    def sentence(self, sentence_id):
+        """The loaded Sentence with this id, or None."""
+        for model in self.column_models:
+            sentence = model.items.get(sentence_id)
+            if sentence is not None:
+                return sentence
+        return None
+
+    def estimate_bytes(self):
+        """Rough memory held by this library (text as UCS-2 plus per-row cost)."""
+        self.estimated_bytes = sum(
+            2 * len(s.text) + self.ROW_OVERHEAD_BYTES for model in self.column_models for s in model.items
+        )
+        return self.estimated_bytes
+
+    def save_usage(self):
+        """Queues every sentence copied since the last call, as one batch."""
+        sentences = [s for s in map(self.sentence, self.usage.take()) if s is not None]
+        self.store.save(sentences)
+
+    def close(self):
+        self.load_cancelled = True
+        self.closed = True
+        self.save_usage()
+        self.store.close() # Flushes pending writes
+        for model in self.column_filters + self.column_sorts + self.column_models:
+            model.deleteLater()
+
+
+class LibraryHitsModel(QAbstractListModel):
+    """Cross-library search results: (library, Sentence) pairs."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._hits = []
+
+    def set_hits(self, hits):
+        self.beginResetModel()
+        self._hits = hits
+        self.endResetModel()
+
+    def hit(self, row):
+        return self._hits[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._hits)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._hits):
+            return None
+        library, sentence = self._hits[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return sentence.text
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"From library: {library}"
+        if role == PAYLOAD_ROLE:
+            return sentence.payload
+        return None
+
+
+# --- Quick-paste palette (global hotkey) ---
+class PaletteModel(QAbstractListModel):
+    """The palette's result rows: Sentences shown as one-line previews."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._sentences = []
+
+    def set_sentences(self, sentences):
+        self.beginResetModel()
+        self._sentences = sentences
+        self.endResetModel()
+
+    def sentence(self, row):
+        return self._sentences[row] if 0 <= row < len(self._sentences) else None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._sentences)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < len(self._sentences):
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return " ".join(self._sentences[index.row()].text[:300].split())
+        return None
+
+
+class QuickPalette(QWidget):
+    """A small frameless search box for copying without the main window.
+
+    Built once and only hidden between uses, so opening it is a show()
+    plus a query against the library's warm search and frecency indexes.
+    Up/Down pick a result, Enter copies it, Shift+Enter copies and pastes
+    into the app underneath, Esc closes.
+    """
+    copy_requested = Signal(object, object, bool)  # library, sentence, paste
+    MAX_RESULTS = 12
+
+    def __init__(self):
+        super().__init__(None, Qt.WindowType.FramelessWindowHint | Qt.WindowType.Tool
+                         | Qt.WindowType.WindowStaysOnTopHint)
+        self.setObjectName("QuickPalette")
+        self.setAttribute(Qt.WidgetAttribute.WA_StyledBackground) # Paint the rounded background
+        self.setWindowTitle("CopyCat")
+        self.setFixedWidth(560)
+        self.library = None
+        self.search_edit = QLineEdit()
+        self.search_edit.setObjectName("PaletteSearch")
+        self.search_edit.setPlaceholderText("Copy a snippet...")
+        self.model = PaletteModel(self)
+        self.results = QListView()
+        self.results.setObjectName("PaletteResults")
+        self.results.setModel(self.model)
+        self.results.setUniformItemSizes(True)
+        self.results.setFocusPolicy(Qt.FocusPolicy.NoFocus) # Typing stays in the search box
+        self.results.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.results.setTextElideMode(Qt.TextElideMode.ElideRight)
+        row_height = QFontMetrics(self.results.font()).height() + 12
+        self.results.setFixedHeight(row_height * self.MAX_RESULTS + 4)
+        hint = QLabel("Enter copy · Shift+Enter copy and paste · Esc close")
+        hint.setObjectName("PaletteHint")
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(10, 10, 10, 8)
+        layout.setSpacing(6)
+        layout.addWidget(self.search_edit)
+        layout.addWidget(self.results)
+        layout.addWidget(hint)
+        self.search_edit.textChanged.connect(self.refresh)
+        self.search_edit.installEventFilter(self)
+        self.results.clicked.connect(lambda index: self.choose(index.row(), paste=False))
+
+    @perf.timed("palette.popup")
+    def popup(self, library):
+        """Shows the palette for `library`, centred on the screen under the mouse."""
+        self.library = library
+        self.search_edit.blockSignals(True)
+        self.search_edit.clear()
+        self.search_edit.blockSignals(False)
+        self.refresh()
+        screen = QApplication.screenAt(QCursor.pos()) or QApplication.primaryScreen()
+        area = screen.availableGeometry()
+        self.adjustSize()
+        self.move(area.x() + (area.width() - self.width()) // 2, area.y() + area.height() // 4)
+        self.show()
+        self.raise_()
+        self.activateWindow()
+        self.search_edit.setFocus()
+
+    @perf.timed("palette.refresh")
+    def refresh(self, *args):
+        library = self.library
+        if library is None:
+            return
+        scores = library.search_index.search(self.search_edit.text())
+        if scores is None: # Empty (or one-letter) query: the most used snippets
+            ids = library.frecency.top(self.MAX_RESULTS)
+        else:
+            ids = library.frecency.best(scores, self.MAX_RESULTS)
+        sentences = [s for s in map(library.sentence, ids) if s is not None]
+        if scores is None and len(sentences) < self.MAX_RESULTS:
+            # Not enough copies recorded yet: fill up from the top of the columns
+            seen = set(ids)
+            for model in library.column_models:
+                for s in model.items:
+                    if len(sentences) >= self.MAX_RESULTS:
+                        break
+                    if s.id not in seen:
+                        sentences.append(s)
+        self.model.set_sentences(sentences)
+        if sentences:
+            self.results.setCurrentIndex(self.model.index(0))
+
+    def choose(self, row, paste):
+        sentence = self.model.sentence(row)
+        if sentence is None:
+            return
+        self.hide()
+        self.copy_requested.emit(self.library, sentence, paste)
+
+    def eventFilter(self, obj, event):
+        if obj is self.search_edit and event.type() == QEvent.Type.KeyPress:
+            key = event.key()
+            row = self.results.currentIndex().row()
+            if key in (Qt.Key.Key_Down, Qt.Key.Key_Up):
+                step = 1 if key == Qt.Key.Key_Down else -1
+                row = min(max(row + step, 0), self.model.rowCount() - 1)
+                self.results.setCurrentIndex(self.model.index(row))
+                return True
+            if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                self.choose(row, paste=bool(event.modifiers() & Qt.KeyboardModifier.ShiftModifier))
+                return True
+            if key == Qt.Key.Key_Escape:
+                self.hide()
+                return True
+        return super().eventFilter(obj, event)
+
+    def event(self, event):
+        if event.type() == QEvent.Type.WindowDeactivate:
+            self.hide() # Clicked elsewhere
+        return super().event(event)
+
+
+def send_paste_keystroke():
+    """Presses Ctrl+V (Cmd+V on macOS) in whichever app has the focus.
+
+    Returns False when this platform has no way to do it (Linux needs
+    xdotool on X11 or wtype on Wayland).
+    """
+    import shutil # Only pasting needs these
+    import subprocess
+    if sys.platform == "win32":
+        import ctypes
+        VK_CONTROL, VK_V, KEYEVENTF_KEYUP = 0x11, 0x56, 0x0002
+        for vk, flags in ((VK_CONTROL, 0), (VK_V, 0), (VK_V, KEYEVENTF_KEYUP), (VK_CONTROL, KEYEVENTF_KEYUP)):
+            ctypes.windll.user32.keybd_event(vk, 0, flags, 0)
+        return True
+    if sys.platform == "darwin":
+        commands = [["osascript", "-e", 'tell application "System Events" to keystroke "v" using command down']]
+    elif os.environ.get("WAYLAND_DISPLAY"):
+        commands = [["wtype", "-M", "ctrl", "v", "-m", "ctrl"]]
+    else:
+        commands = [["xdotool", "key", "--clearmodifiers", "ctrl+v"]]
+    for command in commands:
+        if shutil.which(command[0]):
+            subprocess.Popen(command)
+            return True
+    return False
+
+
+class GlobalHotkey(QObject):
+    """A system-wide shortcut such as "Ctrl+Shift+Space".
+
+    Windows registers it with RegisterHotKey and picks WM_HOTKEY out of the
+    Qt event loop. Other platforms use pynput when it is installed; without
+    it the shortcut only works while a CopyCat window has the focus.
+    """
+    activated = Signal()
+    HOTKEY_ID = 0xC0CA
+    WIN_MODIFIERS = {"alt": 0x1, "ctrl": 0x2, "shift": 0x4, "meta": 0x8, "win": 0x8}
+    WIN_KEYS = {"space": 0x20, "insert": 0x2D, "home": 0x24, "end": 0x23}
+
+    def __init__(self, sequence, window):
+        super().__init__(window)
+        self.sequence = sequence
+        self.is_global = False
+        self._filter = None
+        self._listener = None
+        try:
+            self.is_global = self._register(sequence)
+        except (OSError, ValueError, KeyError, ImportError) as e:
+            print(f"Could not register global hotkey {sequence}: {e}")
+        if not self.is_global:
+            shortcut = QShortcut(QKeySequence(sequence), window)
+            shortcut.setContext(Qt.ShortcutContext.ApplicationShortcut)
+            shortcut.activated.connect(self.activated)
+
+    def _register(self, sequence):
+        *modifiers, key = [part.strip().lower() for part in sequence.split("+")]
+        if sys.platform == "win32":
+            return self._register_windows(modifiers, key)
+        try:
+            from pynput import keyboard # Optional dependency
+        except ImportError:
+            return False
+        combo = "+".join([f"<{m}>" if m != "meta" else "<cmd>" for m in modifiers]
+                         + [key if len(key) == 1 else f"<{key}>"])
+        self._listener = keyboard.GlobalHotKeys({combo: self.activated.emit}) # Emitted from its thread
+        self._listener.daemon = True
+        self._listener.start()
+        return True
+
+    def _register_windows(self, modifiers, key):
+        import ctypes
+        from ctypes import wintypes
+        MOD_NOREPEAT, WM_HOTKEY = 0x4000, 0x0312
+        flags = MOD_NOREPEAT
+        for modifier in modifiers:
+            flags |= self.WIN_MODIFIERS[modifier]
+        if len(key) == 1 and key.isalnum():
+            vk = ord(key.upper())
+        elif key[:1] == "f" and key[1:].isdigit():
+            vk = 0x6F + int(key[1:]) # F1 = 0x70
+        else:
+            vk = self.WIN_KEYS[key]
+        if not ctypes.windll.user32.RegisterHotKey(None, self.HOTKEY_ID, flags, vk):
+            raise ctypes.WinError()
+        hotkey = self
+
+        class HotkeyFilter(QAbstractNativeEventFilter):
+            def nativeEventFilter(self, event_type, message):
+                if event_type == b"windows_generic_MSG":
+                    msg = wintypes.MSG.from_address(int(message))
+                    if msg.message == WM_HOTKEY and msg.wParam == hotkey.HOTKEY_ID:
+                        hotkey.activated.emit()
+                        return True, 0
+                return False, 0
+
+        self._filter = HotkeyFilter()
+        QApplication.instance().installNativeEventFilter(self._filter)
+        return True
+
+    def unregister(self):
+        if self._filter is not None:
+            import ctypes
+            ctypes.windll.user32.UnregisterHotKey(None, self.HOTKEY_ID)
+            QApplication.instance().removeNativeEventFilter(self._filter)
+            self._filter = None
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+# --- Single instance ---
+class InstanceServer(QObject):
+    """Takes the requests of later launches (see send_to_running_instance)."""
+    request_received = Signal(object)  # dict from launch_request()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self.server.newConnection.connect(self._on_new_connection)
+
+    def listen(self):
+        name = instance_server_name()
+        # Probe first: with UserAccessOption, listen() renames its socket
+        # over an existing one, live or not. Only a socket nobody accepts on
+        # is left over from a crash; one that accepts belongs to a copy that
+        # started since (or was too busy for) the hand-off
+        probe = QLocalSocket()
+        probe.connectToServer(name)
+        if probe.waitForConnected(1000):
+            probe.abort()
+            print("Single-instance mode is off: another CopyCat is listening")
+            return False
+        if probe.error() == QLocalSocket.LocalSocketError.ConnectionRefusedError:
+            QLocalServer.removeServer(name)
+        if self.server.listen(name):
+            return True
+        print(f"Single-instance mode is off: {self.server.errorString()}")
+        return False
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self._read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def _read(self, socket):
+        while socket.canReadLine():
+            try:
+                request = json.loads(bytes(socket.readLine()).decode("utf-8"))
+            except ValueError:
+                request = None
+            if not isinstance(request, dict):
+                socket.write(b"error\n")
+                continue
+            socket.write(b"ok\n")
+            socket.flush()
+            self.request_received.emit(request)
+
+
+# --- Performance overlay (Ctrl+Shift+P) ---
+class StallDetector(QObject):
+    """Notices when the event loop is blocked: a 50 ms timer that fires
+    late means the GUI thread was busy for that long."""
+    INTERVAL_MS = 50
+    STALL_MS = 100
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setInterval(self.INTERVAL_MS)
+        self._timer.timeout.connect(self._tick)
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter()
+        expected = self._last + self.INTERVAL_MS / 1000
+        if (now - expected) * 1000 >= self.STALL_MS:
+            perf.record("event_loop.stall", expected, now)
+            perf.count("event_loop.stalls")
+        self._last = now
 
-    def __init__(self, text, parent=None):
+
+class PerfOverlay(QLabel):
+    """Span timings and counters drawn over the window while profiling."""
+    MAX_ROWS = 14
+
+    def __init__(self, parent=None):
         super().__init__(parent)
-        self.text_content = text
-        self.setObjectName("SentenceCard")
-        
-        # --- REMOVED Drag Handle and mouse events ---
-        
-        # View Mode Widgets
-        self.label = QLabel(text)
-        self.label.setWordWrap(True)
-        self.copy_btn = QPushButton()
-        self.copy_btn.setIcon(QIcon.fromTheme("edit-copy", QApplication.style().standardIcon(QStyle.StandardPixmap.SP_FileIcon)))
-        self.copy_btn.setObjectName("CopyButton")
-        self.copy_btn.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding) 
-        
-        # Edit Mode Widgets
-        self.edit_entry = QLineEdit(text)
-        
-        # --- NEW Reorder Buttons ---
-        self.move_up_btn = QPushButton("▲")
-        self.move_up_btn.setObjectName("MoveUpButton")
-        self.move_up_btn.setFixedSize(30, 30)
-        self.move_up_btn.setToolTip("Move Up")
-        
-        self.move_down_btn = QPushButton("▼")
-        self.move_down_btn.setObjectName("MoveDownButton")
-        self.move_down_btn.setFixedSize(30, 30)
-        self.move_down_btn.setToolTip("Move Down")
-
-        self.switch_col_btn = QPushButton("↔")
-        self.switch_col_btn.setObjectName("SwitchColButton")
-        self.switch_col_btn.setFixedSize(30, 30)
-        self.switch_col_btn.setToolTip("Switch Column")
-        
-        self.delete_btn = QPushButton()
-        self.delete_btn.setIcon(QApplication.style().standardIcon(QStyle.StandardPixmap.SP_TrashIcon))
-        self.delete_btn.setObjectName("DeleteButton")
-        self.delete_btn.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Expanding)
-
-        # Layout
-        self.layout = QHBoxLayout(self)
-        self.layout.setContentsMargins(10, 5, 10, 5)
-        
-        # --- Edit Mode Layout ---
-        self.edit_widget = QWidget() # Container for edit items
-        self.edit_layout = QHBoxLayout(self.edit_widget)
-        self.edit_layout.setContentsMargins(0, 0, 0, 0)
-        self.edit_layout.addWidget(self.edit_entry, 1)
-        self.edit_layout.addWidget(self.move_up_btn)
-        self.edit_layout.addWidget(self.move_down_btn)
-        self.edit_layout.addWidget(self.switch_col_btn)
-        self.edit_layout.addWidget(self.delete_btn)
-        self.layout.addWidget(self.edit_widget)
-        self.edit_widget.hide()
-
-        # --- View Mode Layout ---
-        self.view_widget = QWidget() # Container for view items
-        self.view_layout = QHBoxLayout(self.view_widget)
-        self.view_layout.setContentsMargins(0, 0, 0, 0)
-        self.view_layout.addWidget(self.label, 1)
-        self.view_layout.addWidget(self.copy_btn, 0)
-        self.layout.addWidget(self.view_widget)
-        self.view_widget.show()
-        
-        # Flash Animation Overlay (Unchanged)
-        self.flash_overlay = QFrame(self)
-        self.flash_overlay.setObjectName("FlashOverlay")
-        self.flash_overlay.lower() 
-        self.opacity_effect = QGraphicsOpacityEffect(self.flash_overlay)
-        # ... (rest of animation setup is unchanged) ...
-        self.flash_overlay.setGraphicsEffect(self.opacity_effect)
-        self.opacity_effect.setOpacity(0.0)
-        self.flash_animation = QPropertyAnimation(self.opacity_effect, QByteArray(b"opacity"))
-        self.flash_animation.setDuration(400) 
-        self.flash_animation.setStartValue(0.0)
-        self.flash_animation.setKeyValueAt(0.1, 0.8) 
-        self.flash_animation.setEndValue(0.0)
-        self.flash_animation.setEasingCurve(QEasingCurve.Type.InOutQuad)
-        
-        # Connect Signals
-        self.copy_btn.clicked.connect(self.copy_to_clipboard)
-        self.delete_btn.clicked.connect(self.delete_requested.emit)
-        # --- NEW Connections ---
-        self.move_up_btn.clicked.connect(self.move_up_requested.emit)
-        self.move_down_btn.clicked.connect(self.move_down_requested.emit)
-        self.switch_col_btn.clicked.connect(self.switch_col_requested.emit)
-
-    def mousePressEvent(self, event):
-        # --- MODIFIED: Simplified to only copy ---
-        if event.button() == Qt.MouseButton.LeftButton:
-            if self.view_widget.isVisible():
-                if not self.copy_btn.geometry().contains(event.pos()):
-                    self.copy_to_clipboard() 
-        super().mousePressEvent(event)
-    
-    # --- REMOVED mouseMoveEvent and mouseReleaseEvent ---
-
-    def resizeEvent(self, event):
-        # (Unchanged)
-        self.flash_overlay.resize(event.size())
-        super().resizeEvent(event)
-        
-    def copy_to_clipboard(self):
-        # (Unchanged)
-        clipboard = QApplication.clipboard()
-        clipboard.setText(self.text_content)
-        print(f"Copied: {self.text_content}")
-        self.flash_animation.start()
+        self.setObjectName("PerfOverlay")
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        font = QFont("monospace")
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        font.setPointSize(8)
+        self.setFont(font)
+        self.setTextFormat(Qt.TextFormat.PlainText)
+        self.note = ""
+        self._timer = QTimer(self)
+        self._timer.setInterval(500)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
 
-    def setEditMode(self, is_edit):
-        # --- MODIFIED: Show/hide widgets ---
-        if is_edit:
-            self.edit_widget.show()
-            self.view_widget.hide()
-            self.edit_entry.setText(self.text_content)
+    def setVisible(self, visible):
+        super().setVisible(visible)
+        if visible:
+            self.refresh()
+            self._timer.start()
         else:
-            self.edit_widget.hide()
-            self.view_widget.show()
-            # Save text changes when switching off
-            self.text_content = self.edit_entry.text()
-            self.label.setText(self.text_content)
+            self._timer.stop()
 
-    def get_text_from_entry(self):
-        # (Unchanged)
-        return self.edit_entry.text()
-    
-    def set_text(self, text):
-        # (Unchanged)
-        self.text_content = text
-        self.label.setText(text)
-        self.edit_entry.setText(text)
+    def refresh(self):
+        lines = [f"{'span':<24}{'n':>7}{'mean ms':>9}{'max ms':>9}"]
+        for name, count, mean, peak in perf.summary()[:self.MAX_ROWS]:
+            lines.append(f"{name[:23]:<24}{count:>7}{mean:>9.2f}{peak:>9.1f}")
+        if perf.counters:
+            lines.append("")
+            lines.extend(f"{name[:30]:<31}{value:>9}" for name, value in sorted(perf.counters.items()))
+        if self.note:
+            lines.extend(["", self.note])
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        parent = self.parentWidget()
+        if parent is not None:
+            self.move(parent.width() - self.width() - 12, parent.height() - self.height() - 12)
+        self.raise_()
 
 
 # --- 2. 'Add Sentence' Pop-up Dialog ---
-# (Unchanged)
+# Multi-line now, and also used to edit rows too long for the inline editor
 class AddSentenceDialog(QDialog):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, title="Add New Sentence", text=""):
         super().__init__(parent)
-        self.setWindowTitle("Add New Sentence")
+        self.setWindowTitle(title)
         self.setModal(True)
-        self.setFixedSize(400, 150)
+        self.resize(520, 300)
         self.setObjectName("AddDialog")
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(20, 20, 20, 20)
-        self.entry = QLineEdit()
-        self.entry.setPlaceholderText("Enter sentence here...")
+        self.entry = QPlainTextEdit()
+        self.entry.setPlaceholderText("Enter sentence here... (Ctrl+Enter to save)")
         self.entry.setObjectName("DialogEntry")
-        self.layout.addWidget(self.entry)
+        self.entry.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap if len(text) > 100000
+                                   else QPlainTextEdit.LineWrapMode.WidgetWidth) # Wrapping megabytes is slow
+        self.entry.setPlainText(text)
+        self.layout.addWidget(self.entry, 1)
         self.save_btn = QPushButton("Save")
         self.save_btn.setObjectName("DialogSaveButton")
         self.layout.addWidget(self.save_btn, 0, Qt.AlignmentFlag.AlignRight)
         self.save_btn.clicked.connect(self.accept)
-        self.entry.returnPressed.connect(self.accept)
+        QShortcut(QKeySequence("Ctrl+Return"), self, self.accept)
+        QShortcut(QKeySequence("Ctrl+Enter"), self, self.accept)
     def get_text(self):
-        return self.entry.text()
+        return self.entry.toPlainText()
 
 
 # --- 3. DropColumn Class REMOVED ---
@@ -208,16 +1642,80 @@ class AddSentenceDialog(QDialog):
 # --- 4. Main Application Window ---
 # <--- HEAVILY MODIFIED: REMOVED DRAG/DROP, ADDED BUTTON HANDLERS --->
 class MainWindow(QMainWindow):
+    search_index_ready = Signal()
+    sentences_loaded = Signal(object, object, int)  # library, sentences, total
+    load_finished = Signal(object)  # library
+    import_finished = Signal(object, object, object)  # library, [Sentence], error
+    export_finished = Signal(object, object)  # count (None if cancelled), error
+    TRANSFER_FILTER = "Text, one per line (*.txt);;CSV (*.csv);;JSON (*.json)"
+    DEFAULT_LIBRARY_BUDGET_MB = 256
+    DEFAULT_UNDO_BUDGET_MB = 16  # per open library
+    DEFAULT_PALETTE_HOTKEY = "Ctrl+Shift+Space"
+    USAGE_SAVE_MS = 30000  # copy counts are saved in batches, at most this long after a copy
+    SORT_LABELS = {"manual": "Manual Order", "most_used": "Most Used",
+                   "recent": "Recently Used", "alphabetical": "A to Z"}
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("CopyCat by chamirurf") 
-        icon_path = resource_path("CopyCat.ico")
-        self.setWindowIcon(QIcon(icon_path))
         self.setGeometry(100, 100, 850, 600)
+        # The icon, stylesheet, hotkey and library wait for the first paint
+        # (see finish_startup); until then the window just has the theme's palette
+        settings = QSettings("CopyCat", "CopyCat")
+        self.theme = Theme.load(os.environ.get("COPYCAT_THEME") or settings.value("appearance/theme", DEFAULT_THEME))
+        self.setPalette(self.theme.palette)
+        self.first_paint_at = None  # time.time() of the first paint, for bench_startup.py
+        self._startup_finished = False
         
-        self.column_1_widgets = [] 
-        self.column_2_widgets = []
-        # --- REMOVED self.dragged_card ---
+        # --- MODIFIED: One model per column instead of lists of cards ---
+        # Open libraries, least recently used first. store, column_models,
+        # column_filters and search_index below belong to the active one.
+        self.libraries = OrderedDict()
+        self.library = None
+        self.store = None
+        self.column_1_model = self.column_2_model = None
+        self.column_models = []
+        self.column_filters = []
+        self.column_sorts = []
+        self.search_index = None
+        self.sort_order = settings.value("view/sort_order", "manual")
+        if self.sort_order not in SORT_ORDERS:
+            self.sort_order = "manual"
+        self._sort_refresh_pending = False
+        self._usage_timer = QTimer(self)
+        self._usage_timer.setSingleShot(True)
+        self._usage_timer.setInterval(self.USAGE_SAVE_MS)
+        budget_mb = os.environ.get("COPYCAT_LIBRARY_BUDGET_MB") or settings.value(
+            "libraries/memory_budget_mb", self.DEFAULT_LIBRARY_BUDGET_MB)
+        self.library_budget_bytes = int(float(budget_mb) * 1024 * 1024)
+        undo_mb = os.environ.get("COPYCAT_UNDO_BUDGET_MB") or settings.value(
+            "undo/memory_budget_mb", self.DEFAULT_UNDO_BUDGET_MB)
+        self.undo_budget_bytes = int(float(undo_mb) * 1024 * 1024)
+        # One copy flash for every view; see FeedbackLayer
+        self.feedback = FeedbackLayer(self)
+        reduced_motion = os.environ.get("COPYCAT_REDUCED_MOTION") or settings.value("appearance/reduced_motion")
+        self.feedback.reduced_motion = (str(reduced_motion).lower() in ("1", "true") if reduced_motion is not None
+                                        else system_prefers_reduced_motion())
+        # Payloads of image/HTML/file snippets, and their thumbnails
+        self.blobs = BlobStore()
+        self.thumbnails = ThumbnailCache(self.blobs, self)
+        self.hits_model = LibraryHitsModel(self)
+        self.hits_delegate = SentenceDelegate(self, self.feedback, self.thumbnails, self.theme)
+        self._search_refresh_pending = False
+        self._search_active = False
+        self._other_search_timer = QTimer(self)
+        self._other_search_timer.setSingleShot(True)
+        self._other_search_timer.setInterval(150)
+        self._edited_ids = set()  # rows changed since edit mode was turned on
+        self.delegate = SentenceDelegate(self, self.feedback, self.thumbnails, self.theme)
+        self.history = None  # ClipboardHistory, only while capture is on
+        self.history_model = ClipboardHistoryModel(parent=self)
+        self.history_delegate = HistoryDelegate(self, self.feedback, theme=self.theme)
+        self._own_clipboard_text = None
+        self._clipboard_mime = None  # our last rich copy (see release_clipboard)
+        self._history_timer = QTimer(self)
+        self._history_timer.setSingleShot(True)
+        self._history_timer.setInterval(100)
         
         main_widget = QWidget()
         main_layout = QVBoxLayout(main_widget)
@@ -230,58 +1728,387 @@ class MainWindow(QMainWindow):
         top_bar_layout = QHBoxLayout(top_bar_widget)
         top_bar_layout.setContentsMargins(0, 0, 0, 0)
         self.add_btn = QPushButton("Add")
+        self.library_combo = QComboBox()
+        self.library_combo.setObjectName("LibrarySwitcher")
+        self.library_combo.setToolTip("Switch library")
+        self.new_library_btn = QPushButton("+")
+        self.new_library_btn.setObjectName("NewLibraryButton")
+        self.new_library_btn.setToolTip("New library")
+        self.library_menu_btn = QPushButton("≡")
+        self.library_menu_btn.setObjectName("LibraryMenuButton")
+        self.library_menu_btn.setToolTip("Undo, redo, import and export")
+        library_menu = QMenu(self.library_menu_btn)
+        self.undo_action = library_menu.addAction("Undo", self.undo)
+        self.redo_action = library_menu.addAction("Redo", self.redo)
+        library_menu.addSeparator()
+        library_menu.addAction("Add from Clipboard", self.add_from_clipboard)
+        library_menu.addAction("Import...", self.import_file)
+        library_menu.addAction("Export...", self.export_file)
+        library_menu.addSeparator()
+        self.reduced_motion_action = library_menu.addAction("Reduce Motion")
+        self.reduced_motion_action.setCheckable(True)
+        self.reduced_motion_action.setChecked(self.feedback.reduced_motion)
+        self.reduced_motion_action.toggled.connect(self.set_reduced_motion)
+        self.theme_menu = library_menu.addMenu("Theme")
+        self.theme_menu.aboutToShow.connect(self.update_theme_menu) # Picks up new user themes
+        library_menu.aboutToShow.connect(self.update_undo_actions)
+        self.library_menu_btn.setMenu(library_menu)
+        self.sort_combo = QComboBox()
+        self.sort_combo.setObjectName("SortSwitcher")
+        self.sort_combo.setToolTip("Sort the columns (the manual order is kept)")
+        for order in SORT_ORDERS:
+            self.sort_combo.addItem(self.SORT_LABELS[order], order)
+        self.sort_combo.setCurrentIndex(SORT_ORDERS.index(self.sort_order))
+        self.delegate.reorder_enabled = self.sort_order == "manual"
         self.edit_mode_check = QCheckBox("Edit Mode")
+        self.history_check = QCheckBox("History")
+        self.history_check.setToolTip("Keep a history of everything copied to the clipboard")
         self.clear_clipboard_btn = QPushButton("Clear Clipboard")
+        self.rebalance_btn = QPushButton("Rebalance")
+        self.rebalance_btn.setToolTip("Even out the two columns")
+        rebalance_menu = QMenu(self.rebalance_btn)
+        rebalance_menu.addAction("Rebalance Columns", lambda: self.rebalance_columns())
+        rebalance_menu.addAction("Rebalance Columns (Keep Reading Order)",
+                                 lambda: self.rebalance_columns(keep_reading_order=True))
+        self.rebalance_btn.setMenu(rebalance_menu)
+        self.rebalance_btn.hide() # Edit mode only
+        self.search_edit = QLineEdit()
+        self.search_edit.setObjectName("SearchField")
+        self.search_edit.setPlaceholderText("Search...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setMinimumWidth(240)
+        self.search_all_check = QCheckBox("All Libraries")
+        self.search_all_check.setToolTip("Also search libraries that are not open")
         self.add_btn.setObjectName("AddButton")
         top_bar_layout.addWidget(self.add_btn)
+        top_bar_layout.addWidget(self.library_combo)
+        top_bar_layout.addWidget(self.new_library_btn)
+        top_bar_layout.addWidget(self.library_menu_btn)
+        top_bar_layout.addWidget(self.sort_combo)
         top_bar_layout.addWidget(self.edit_mode_check)
+        top_bar_layout.addWidget(self.history_check)
+        top_bar_layout.addWidget(self.search_edit)
+        top_bar_layout.addWidget(self.search_all_check)
         top_bar_layout.addStretch(1)
+        top_bar_layout.addWidget(self.rebalance_btn)
         top_bar_layout.addWidget(self.clear_clipboard_btn)
         main_layout.addWidget(top_bar_widget)
 
-        # --- Scroll Area for Sentences ---
-        self.scroll_area = QScrollArea()
-        self.scroll_area.setWidgetResizable(True)
-        self.scroll_area.setObjectName("ScrollArea")
-        self.scroll_content_widget = QWidget()
-        self.content_layout = QHBoxLayout(self.scroll_content_widget)
+        # --- Load progress (only visible while the library streams in) ---
+        self.load_progress = QProgressBar()
+        self.load_progress.setObjectName("LoadProgress")
+        self.load_progress.setTextVisible(False)
+        self.load_progress.setFixedHeight(4)
+        self.load_progress.hide()
+        main_layout.addWidget(self.load_progress)
+
+        # --- Import/export progress (only while one runs, then its result) ---
+        self.transfer_panel = QWidget()
+        transfer_layout = QHBoxLayout(self.transfer_panel)
+        transfer_layout.setContentsMargins(0, 0, 0, 0)
+        self.transfer_label = QLabel()
+        self.transfer_label.setObjectName("HistoryLabel")
+        self.transfer_progress = QProgressBar()
+        self.transfer_progress.setObjectName("LoadProgress")
+        self.transfer_progress.setTextVisible(False)
+        self.transfer_progress.setFixedHeight(4)
+        self.transfer_progress.setRange(0, 1000)
+        self.transfer_cancel_btn = QPushButton("Cancel")
+        transfer_layout.addWidget(self.transfer_label)
+        transfer_layout.addWidget(self.transfer_progress, 1)
+        transfer_layout.addWidget(self.transfer_cancel_btn)
+        self.transfer_panel.hide()
+        main_layout.addWidget(self.transfer_panel)
+        self._transfer = None  # TransferProgress of the running import/export
+        self._transfer_text = ""
+        self._transfer_timer = QTimer(self)
+        self._transfer_timer.setInterval(100)
+        self._transfer_message_timer = QTimer(self)
+        self._transfer_message_timer.setSingleShot(True)
+        self._transfer_message_timer.setInterval(5000)
+
+        # --- MODIFIED: Two column views side by side (only visible rows are painted) ---
+        self.columns_widget = QWidget()
+        self.content_layout = QHBoxLayout(self.columns_widget)
+        self.content_layout.setContentsMargins(0, 0, 0, 0)
         self.content_layout.setSpacing(8)
-        
-        # --- MODIFIED: Use standard QVBoxLayouts ---
-        self.column_1_widget = QWidget()
-        self.column_1_layout = QVBoxLayout(self.column_1_widget)
-        self.column_1_layout.setContentsMargins(0, 0, 0, 0)
-        self.column_1_layout.setSpacing(8)
-        self.column_1_layout.addStretch(1) 
-        
-        self.column_2_widget = QWidget()
-        self.column_2_layout = QVBoxLayout(self.column_2_widget)
-        self.column_2_layout.setContentsMargins(0, 0, 0, 0)
-        self.column_2_layout.setSpacing(8)
-        self.column_2_layout.addStretch(1)
-
-        self.content_layout.addWidget(self.column_1_widget, 1)
-        self.content_layout.addWidget(self.column_2_widget, 1)
-        # ---
-        
-        self.scroll_area.setWidget(self.scroll_content_widget)
-        main_layout.addWidget(self.scroll_area, 1)
+
+        self.column_1_view = SentenceColumnView(None, self.delegate)
+        self.column_2_view = SentenceColumnView(None, self.delegate)
+        self.column_views = [self.column_1_view, self.column_2_view]
+
+        self.content_layout.addWidget(self.column_1_view, 1)
+        self.content_layout.addWidget(self.column_2_view, 1)
         
         self.placeholder_label = QLabel("Click 'Add' to get started!")
         self.placeholder_label.setObjectName("PlaceholderLabel")
         self.placeholder_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        main_layout.addWidget(self.placeholder_label, 1) 
+
+        # --- Clipboard history panel (only while History is on) ---
+        self.history_panel = QWidget()
+        self.history_panel.setObjectName("HistoryPanel")
+        self.history_panel.setFixedWidth(280)
+        history_layout = QVBoxLayout(self.history_panel)
+        history_layout.setContentsMargins(0, 0, 0, 0)
+        history_label = QLabel("Clipboard History")
+        history_label.setObjectName("HistoryLabel")
+        self.history_view = SentenceColumnView(self.history_model, self.history_delegate)
+        history_layout.addWidget(history_label)
+        history_layout.addWidget(self.history_view, 1)
+        self.history_panel.hide()
+
+        # --- Matches from the other libraries (only while searching them) ---
+        self.hits_panel = QWidget()
+        self.hits_panel.setFixedWidth(280)
+        hits_layout = QVBoxLayout(self.hits_panel)
+        hits_layout.setContentsMargins(0, 0, 0, 0)
+        self.hits_label = QLabel("Other Libraries")
+        self.hits_label.setObjectName("HistoryLabel")
+        self.hits_view = SentenceColumnView(self.hits_model, self.hits_delegate)
+        hits_layout.addWidget(self.hits_label)
+        hits_layout.addWidget(self.hits_view, 1)
+        self.hits_panel.hide()
+
+        body_layout = QHBoxLayout()
+        body_layout.setSpacing(8)
+        body_layout.addWidget(self.columns_widget, 1)
+        body_layout.addWidget(self.placeholder_label, 1)
+        body_layout.addWidget(self.hits_panel)
+        body_layout.addWidget(self.history_panel)
+        main_layout.addLayout(body_layout, 1)
 
         # --- Connect Signals ---
         self.add_btn.clicked.connect(self.open_add_prompt)
         self.edit_mode_check.toggled.connect(self.toggle_edit_mode)
+        self.history_check.toggled.connect(self.set_history_enabled)
         self.clear_clipboard_btn.clicked.connect(self.clear_clipboard)
-        
-        # --- REMOVED drop signals ---
+        self._history_timer.timeout.connect(self._capture_clipboard)
+        self.history_delegate.copy_requested.connect(self.copy_history_entry)
+        self.history_delegate.promote_requested.connect(self.promote_history_entry)
+        self.search_edit.textChanged.connect(self.apply_search)
+        self.search_edit.textChanged.connect(self.schedule_other_library_search)
+        self.search_all_check.toggled.connect(self.schedule_other_library_search)
+        self._other_search_timer.timeout.connect(self.search_other_libraries)
+        self.hits_delegate.copy_requested.connect(self.copy_to_clipboard)
+        self.library_combo.activated.connect(
+            lambda i: self.open_library(self.library_combo.itemText(i)))
+        self.new_library_btn.clicked.connect(self.new_library)
+        self.sort_combo.activated.connect(lambda i: self.set_sort_order(self.sort_combo.itemData(i)))
+        self._usage_timer.timeout.connect(self.save_usage)
+        self.search_index_ready.connect(self.schedule_search_refresh)
+        self.sentences_loaded.connect(self.on_sentences_loaded)
+        self.load_finished.connect(self.on_load_finished)
+        self.import_finished.connect(self.on_import_finished)
+        self.export_finished.connect(self.on_export_finished)
+        self._transfer_timer.timeout.connect(self.update_transfer_progress)
+        self._transfer_message_timer.timeout.connect(self.transfer_panel.hide)
+        self.transfer_cancel_btn.clicked.connect(self.cancel_transfer)
+        self.delegate.copy_requested.connect(self.copy_to_clipboard)
+        self.delegate.edit_requested.connect(self.open_edit_dialog)
+        self.delegate.delete_requested.connect(self.delete_sentence)
+        self.delegate.move_up_requested.connect(self.on_move_up)
+        self.delegate.move_down_requested.connect(self.on_move_down)
+        self.delegate.switch_col_requested.connect(self.on_switch_col)
+        for view in self.column_views:
+            view.customContextMenuRequested.connect(lambda pos, view=view: self.show_bulk_menu(view, pos))
 
-        self.apply_stylesheet()
-        self.load_data()
-        self.check_empty_state() 
+        # --- Instrumentation (off unless COPYCAT_PERF=1 or Ctrl+Shift+P) ---
+        self.stall_detector = StallDetector(self)
+        self.perf_overlay = PerfOverlay(main_widget)
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, self.toggle_perf_overlay)
+        QShortcut(QKeySequence("Ctrl+Shift+E"), self, self.export_perf_trace)
+        # Text fields keep their own Ctrl+Z while they have the focus
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Undo), self, self.undo)
+        QShortcut(QKeySequence(QKeySequence.StandardKey.Redo), self, self.redo)
+        QShortcut(QKeySequence("Ctrl+Shift+V"), self, self.add_from_clipboard)
+        if perf.enabled:
+            self.stall_detector.start()
+
+        # --- Quick-paste palette and global hotkey: made in finish_startup ---
+        self.quick_palette = None
+        self.hotkey = None
+
+        # --- Other processes (the CLI, --new-instance) writing open libraries ---
+        self.file_watcher = QFileSystemWatcher(self)
+        self._sync_timer = QTimer(self)
+        self._sync_timer.setSingleShot(True)
+        self._sync_timer.setInterval(200) # A write touches the file more than once
+        self._applying = False  # external changes or undo/redo: saved separately
+        self.file_watcher.fileChanged.connect(self.schedule_external_sync)
+        self.thumbnails.ready.connect(self.on_thumbnail_ready)
+        self._sync_timer.timeout.connect(self.merge_external_changes)
+        self.search_index_ready.connect(self.schedule_external_sync)
+
+        # No library until finish_startup opens one (the palette above keeps
+        # the disabled widgets looking the same)
+        main_widget.setEnabled(False)
+        self.placeholder_label.hide()
+
+    # --- Startup ---
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_at is None:
+            self.first_paint_at = time.time()
+            QTimer.singleShot(0, self.finish_startup) # Once this frame is on screen
+
+    @perf.timed("finish_startup")
+    def finish_startup(self):
+        """The rest of __init__, run after the first paint so the window shows
+        before the icon, stylesheet, hotkey and library have been loaded."""
+        if self._startup_finished:
+            return
+        self._startup_finished = True
+        settings = QSettings("CopyCat", "CopyCat")
+        self.setWindowIcon(QIcon(resource_path("CopyCat.ico")))
+        # Quick-paste palette, kept warm for the global hotkey
+        self.quick_palette = QuickPalette()
+        self.quick_palette.copy_requested.connect(self.copy_sentence)
+        self.hotkey = GlobalHotkey(settings.value("palette/hotkey", self.DEFAULT_PALETTE_HOTKEY), self)
+        self.hotkey.activated.connect(self.toggle_palette)
+
+        self.apply_theme(self.theme)
+        for view in self.column_views + [self.history_view, self.hits_view]:
+            view.update_row_height()
+        self.history_check.setChecked(settings.value("history/enabled", False, type=bool))
+        self.refresh_library_list()
+        active = settings.value("libraries/active", DEFAULT_LIBRARY)
+        self.open_library(active if active in list_libraries() else DEFAULT_LIBRARY)
+        self.centralWidget().setEnabled(True)
+
+    # --- Libraries ---
+    @property
+    def _loading(self):
+        return self.library is None or self.library.loading
+
+    def refresh_library_list(self):
+        self.library_combo.blockSignals(True)
+        self.library_combo.clear()
+        self.library_combo.addItems(list_libraries())
+        if self.library is not None:
+            self.library_combo.setCurrentText(self.library.name)
+        self.library_combo.blockSignals(False)
+
+    def new_library(self):
+        name, ok = QInputDialog.getText(self, "New Library", "Library name:")
+        if not ok or not name.strip():
+            return
+        try:
+            name = create_library(name)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"Error creating library: {e}")
+            return
+        self.refresh_library_list()
+        self.open_library(name)
+
+    @perf.timed("open_library")
+    def open_library(self, name):
+        """Shows library `name`, loading it first if it isn't in memory."""
+        if self.library is not None:
+            if self.library.name == name:
+                return
+            # Leave the old library fully on disk, so searching it works
+            self.delegate.commit_active_editor()
+            self.store.flush()
+            self._edited_ids.clear()
+            self.library.estimate_bytes()
+        library = self.libraries.pop(name, None)
+        is_new = library is None
+        if is_new:
+            library = Library(name, self, self.undo_budget_bytes)
+            for model in library.column_models:
+                model.dataChanged.connect(self.on_sentence_edited)
+                model.text_edited.connect(
+                    lambda sentence, old_text, library=library: self.record_edit(library, sentence, old_text))
+                # Search results follow edits, moves, adds and deletes
+                for signal in (model.dataChanged, model.rowsInserted, model.rowsRemoved,
+                               model.rowsMoved, model.modelReset):
+                    signal.connect(self.schedule_search_refresh)
+                # ...and so do sorted columns (copies alone don't re-sort,
+                # so a card never jumps away from under the pointer)
+                for signal in (model.dataChanged, model.rowsInserted, model.rowsRemoved,
+                               model.rowsMoved, model.modelReset, model.layoutChanged):
+                    signal.connect(self.schedule_sort_refresh)
+        self.libraries[name] = library # Most recently used last
+
+        self.library = library
+        self.store = library.store
+        self.column_models = library.column_models
+        self.column_1_model, self.column_2_model = library.column_models
+        self.column_filters = library.column_filters
+        self.column_sorts = library.column_sorts
+        self.search_index = library.search_index
+        self.library_combo.setCurrentText(name)
+        QSettings("CopyCat", "CopyCat").setValue("libraries/active", name)
+
+        if is_new:
+            self.load_data()
+        else:
+            self.add_btn.setEnabled(not library.loading)
+            self.edit_mode_check.setEnabled(not library.loading)
+            self.load_progress.setVisible(library.loading)
+        self.apply_search(self.search_edit.text())
+        self.schedule_other_library_search()
+        self.check_empty_state()
+        self.evict_libraries()
+
+    def evict_libraries(self):
+        """Closes least recently used libraries until the open ones fit the
+        memory budget. The active library is never evicted."""
+        total = sum(library.estimated_bytes for library in self.libraries.values()
+                    if library is not self.library) + self.library.estimate_bytes()
+        for name in list(self.libraries):
+            if total <= self.library_budget_bytes:
+                break
+            library = self.libraries[name]
+            if library is self.library:
+                continue
+            total -= library.estimated_bytes
+            del self.libraries[name]
+            self.unwatch_library(library)
+            library.close()
+            perf.count("libraries_evicted")
+
+    def schedule_other_library_search(self, *args):
+        self._other_search_timer.start()
+
+    @perf.timed("search_other_libraries")
+    def search_other_libraries(self):
+        """Searches every other library's file; nothing gets loaded."""
+        query = self.search_edit.text()
+        if not self.search_all_check.isChecked() or len(query.strip()) < SearchIndex.MIN_QUERY_LENGTH:
+            self.hits_model.set_hits([])
+            self.hits_panel.hide()
+            return
+        others = [name for name in list_libraries() if name != self.library.name]
+        hits = search_libraries(query, others)
+        self.hits_model.set_hits(hits)
+        self.hits_label.setText(f"Other Libraries ({len(hits)})")
+        self.hits_panel.show()
+
+    # --- Instrumentation ---
+    def toggle_perf_overlay(self):
+        """Ctrl+Shift+P: turns profiling and its overlay on or off together."""
+        enabled = not self.perf_overlay.isVisible()
+        perf.enable(enabled)
+        if enabled:
+            self.stall_detector.start()
+        else:
+            self.stall_detector.stop()
+        self.perf_overlay.setVisible(enabled)
+
+    def export_perf_trace(self):
+        """Ctrl+Shift+E: writes a Chrome trace of what has been recorded."""
+        trace_dir = os.path.join(app_data_dir, "traces")
+        try:
+            os.makedirs(trace_dir, exist_ok=True)
+            path = perf.export(os.path.join(trace_dir, time.strftime("copycat-trace-%Y%m%d-%H%M%S.json")))
+        except OSError as e:
+            print(f"Error exporting trace: {e}")
+            return
+        print(f"Trace written to {path}")
+        self.perf_overlay.note = f"Trace: {path}"
+        if self.perf_overlay.isVisible():
+            self.perf_overlay.refresh()
 
     def open_add_prompt(self):
         dialog = AddSentenceDialog(self)
@@ -290,303 +2117,1075 @@ class MainWindow(QMainWindow):
             if text:
                 # --- MODIFIED: Call with column_index=-1 for auto-balance ---
                 self.add_sentence_card(text, column_index=-1)
-                self.save_data() 
                 self.check_empty_state() 
 
-    def add_sentence_card(self, text, column_index, widget_index=-1):
-        """Adds a card to a specific column/index or auto-balances."""
-        card = SentenceCard(text)
-        # --- NEW Connections ---
-        card.delete_requested.connect(self.delete_sentence)
-        card.move_up_requested.connect(self.on_move_up)
-        card.move_down_requested.connect(self.on_move_down)
-        card.switch_col_requested.connect(self.on_switch_col)
-        
-        target_layout = None
-        target_list = None
-        
-        if column_index == 0:
-            target_layout = self.column_1_layout
-            target_list = self.column_1_widgets
-        elif column_index == 1:
-            target_layout = self.column_2_layout
-            target_list = self.column_2_widgets
+    @perf.timed("add_sentence_card")
+    def add_sentence_card(self, text, column_index, widget_index=-1, payload=None):
+        """Adds a row to a specific column/index or auto-balances, and
+        queues it for saving. Returns the model index of the new row.
+        """
+        if column_index not in (0, 1):
+            column_index = self.shorter_column()
+        model = self.column_models[column_index]
+        row = widget_index if 0 <= widget_index <= model.rowCount() else model.rowCount()
+        sentence = Sentence(self.store.new_id(), "", payload=payload)
+        self.store.set_text(sentence, text) # Keeps only a preview of a large text
+        self.save_data(model.insert_sentence(row, sentence))
+        self.search_index.add(sentence.id, sentence.text)
+        self.library.undo.push("Add", {sentence.id: None}, {sentence.id: (column_index, row, text, 0, 0.0, payload)})
+        perf.count("sentences_added")
+        return model.index(row)
+
+    def column_height(self, column_index):
+        """Content height of a column. Rows have one fixed height, so this is
+        a running total in O(1) rather than a layout sizeHint() walk."""
+        row_height = self.column_views[column_index].verticalHeader().defaultSectionSize()
+        return len(self.column_models[column_index].items) * row_height
+
+    def shorter_column(self):
+        """Column that auto-balanced adds go to."""
+        return 0 if self.column_height(0) <= self.column_height(1) else 1
+
+    @perf.timed("rebalance_columns")
+    def rebalance_columns(self, keep_reading_order=False):
+        """Evens out the two columns in one pass, moving as few rows as possible.
+
+        By default the longer column's last rows go to the end of the other
+        one. With keep_reading_order, rows cross the column 1 -> column 2
+        boundary instead, so reading down column 1 and then column 2 gives
+        the same order as before.
+        """
+        self.delegate.commit_active_editor()
+        first, second = self.column_models
+        diff = len(first.items) - len(second.items)
+        if abs(diff) < 2:
+            return
+        source, target = (first, second) if diff > 0 else (second, first)
+        count = abs(diff) // 2
+        if keep_reading_order and source is second:
+            rows, target_row = range(count), len(target.items)
+        elif keep_reading_order:
+            rows, target_row = range(len(source.items) - count, len(source.items)), 0
+        else:
+            rows, target_row = range(len(source.items) - count, len(source.items)), len(target.items)
+        before = {source.sentence(row).id: (source.column_index, row, None, None, None, None) for row in rows}
+        sentences = source.take_rows(list(rows))
+        self.save_data(target.insert_sentences(target_row, sentences))
+        self.library.undo.push("Rebalance", before, self.location_states(self.library, before))
+        perf.count("rows_rebalanced", count)
+
+    def column_of(self, index):
+        """Returns (column_index, model) for a row index, or (-1, None)."""
+        index = self.source_index(index)
+        for column_index, model in enumerate(self.column_models):
+            if index.model() is model:
+                return column_index, model
+        return -1, None
+
+    def source_index(self, index):
+        """Maps a search-result index back to its column model."""
+        model = index.model()
+        if isinstance(model, SentenceFilterModel):
+            return model.mapToSource(index)
+        return index
+
+    @perf.timed("copy_to_clipboard")
+    def copy_to_clipboard(self, index):
+        text = index.data(Qt.ItemDataRole.DisplayRole)
+        if text is None:
+            return
+        # Read everything from the row before a template prompt: its dialog
+        # runs an event loop, in which a refresh can reset the model
+        payload = index.data(PAYLOAD_ROLE)
+        view = next((v for v in self.column_views + [self.history_view, self.hits_view]
+                     if v.model() is index.model()), None)
+        row = QPersistentModelIndex(index)
+        library = self.library
+        source = self.source_index(index)
+        column_index, model = self.column_of(source)
+        sentence = None
+        if model is not None:
+            sentence = model.sentence(source.row())
+            text = library.store.full_text(sentence) # Large texts are only read now
+            text = self.expand_template(library, sentence, text)
+        elif index.model() is self.hits_model:
+            library_name, hit = self.hits_model.hit(index.row())
+            text = self.expand_template(None, hit, self.full_text(library_name, hit))
+        if text is None:
+            return # A template prompt was cancelled: nothing was copied
+        self.put_on_clipboard(text, payload)
+        perf.count("copies")
+        if sentence is not None:
+            self.record_use(library, sentence)
+        if sentence is not None and library is self.library:
+            self.flash_sentence(sentence) # Wherever its row is now
+        elif row.isValid() and view is not None and view.model() is row.model():
+            self.feedback.flash(view, QModelIndex(row))
+
+    def expand_template(self, library, sentence, text):
+        """`text` with a template snippet's fields filled in (asking for
+        any prompts), or None if a prompt was cancelled. Anything else comes
+        back as it is. Templates are compiled once per snippet and cached
+        in `library` (None: compiled just for this copy)."""
+        if sentence.payload:
+            return text
+        if library is not None:
+            template = library.templates.get(sentence.id, text)
+        else:
+            template = compile_template(text)
+        if template is None:
+            return text
+        answers = {}
+        for label in template.prompts:
+            answer, ok = QInputDialog.getText(self, "Fill In Template", f"{label}:")
+            if not ok:
+                return None
+            answers[label] = answer
+        clipboard = QApplication.clipboard().text() if "clipboard" in template.fields else ""
+        with perf.span("template.expand"):
+            return template.expand(clipboard=clipboard, counter=sentence.uses + 1, answers=answers)
+
+    def put_on_clipboard(self, text, payload=None):
+        """Copies a snippet. A rich one goes on the clipboard with all its
+        formats, which are read from the blob store only now."""
+        mime = mime_data_for(self.blobs, payload) if payload else None
+        if mime is not None and mime.formats():
+            self._own_clipboard_text = mime.text() # Saved already; keep it out of the history
+            self._clipboard_mime = mime
+            QApplication.clipboard().setMimeData(mime)
+        else:
+            self._own_clipboard_text = text
+            QApplication.clipboard().setText(text)
+
+    def release_clipboard(self):
+        """Swaps a rich copy still on the clipboard for data Qt made itself.
+
+        PySide crashes deleting a QMimeData made in Python once the
+        interpreter has shut down, so after quitting the clipboard keeps the
+        image, or else the text, of the last rich copy.
+        """
+        clipboard = QApplication.clipboard()
+        mime = clipboard.mimeData()
+        if self._clipboard_mime is None or mime is not self._clipboard_mime:
+            return
+        self._clipboard_mime = None
+        if mime.hasImage():
+            clipboard.setImage(QImage(mime.imageData()))
+        else:
+            clipboard.setText(mime.text() or "\n".join(url.toLocalFile() or url.toString() for url in mime.urls()))
+
+    def add_from_clipboard(self):
+        """Saves what is on the clipboard as a snippet: images, HTML and
+        file lists with their formats, anything else as its text."""
+        if self._loading:
+            return
+        mime = QApplication.clipboard().mimeData()
+        if mime is None:
+            return
+        rich = rich_clipboard_formats(mime)
+        if rich is not None:
+            text, formats = rich
+            self.add_sentence_card(text, column_index=-1, payload=make_payload(self.blobs, formats))
+        elif mime.hasText() and mime.text():
+            self.add_sentence_card(mime.text(), column_index=-1)
+        else:
+            return
+        self.check_empty_state()
+
+    def on_thumbnail_ready(self, key):
+        for view in self.column_views + [self.hits_view]:
+            view.viewport().update()
+
+    def full_text(self, library_name, sentence):
+        """Full text of a sentence from any library, open or not."""
+        library = self.libraries.get(library_name)
+        store = library.store if library is not None else open_store(library=library_name)
+        return store.full_text(sentence)
+
+    def open_edit_dialog(self, index):
+        """Edits a long or multi-line row in a text editor dialog."""
+        source = self.source_index(index)
+        column_index, model = self.column_of(source)
+        if model is None:
+            return
+        sentence = model.sentence(source.row())
+        text = self.store.full_text(sentence)
+        dialog = AddSentenceDialog(self, "Edit Sentence", text)
+        if dialog.exec() and dialog.get_text() and dialog.get_text() != text:
+            row = model.row_of(sentence.id)
+            if row >= 0:
+                model.setData(model.index(row), dialog.get_text(), Qt.ItemDataRole.EditRole)
+
+    def record_use(self, library, sentence):
+        """Counts a copy of `sentence`, for the palette's frecency ranking
+        and the sort orders. The count is saved later, with the others."""
+        library.usage.record(sentence)
+        library.frecency.update(sentence)
+        if not self._usage_timer.isActive():
+            self._usage_timer.start()
+
+    def save_usage(self):
+        """Queues the copy counts of every open library in one batch each."""
+        for library in self.libraries.values():
+            library.save_usage()
+
+    # --- Quick-paste palette ---
+    def toggle_palette(self):
+        if self.quick_palette is None:
+            return
+        if self.quick_palette.isVisible():
+            self.quick_palette.hide()
+        elif self.library is not None:
+            self.quick_palette.popup(self.library)
+
+    def copy_sentence(self, library, sentence, paste=False):
+        """Copies a sentence picked outside the columns (palette, --copy)."""
+        if library.closed or library.sentence(sentence.id) is not sentence:
+            return # Evicted or deleted while the palette was open
+        text = self.expand_template(library, sentence, library.store.full_text(sentence))
+        if text is None:
+            return
+        self.put_on_clipboard(text, sentence.payload)
+        perf.count("copies")
+        self.record_use(library, sentence)
+        if library is self.library:
+            self.flash_sentence(sentence)
+        if paste:
+            # Give the app underneath a moment to get the focus back
+            QTimer.singleShot(150, self._paste)
+
+    def flash_sentence(self, sentence):
+        """Shows the copy flash on a sentence's row, if it is in view."""
+        column_index = 1 if sentence.column else 0
+        view, model = self.column_views[column_index], self.column_models[column_index]
+        index = model.index(model.row_of(sentence.id))
+        if view.model() is not model: # Searching: the view shows the filtered rows
+            index = view.model().mapFromSource(index)
+        if index.isValid():
+            self.feedback.flash(view, index)
+
+    def set_reduced_motion(self, enabled):
+        self.feedback.reduced_motion = enabled
+        QSettings("CopyCat", "CopyCat").setValue("appearance/reduced_motion", enabled)
+
+    # --- Themes ---
+    def update_theme_menu(self):
+        self.theme_menu.clear()
+        group = QActionGroup(self.theme_menu)
+        for name in list_themes():
+            action = self.theme_menu.addAction(name.capitalize() if name == name.lower() else name)
+            action.setCheckable(True)
+            action.setChecked(name == self.theme.name)
+            action.triggered.connect(lambda checked=False, name=name: self.set_theme(name))
+            group.addAction(action)
+
+    def set_theme(self, name):
+        self.apply_theme(Theme.load(name))
+        QSettings("CopyCat", "CopyCat").setValue("appearance/theme", name)
+
+    @perf.timed("apply_theme")
+    def apply_theme(self, theme):
+        """Restyles the window with a compiled Theme. Only the real widgets
+        (a few dozen, whatever the library size) take the stylesheet; the
+        rows just repaint in the new colours."""
+        self.theme = theme
+        for delegate in (self.delegate, self.hits_delegate, self.history_delegate):
+            delegate.theme = theme
+        self.setPalette(theme.palette)
+        self.setStyleSheet(theme.stylesheet)
+        if self.quick_palette is not None:
+            self.quick_palette.setPalette(theme.palette)
+            self.quick_palette.setStyleSheet(theme.stylesheet) # A separate top-level window
+        for view in self.column_views + [self.history_view, self.hits_view]:
+            view.viewport().update()
+
+    def _paste(self):
+        if not send_paste_keystroke():
+            print("Pasting needs xdotool (X11) or wtype (Wayland); the snippet was copied")
+
+    # --- Import / export ---
+    def import_file(self):
+        if self._transfer is not None or self._loading:
+            return
+        path, _ = QFileDialog.getOpenFileName(self, "Import Sentences", "", self.TRANSFER_FILTER + ";;All files (*)")
+        if path:
+            self.start_import(path)
+
+    def start_import(self, path):
+        """Reads `path` in a thread; the new sentences are added in one go at the end."""
+        library = self.library
+        existing = [s for model in library.column_models for s in model.items]
+        progress = TransferProgress()
+        self.start_transfer(progress, f"Importing {os.path.basename(path)}")
+        threading.Thread(target=self._import_worker, args=(library, path, progress, existing), daemon=True).start()
+
+    def _import_worker(self, library, path, progress, existing):
+        # --- Runs off the GUI thread: parse, and drop what the library already has ---
+        sentences, error = [], None
+        try:
+            with perf.span("import.read"):
+                seen = {content_key(library.store.full_text(s)) for s in existing}
+                # Ids and balanced columns (-1) are given out on the GUI thread
+                sentences = [Sentence(0, text, -1 if column is None else column)
+                             for text, column in dedup_rows(iter_import(path, progress=progress), seen)]
+        except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+            error = str(e)
+        self.import_finished.emit(library, sentences, error)
+
+    def on_import_finished(self, library, sentences, error):
+        progress = self.end_transfer()
+        if error:
+            message = f"Import failed: {error}"
+        elif progress.cancelled:
+            message = "Import cancelled"
+        elif library.closed:
+            message = "Import discarded: the library was closed"
+        else:
+            added, undoable = self.add_sentences(library, sentences)
+            message = f"Imported {added} sentences ({progress.rows - added} duplicates skipped)"
+            if not undoable:
+                message += "; too large to undo"
+        self.show_transfer_message(message)
+
+    @perf.timed("add_sentences")
+    def add_sentences(self, library, sentences):
+        """Appends new Sentences (id not set yet) to the ends of `library`'s
+        columns: one insert per column and one save. Sentences whose column
+        is not 0 or 1 are balanced. Returns (count, whether it can be undone)."""
+        store = library.store
+        counts = [model.rowCount() for model in library.column_models]
+        new = ([], [])
+        for sentence in sentences:
+            column = sentence.column
+            if column not in (0, 1):
+                column = 0 if counts[0] <= counts[1] else 1
+            counts[column] += 1
+            sentence.id = store.new_id()
+            store.set_text(sentence, sentence.text) # Keeps only a preview of a large text
+            new[column].append(sentence)
+        # Don't build an undo step that can't be kept anyway
+        undoable = 2 * len(sentences) * UndoCommand.STATE_BYTES <= library.undo.max_bytes
+        changed = []
+        after = {}
+        for column_index, (model, block) in enumerate(zip(library.column_models, new)):
+            first = model.rowCount()
+            changed += model.insert_sentences(-1, block)
+            if undoable:
+                after.update((s.id, (column_index, first + i, store.full_text(s), 0, 0.0, None)) for i, s in enumerate(block))
+        store.save(changed)
+        if undoable:
+            undoable = library.undo.push(f"Import {len(sentences)} Sentences", dict.fromkeys(after), after)
+        else:
+            library.undo.clear() # Earlier steps can't be undone across it
+        threading.Thread(target=self._index_sentences, args=(library, new[0] + new[1]), daemon=True).start()
+        perf.count("sentences_added", len(sentences))
+        self.check_empty_state()
+        return len(sentences), undoable
+
+    def _index_sentences(self, library, sentences):
+        # Worker thread, like _build_search_index
+        library.search_index.add_many((s.id, s.text) for s in sentences)
+        self.search_index_ready.emit()
+
+    def export_file(self):
+        if self._transfer is not None:
+            return
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export Sentences", f"{self.library.name}.txt", self.TRANSFER_FILTER)
+        if not path:
+            return
+        if not os.path.splitext(path)[1]:
+            path += selected[selected.find("*.") + 1:selected.find(")")] # Extension of the chosen filter
+        self.start_export(path)
+
+    def start_export(self, path):
+        """Writes the active library to `path` in a thread."""
+        self.delegate.commit_active_editor()
+        library = self.library
+        sentences = [s for model in library.column_models for s in model.items]
+        progress = TransferProgress(len(sentences))
+        self.start_transfer(progress, f"Exporting to {os.path.basename(path)}")
+        threading.Thread(target=self._export_worker, args=(library, path, progress, sentences), daemon=True).start()
+
+    def _export_worker(self, library, path, progress, sentences):
+        count, error = None, None
+        try:
+            with perf.span("export.write"):
+                rows = ((s.column, library.store.full_text(s)) for s in sentences)
+                count = export_texts(path, rows, progress=progress)
+        except (OSError, sqlite3.Error) as e:
+            error = str(e)
+        self.export_finished.emit(count, error)
+
+    def on_export_finished(self, count, error):
+        self.end_transfer()
+        if error:
+            message = f"Export failed: {error}"
+        else:
+            message = "Export cancelled" if count is None else f"Exported {count} sentences"
+        self.show_transfer_message(message)
+
+    def start_transfer(self, progress, text):
+        self._transfer = progress
+        self._transfer_text = text
+        self._transfer_message_timer.stop()
+        self.transfer_label.setText(text)
+        self.transfer_progress.setValue(0)
+        self.transfer_progress.show()
+        self.transfer_cancel_btn.show()
+        self.transfer_panel.show()
+        self.library_menu_btn.setEnabled(False)
+        self._transfer_timer.start()
+
+    def update_transfer_progress(self):
+        progress = self._transfer
+        if progress is None:
+            return
+        if progress.total:
+            self.transfer_progress.setValue(int(1000 * min(progress.done / progress.total, 1.0)))
+        self.transfer_label.setText(f"{self._transfer_text}: {progress.rows:,} rows")
+
+    def cancel_transfer(self):
+        if self._transfer is not None:
+            self._transfer.cancelled = True
+            self.transfer_label.setText("Cancelling...")
+
+    def end_transfer(self):
+        """Stops showing progress; returns the finished TransferProgress."""
+        progress, self._transfer = self._transfer, None
+        self._transfer_timer.stop()
+        self.library_menu_btn.setEnabled(True)
+        return progress
+
+    def show_transfer_message(self, message):
+        self.transfer_label.setText(message)
+        self.transfer_progress.hide()
+        self.transfer_cancel_btn.hide()
+        self.transfer_panel.show()
+        self._transfer_message_timer.start()
+
+    # --- Single instance and external changes ---
+    def handle_request(self, request):
+        """Runs a launch_request(): this process's own command line, or one
+        that a later launch handed over through the InstanceServer."""
+        if request.get("show"):
+            self.bring_to_front()
+        request = {key: value for key, value in request.items() if key != "show"}
+        if not request:
+            return
+        if self.library is None or self._loading or not self.library.indexed:
+            # Adds need every position, --copy and the palette the search index
+            QTimer.singleShot(100, lambda: self.handle_request(request))
+            return
+        text = request.get("add")
+        if isinstance(text, str) and text:
+            self.add_sentence_card(text, column_index=-1)
+            self.check_empty_state()
+        query = request.get("copy")
+        if isinstance(query, str) and query:
+            scores = self.search_index.search(query)
+            best = self.library.frecency.best(scores, 1) if scores else []
+            if best:
+                self.copy_sentence(self.library, self.library.sentence(best[0]))
+            else:
+                print(f"Nothing matches {query!r}")
+        if request.get("palette"):
+            self.quick_palette.popup(self.library)
+
+    def bring_to_front(self):
+        if self.isMinimized():
+            self.showNormal()
         else:
-            # Auto-balance
-            if self.column_1_layout.sizeHint().height() <= self.column_2_layout.sizeHint().height():
-                target_layout = self.column_1_layout
-                target_list = self.column_1_widgets
+            self.show()
+        self.raise_()
+        self.activateWindow()
+
+    def watch_library(self, library):
+        """Watches the library's file (and SQLite's WAL, where commits land)."""
+        paths = [path for path in (library.store.path, library.store.path + "-wal")
+                 if os.path.exists(path) and path not in self.file_watcher.files()]
+        if paths:
+            self.file_watcher.addPaths(paths)
+
+    def unwatch_library(self, library):
+        paths = [path for path in (library.store.path, library.store.path + "-wal")
+                 if path in self.file_watcher.files()]
+        if paths:
+            self.file_watcher.removePaths(paths)
+
+    def schedule_external_sync(self, *args):
+        self._sync_timer.start()
+
+    def changeEvent(self, event):
+        # Coming back to the window is when changes made elsewhere matter
+        if event.type() == QEvent.Type.ActivationChange and self.isActiveWindow():
+            self.schedule_external_sync()
+        super().changeEvent(event)
+
+    def merge_external_changes(self):
+        for library in list(self.libraries.values()):
+            if not library.loading and library.indexed:
+                self.merge_library_changes(library)
+                self.watch_library(library) # Replaced files drop out of the watch list
+
+    @perf.timed("merge_library_changes")
+    def merge_library_changes(self, library):
+        """Applies what other processes wrote to `library`'s file, row by
+        row, instead of reloading it (or overwriting their changes)."""
+        try:
+            sentences, deleted_ids = library.store.external_changes()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error reading changes to {library.name}: {e}")
+            return
+        if not sentences and not deleted_ids:
+            return
+        updated, placed = [], []
+        for incoming in sentences:
+            current = library.sentence(incoming.id)
+            library.usage.reapply(incoming, current)
+            if current is not None and (current.column, current.position) == (incoming.column, incoming.position):
+                current.text, current.body_size, current.payload = incoming.text, incoming.body_size, incoming.payload
+                current.uses, current.last_used = incoming.uses, incoming.last_used
+                updated.append(current)
             else:
-                target_layout = self.column_2_layout
-                target_list = self.column_2_widgets
-        
-        if widget_index == -1 or widget_index > len(target_list):
-            # Add to end (before stretcher)
-            widget_index = target_layout.count() - 1 
-            
-        target_layout.insertWidget(widget_index, card)
-        target_list.insert(widget_index, card)
-            
-        card.setEditMode(self.edit_mode_check.isChecked())
-        return card
+                placed.append(incoming) # New, or moved: take out the old row and place it again
+        gone = set(deleted_ids) | {s.id for s in placed}
+        changed = []
+        self._applying = True
+        try:
+            for model in library.column_models:
+                rows = [row for row in (model.row_of(i) for i in gone) if row >= 0]
+                if rows:
+                    model.take_rows(rows)
+            for sentence in placed:
+                changed += library.column_models[1 if sentence.column else 0].place_sentence(sentence)
+            for sentence in updated:
+                model = library.column_models[1 if sentence.column else 0]
+                index = model.index(model.row_of(sentence.id))
+                model.dataChanged.emit(index, index)
+        finally:
+            self._applying = False
+        for sentence_id in deleted_ids:
+            library.search_index.remove(sentence_id)
+            library.frecency.remove(sentence_id)
+        for sentence in updated + placed:
+            library.search_index.add(sentence.id, sentence.text)
+            library.frecency.update(sentence)
+        library.store.save(changed) # Only rows whose position clashed with one of ours
+        library.undo.clear() # Its steps hold row indices that may have shifted
+        perf.count("external_rows_merged", len(sentences) + len(deleted_ids))
+        if library is self.library:
+            self.check_empty_state()
+
+    # --- Clipboard history ---
+    def set_history_enabled(self, enabled):
+        """Starts or stops recording the clipboard into the history panel."""
+        clipboard = QApplication.clipboard()
+        if enabled and self.history is None:
+            self.history = ClipboardHistory(ClipboardHistoryStore(HISTORY_FILE))
+            self.history.load()
+            clipboard.dataChanged.connect(self.on_clipboard_changed)
+        elif not enabled and self.history is not None:
+            clipboard.dataChanged.disconnect(self.on_clipboard_changed)
+            self._history_timer.stop()
+            self.history.store.close()
+            self.history = None # Nothing is kept in memory while off
+        self.history_model.set_history(self.history)
+        self.history_panel.setVisible(enabled)
+        QSettings("CopyCat", "CopyCat").setValue("history/enabled", enabled)
+
+    def on_clipboard_changed(self):
+        # Apps often set the clipboard several times per copy; record once
+        self._history_timer.start()
+
+    def _capture_clipboard(self):
+        if self.history is None:
+            return
+        mime = QApplication.clipboard().mimeData()
+        if mime is None or not mime.hasText():
+            return
+        text = mime.text()
+        if text == self._own_clipboard_text:
+            return
+        self._own_clipboard_text = None
+        if self.history.record(text) is not None:
+            self.history_model.refresh()
 
+    def copy_history_entry(self, index):
+        entry = self.history_model.entry(index.row())
+        self.copy_to_clipboard(index)
+        self.history.record(entry.text) # Re-using an entry keeps it fresh
+        if index.row() != 0:
+            self.history_model.refresh()
+
+    def promote_history_entry(self, index):
+        """Saves a history entry as a permanent sentence."""
+        text = self.history_model.entry(index.row()).text
+        self.add_sentence_card(text, column_index=-1)
+        self.check_empty_state()
+        perf.count("history_promoted")
+
+    @perf.timed("toggle_edit_mode")
     def toggle_edit_mode(self, is_edit):
         if not is_edit:
             # When turning edit mode *off*, save text changes
             self.save_edits()
-            
-        for card in self.get_all_widgets():
-            card.setEditMode(is_edit)
+        else:
+            self._edited_ids.clear()
+
+        # Only the visible rows repaint; no per-row widgets to show or hide
+        self.delegate.set_edit_mode(is_edit)
+        self.rebalance_btn.setVisible(is_edit)
+        for view in self.column_views:
+            view.set_edit_mode(is_edit)
 
     def save_edits(self):
-        """Saves text changes from edit fields. Does NOT reorder."""
-        for card in self.get_all_widgets():
-            card.set_text(card.get_text_from_entry())
-        self.save_data()
-        print("Text edits saved.")
+        """Saves text changes from the open editor. Does NOT reorder."""
+        # Committing emits dataChanged, which queues the edited row. Rows
+        # are queued as they are edited, so only they are ever written.
+        self.delegate.commit_active_editor()
+        if self._edited_ids:
+            with perf.span("save_edits.flush"):
+                self.store.flush()
+            perf.count("edits_saved", len(self._edited_ids))
+        self._edited_ids.clear()
+
+    def on_sentence_edited(self, top_left, bottom_right, roles=()):
+        if self._applying:
+            return # Already on disk
+        model = top_left.model()
+        sentences = [model.sentence(row) for row in range(top_left.row(), bottom_right.row() + 1)]
+        self.save_data(sentences)
+        for sentence in sentences:
+            self._edited_ids.add(sentence.id)
+            self.search_index.add(sentence.id, sentence.text)
+            self.library.templates.discard(sentence.id)
+
+    @perf.timed("apply_search")
+    def apply_search(self, query):
+        """Filters both columns to the ranked matches for `query`."""
+        scores = self.search_index.search(query)
+        self._search_active = scores is not None
+        self.delegate.commit_active_editor()
+        for view, model, results, sort in zip(self.column_views, self.column_models,
+                                              self.column_filters, self.column_sorts):
+            if scores is not None:
+                results.set_scores(scores)
+                view.show_model(results)
+            elif self.sort_order != "manual" and not self._loading:
+                sort.sort_by(self.sort_order)
+                view.show_model(sort)
+            else:
+                view.show_model(model)
+            for proxy in (results, sort):
+                if view.model() is not proxy and proxy.rowCount():
+                    proxy.set_rows([]) # Hidden proxies follow no rows
+
+    def schedule_search_refresh(self, *args):
+        # Deferred, so a refresh never resets the view in the middle of an edit
+        if self._search_refresh_pending or not self._search_active:
+            return
+        self._search_refresh_pending = True
+        QTimer.singleShot(0, self._refresh_search)
+
+    def _refresh_search(self):
+        self._search_refresh_pending = False
+        self.apply_search(self.search_edit.text())
+
+    # --- Sort orders ---
+    def set_sort_order(self, order):
+        """Shows both columns in one of SORT_ORDERS. Picking an order again
+        re-sorts it, e.g. to bring the latest copies up."""
+        self.sort_order = order
+        QSettings("CopyCat", "CopyCat").setValue("view/sort_order", order)
+        self.sort_combo.setCurrentIndex(SORT_ORDERS.index(order))
+        # Moving a row one step only means something in the manual order
+        self.delegate.reorder_enabled = order == "manual"
+        with perf.span("sort"):
+            self.apply_search(self.search_edit.text())
+        for view in self.column_views:
+            view.viewport().update()
+
+    def schedule_sort_refresh(self, *args):
+        # Deferred like the search refresh; a burst of changes sorts once
+        if self._sort_refresh_pending or self.sort_order == "manual" or self._search_active:
+            return
+        self._sort_refresh_pending = True
+        QTimer.singleShot(0, self._refresh_sort)
+
+    def _refresh_sort(self):
+        self._sort_refresh_pending = False
+        if self.sort_order == "manual" or self._search_active or self._loading:
+            return # A loading library shows its manual order until it is all in
+        self.delegate.commit_active_editor()
+        for sort in self.column_sorts:
+            sort.sort_by(self.sort_order)
 
     def clear_clipboard(self):
         # (Unchanged)
         clipboard = QApplication.clipboard()
         clipboard.clear()
-        print("Clipboard cleared")
+        perf.count("clipboard_cleared")
 
     def load_data(self):
-        # (Unchanged, but logic now works with new add_sentence_card)
-        try:
-            with open(DATA_FILE, "r") as f:
-                data = json.load(f)
-            
-            if isinstance(data, dict):
-                col1_sentences = data.get("col1", [])
-                col2_sentences = data.get("col2", [])
-                
-                for i, text in enumerate(col1_sentences):
-                    self.add_sentence_card(str(text), column_index=0, widget_index=i)
-                for i, text in enumerate(col2_sentences):
-                    self.add_sentence_card(str(text), column_index=1, widget_index=i)
-            
-            elif isinstance(data, list): # Legacy support
-                for text in data:
-                    self.add_sentence_card(str(text), column_index=-1) # Auto-balance
-                self.save_data() # Re-save in new format
-        
-        except (FileNotFoundError, json.JSONDecodeError):
-            print("No data file found, starting empty.")
+        """Starts loading in a worker thread and returns immediately.
 
-    def save_data(self):
-        # (Unchanged)
-        data_to_save = {
-            "col1": [card.text_content for card in self.column_1_widgets],
-            "col2": [card.text_content for card in self.column_2_widgets]
-        }
-        
+        Rows arrive through sentences_loaded, the visible ones first, and
+        load_finished fires once everything is in.
+        """
+        library = self.library
+        library.loading = True
+        library.load_started = time.perf_counter()
+        self.thumbnails.pause() # Loading first; the previews can wait
+        # Adds and reorders wait until every position is known
+        self.add_btn.setEnabled(False)
+        self.edit_mode_check.setEnabled(False)
+        self.load_progress.setRange(0, 0)
+        self.load_progress.show()
+        row_height = self.column_1_view.verticalHeader().defaultSectionSize()
+        first_rows = self.height() // max(row_height, 1) + 2
+        threading.Thread(target=self._load_worker, args=(library, first_rows), daemon=True).start()
+
+    def _load_worker(self, library, first_rows):
+        # --- Runs off the GUI thread (migrates sentences.json once) ---
         try:
-            with open(DATA_FILE, "w") as f:
-                json.dump(data_to_save, f, indent=4)
-            print("Data saved.")
-        except IOError as e:
-            print(f"Error saving data: {e}")
+            for sentences, total in library.store.iter_load(first_rows=first_rows):
+                if library.load_cancelled:
+                    return
+                self.sentences_loaded.emit(library, sentences, total)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error loading data: {e}")
+        if not library.load_cancelled:
+            self.load_finished.emit(library)
 
-    def delete_sentence(self):
-        # (Unchanged)
-        card_to_delete = self.sender()
-        if card_to_delete in self.column_1_widgets:
-            self.column_1_widgets.remove(card_to_delete)
-        elif card_to_delete in self.column_2_widgets:
-            self.column_2_widgets.remove(card_to_delete)
-        else:
-            return 
+    @perf.timed("on_sentences_loaded")
+    def on_sentences_loaded(self, library, sentences, total):
+        if library.closed:
+            return # Evicted while it was loading
+        first_batch = library.sentence_count() == 0
+        for column_index, model in enumerate(library.column_models):
+            model.append_sentences([s for s in sentences if s.column == column_index])
+        if first_batch:
+            perf.record("load_data.first_rows", library.load_started, time.perf_counter())
+        if library is self.library:
+            self.load_progress.setRange(0, total)
+            self.load_progress.setValue(self.sentence_count())
+
+    def on_load_finished(self, library):
+        if library.closed:
+            return
+        library.loading = False
+        perf.record("load_data", library.load_started, time.perf_counter())
+        if not any(other.loading for other in self.libraries.values()):
+            self.thumbnails.resume()
+        if library is self.library:
+            self.add_btn.setEnabled(True)
+            self.edit_mode_check.setEnabled(True)
+            self.load_progress.hide()
+            self.check_empty_state()
+            if self.sort_order != "manual":
+                self.apply_search(self.search_edit.text()) # Now it can be sorted
+        library.frecency.build(s for model in library.column_models for s in model.items)
+        self.watch_library(library)
+        # Build the search index without holding up the GUI
+        items = [(s.id, s.text) for model in library.column_models for s in model.sentences()]
+        threading.Thread(target=self._build_search_index, args=(library, items), daemon=True).start()
+        self.evict_libraries() # Its size is known now
+
+    def _build_search_index(self, library, items):
+        # Runs in a worker thread; the signal is delivered on the GUI thread
+        library.search_index.build(items)
+        library.indexed = True
+        self.search_index_ready.emit()
+
+    @perf.timed("save_data")
+    def save_data(self, sentences=(), deleted_ids=()):
+        """Queues only what changed; the store writes it off the GUI thread."""
+        if sentences:
+            self.store.save(sentences)
+        if deleted_ids:
+            self.store.delete(deleted_ids)
+
+    def closeEvent(self, event):
+        self.cancel_transfer()
+        self._sync_timer.stop()
+        self._usage_timer.stop() # Closing each library saves its counts
+        self.delegate.commit_active_editor()
+        for library in self.libraries.values():
+            library.close() # Flushes pending writes
+        if self.history is not None:
+            self.history.store.close()
+        if self.hotkey is not None:
+            self.hotkey.unregister()
+            self.quick_palette.close()
+        self.thumbnails.shutdown()
+        self.release_clipboard()
+        super().closeEvent(event)
+
+    def delete_sentence(self, index):
+        index = self.source_index(index)
+        column_index, model = self.column_of(index)
+        if model is None:
+            return
+        self.delete_rows(column_index, [index.row()])
 
-        card_to_delete.deleteLater() 
-        self.save_data()                             
-        print("Sentence deleted.")
-        self.check_empty_state() 
-            
     def check_empty_state(self):
-        # (Unchanged)
-        if not self.get_all_widgets():
-            self.scroll_area.hide()
+        if not self._loading and self.sentence_count() == 0:
+            self.columns_widget.hide()
             self.placeholder_label.show()
         else:
-            self.scroll_area.show()
+            self.columns_widget.show()
             self.placeholder_label.hide()
             
-    def get_all_widgets(self):
-        # (Unchanged)
-        return self.column_1_widgets + self.column_2_widgets
+    def sentence_count(self):
+        return self.column_1_model.rowCount() + self.column_2_model.rowCount()
         
-    # --- NEW Button Handlers ---
-    def on_move_up(self):
-        card = self.sender()
-        
-        target_list, target_layout = None, None
-        if card in self.column_1_widgets:
-            target_list, target_layout = self.column_1_widgets, self.column_1_layout
-        elif card in self.column_2_widgets:
-            target_list, target_layout = self.column_2_widgets, self.column_2_layout
-        else:
+    # --- Button Handlers (rows are now addressed by model index) ---
+    @perf.timed("on_move_up")
+    def on_move_up(self, index):
+        index = self.source_index(index)
+        column_index, model = self.column_of(index)
+        if model is None:
             return # Should not happen
 
-        index = target_list.index(card)
-        if index > 0: # Can move up
-            # Swap in list
-            target_list[index], target_list[index - 1] = target_list[index - 1], target_list[index]
-            # Swap in layout
-            target_layout.removeWidget(card)
-            target_layout.insertWidget(index - 1, card)
-            self.save_data()
+        row = index.row()
+        if row > 0: # Can move up
+            before = self.location_states(self.library, [model.sentence(row).id])
+            self.save_data(model.move_row(row, row - 1))
+            self.record_move(before)
             
-    def on_move_down(self):
-        card = self.sender()
-        
-        target_list, target_layout = None, None
-        if card in self.column_1_widgets:
-            target_list, target_layout = self.column_1_widgets, self.column_1_layout
-        elif card in self.column_2_widgets:
-            target_list, target_layout = self.column_2_widgets, self.column_2_layout
-        else:
+    @perf.timed("on_move_down")
+    def on_move_down(self, index):
+        index = self.source_index(index)
+        column_index, model = self.column_of(index)
+        if model is None:
             return
 
-        index = target_list.index(card)
-        if index < len(target_list) - 1: # Can move down
-            # Swap in list
-            target_list[index], target_list[index + 1] = target_list[index + 1], target_list[index]
-            # Swap in layout
-            target_layout.removeWidget(card)
-            target_layout.insertWidget(index + 1, card)
-            self.save_data()
+        row = index.row()
+        if row < model.rowCount() - 1: # Can move down
+            before = self.location_states(self.library, [model.sentence(row).id])
+            self.save_data(model.move_row(row, row + 1))
+            self.record_move(before)
 
-    def on_switch_col(self):
-        card = self.sender()
-        
-        if card in self.column_1_widgets:
-            # Remove from col 1
-            self.column_1_widgets.remove(card)
-            self.column_1_layout.removeWidget(card)
-            # Add to top of col 2
-            self.column_2_widgets.insert(0, card)
-            self.column_2_layout.insertWidget(0, card)
-        elif card in self.column_2_widgets:
-            # Remove from col 2
-            self.column_2_widgets.remove(card)
-            self.column_2_layout.removeWidget(card)
-            # Add to top of col 1
-            self.column_1_widgets.insert(0, card)
-            self.column_1_layout.insertWidget(0, card)
-        
-        self.save_data()
+    @perf.timed("on_switch_col")
+    def on_switch_col(self, index):
+        index = self.source_index(index)
+        column_index, model = self.column_of(index)
+        if model is None:
+            return
+        self.switch_rows(column_index, [index.row()])
 
-    # --- apply_stylesheet ---
-    def apply_stylesheet(self):
-        # --- MODIFIED: Added styles for new buttons ---
-        style = """
-        /* ... (Main styles are unchanged) ... */
-        
-        QMainWindow, QWidget {
-            background-color: #000000; color: #F0F0F0;
-            font-family: Inter, Segoe UI, sans-serif; font-size: 10pt;
-        }
-        QPushButton {
-            background-color: #2A2A2A; color: #F0F0F0;
-            border: 1px solid #333333; border-radius: 8px;
-            padding: 8px 16px; font-weight: 500;
-        }
-        QPushButton:hover { background-color: #3A3A3A; }
-        QPushButton:pressed { background-color: #4A4A4A; }
-        QPushButton#AddButton {
-            background-color: #007AFF; color: white; border: none;
-        }
-        QPushButton#AddButton:hover {
-            background-color: #006DE0;
-        }
-        QCheckBox {
-            spacing: 8px; padding: 8px 0; color: #F0F0F0;
-        }
-        QCheckBox::indicator { width: 20px; height: 20px; }
-        QScrollArea { border: none; }
-        QScrollArea QWidget { background-color: transparent; }
-        
-        /* ... (Scrollbar styles are unchanged) ... */
-        QScrollBar:vertical {
-            border: none; background-color: #000000;
-            width: 10px; margin: 0px 0px 0px 0px;
-        }
-        QScrollBar::handle:vertical {
-            background-color: #3A3A3A; border-radius: 5px;
-            min-height: 20px;
-        }
-        /* ... (rest of scrollbar) ... */
+    # --- Multi-select bulk operations (one model update, one persist) ---
+    def selected_rows(self, view):
+        """Column rows selected in a view, ascending."""
+        return sorted(self.source_index(index).row() for index in view.selectionModel().selectedRows())
 
+    def show_bulk_menu(self, view, pos):
+        if not self.delegate.edit_mode:
+            return
+        column_index = self.column_views.index(view)
+        rows = self.selected_rows(view)
+        index = view.indexAt(pos)
+        if index.isValid() and self.source_index(index).row() not in rows:
+            rows = [self.source_index(index).row()]
+        if not rows:
+            return
 
-        /* --- Sentence Card --- */
-        QFrame#SentenceCard {
-            background-color: #1C1C1C; border-radius: 12px;
-            border: 1px solid #333333;
-        }
-        QLabel { background-color: transparent; color: #F0F0F0; }
-        
-        /* --- REMOVED Drag Handle Style --- */
-        
-        QLabel#PlaceholderLabel {
-            color: #555555; font-size: 14pt;
-        }
-        QFrame#FlashOverlay {
-            background-color: #FFFFFF; border-radius: 12px; border: none;
-        }
-        
-        /* --- Card Buttons --- */
-        QPushButton#CopyButton {
-            background-color: #3A4C5F; color: #79B8FF;
-            font-weight: 600; border: none;
-            padding: 8px 10px; border-radius: 6px;
-        }
-        QPushButton#CopyButton:hover { background-color: #4A5C6F; }
-                
-        QPushButton#DeleteButton {
-            background-color: #5C2B2B; color: #FF8A8A;
-            border: none; padding: 8px 10px; border-radius: 6px;
-        }
-        QPushButton#DeleteButton:hover { background-color: #7C3B3B; }
-
-        /* --- NEW: Reorder Button Styles --- */
-        QPushButton#MoveUpButton, QPushButton#MoveDownButton, QPushButton#SwitchColButton {
-            background-color: #333333;
-            color: #AAAAAA;
-            font-weight: 600;
-            border: 1px solid #444444;
-            padding: 4px; /* Reset padding */
-            border-radius: 6px;
-        }
-        QPushButton#MoveUpButton:hover, QPushButton#MoveDownButton:hover, QPushButton#SwitchColButton:hover {
-            background-color: #444444;
-            color: #FFFFFF;
-        }
-        /* --- */
+        count = len(self.column_models[column_index].items)
+        menu = QMenu(self)
+        if self.sort_order == "manual":
+            menu.addAction("Move to Top", lambda: self.move_rows(column_index, rows, 0))
+            menu.addAction("Move to Bottom", lambda: self.move_rows(column_index, rows, count - len(rows)))
+            menu.addAction("Move to Position...", lambda: self.prompt_move_rows(column_index, rows))
+        menu.addAction("Switch Column", lambda: self.switch_rows(column_index, rows))
+        menu.addSeparator()
+        delete_label = "Delete" if len(rows) == 1 else f"Delete {len(rows)} Sentences"
+        menu.addAction(delete_label, lambda: self.delete_rows(column_index, rows))
+        menu.exec(view.viewport().mapToGlobal(pos))
 
-        /* --- Text Input Fields --- */
-        QLineEdit {
-            background-color: #1A1A1A; border: 1px solid #333333;
-            border-radius: 8px; padding: 8px 12px;
-            font-size: 10pt; color: #F0F0F0;
-        }
-        QLineEdit:focus { border: 1px solid #007AFF; }
-        
-        /* --- Add Sentence Dialog --- */
-        QDialog#AddDialog { background-color: #000000; }
-        QLineEdit#DialogEntry { font-size: 11pt; padding: 12px; }
-        QPushButton#DialogSaveButton {
-            background-color: #007AFF; color: white; border: none;
-            font-weight: 600; padding: 10px 20px;
-        }
-        QPushButton#DialogSaveButton:hover { background-color: #006DE0; }
-        """
-        self.setStyleSheet(style)
+    def prompt_move_rows(self, column_index, rows):
+        last = len(self.column_models[column_index].items) - len(rows) + 1
+        position, ok = QInputDialog.getInt(self, "Move to Position", f"Row (1-{last}):", 1, 1, last)
+        if ok:
+            self.move_rows(column_index, rows, position - 1)
+
+    @perf.timed("move_rows")
+    def move_rows(self, column_index, rows, target_row):
+        """Moves rows as one block so it starts at `target_row`."""
+        self.delegate.commit_active_editor()
+        model = self.column_models[column_index]
+        before = self.location_states(self.library, [model.sentence(row).id for row in rows])
+        self.save_data(model.move_rows(rows, target_row))
+        self.record_move(before)
+
+    def switch_rows(self, column_index, rows):
+        """Moves rows to the top of the other column, keeping their order."""
+        self.delegate.commit_active_editor()
+        before = self.location_states(self.library, [self.column_models[column_index].sentence(row).id for row in rows])
+        sentences = self.column_models[column_index].take_rows(rows)
+        self.save_data(self.column_models[1 - column_index].insert_sentences(0, sentences))
+        self.record_move(before)
+
+    @perf.timed("delete_rows")
+    def delete_rows(self, column_index, rows):
+        self.delegate.commit_active_editor()
+        model = self.column_models[column_index]
+        before = {}
+        for row in sorted(rows):
+            s = model.sentence(row) # The text is kept for undo; a large one is read in full
+            before[s.id] = (column_index, row, self.store.full_text(s), s.uses, s.last_used, s.payload)
+        sentences = model.take_rows(rows)
+        self.save_data(deleted_ids=[s.id for s in sentences])
+        self.library.undo.push("Delete" if len(sentences) == 1 else f"Delete {len(sentences)} Sentences",
+                               before, dict.fromkeys(before))
+        for sentence in sentences:
+            self.search_index.remove(sentence.id)
+            self.library.frecency.remove(sentence.id)
+        perf.count("sentences_deleted", len(sentences))
+        self.check_empty_state()
+
+    # --- Undo / redo ---
+    def location_states(self, library, ids):
+        """{id: (column, row, None, None, None, None)}: where loaded sentences are,
+        as undo states that leave text and copy counts alone."""
+        states = {}
+        for sentence_id in ids:
+            for column_index, model in enumerate(library.column_models):
+                row = model.row_of(sentence_id)
+                if row >= 0:
+                    states[sentence_id] = (column_index, row, None, None, None, None)
+                    break
+        return states
+
+    def record_move(self, before):
+        """Pushes a move of the sentences in `before` (their locations before
+        it). Moving the same rows again folds into the same undo step."""
+        self.library.undo.push("Move", before, self.location_states(self.library, before),
+                               merge_key=("move", frozenset(before)))
+
+    def record_edit(self, library, sentence, old_text):
+        column_index = 1 if sentence.column else 0
+        row = library.column_models[column_index].row_of(sentence.id)
+        library.undo.push("Edit", {sentence.id: (column_index, row, old_text, None, None, None)},
+                          {sentence.id: (column_index, row, library.store.full_text(sentence), None, None, None)})
+
+    def undo(self):
+        if self.library is None or self._loading:
+            return
+        command = self.library.undo.undo()
+        if command is not None:
+            self.apply_row_states(self.library, command.before)
+            perf.count("undos")
+
+    def redo(self):
+        if self.library is None or self._loading:
+            return
+        command = self.library.undo.redo()
+        if command is not None:
+            self.apply_row_states(self.library, command.after)
+            perf.count("redos")
+
+    def update_undo_actions(self):
+        undo_label = self.library.undo.undo_label() if self.library is not None else None
+        redo_label = self.library.undo.redo_label() if self.library is not None else None
+        self.undo_action.setText(f"Undo {undo_label}" if undo_label else "Undo")
+        self.undo_action.setEnabled(undo_label is not None and not self._loading)
+        self.redo_action.setText(f"Redo {redo_label}" if redo_label else "Redo")
+        self.redo_action.setEnabled(redo_label is not None and not self._loading)
+
+    @perf.timed("apply_row_states")
+    def apply_row_states(self, library, states):
+        """Puts sentences back as undo `states` describe them: {id: (column,
+        row, text, uses, last_used, payload)}, or None for sentences that must go."""
+        self.delegate.commit_active_editor()
+        store = library.store
+        located = {}  # id -> (column, row, sentence), before anything changes
+        for column_index, model in enumerate(library.column_models):
+            for sentence_id in states:
+                row = model.row_of(sentence_id)
+                if row >= 0:
+                    located[sentence_id] = (column_index, row, model.sentence(row))
+        sentences = {sentence_id: found[2] for sentence_id, found in located.items()}
+        # An edit leaves every row where it is; anything else takes the rows
+        # out and puts them back at their old indices
+        in_place = all(state is not None and sentence_id in located and located[sentence_id][:2] == state[:2]
+                       for sentence_id, state in states.items())
+        changed = {}
+        reindex = []  # new text, or back from the dead
+        self._applying = True
+        try:
+            if not in_place:
+                for column_index, model in enumerate(library.column_models):
+                    rows = [row for column, row, _ in located.values() if column == column_index]
+                    if rows:
+                        model.take_rows(rows)
+                targets = sorted((state[0], state[1], i) for i, state in states.items() if state is not None)
+                # In ascending order each row lands on its old index; runs go in as one block
+                for column_index, group in itertools.groupby(targets, key=lambda target: target[0]):
+                    model = library.column_models[column_index]
+                    runs = []
+                    for _, row, sentence_id in group:
+                        sentence = sentences.setdefault(sentence_id, Sentence(sentence_id, ""))
+                        if runs and row == runs[-1][0] + len(runs[-1][1]):
+                            runs[-1][1].append(sentence)
+                        else:
+                            runs.append((row, [sentence]))
+                    for row, block in runs:
+                        for s in model.insert_sentences(min(row, model.rowCount()), block):
+                            changed[s.id] = s
+            for sentence_id, state in states.items():
+                if state is None:
+                    continue
+                sentence = sentences[sentence_id]
+                column_index, row, text, uses, last_used, payload = state
+                if payload is not None:
+                    sentence.payload = payload
+                if text is not None:
+                    store.set_text(sentence, text)
+                if uses is not None:
+                    sentence.uses, sentence.last_used = uses, last_used
+                if text is not None or sentence_id not in located:
+                    reindex.append(sentence)
+                changed[sentence_id] = sentence
+                if in_place:
+                    model = library.column_models[column_index]
+                    model.dataChanged.emit(model.index(row), model.index(row))
+        finally:
+            self._applying = False
+        gone = [sentence_id for sentence_id, state in states.items() if state is None and sentence_id in located]
+        store.save(changed.values())
+        store.delete(gone)
+        for sentence_id in gone:
+            library.search_index.remove(sentence_id)
+            library.frecency.remove(sentence_id)
+        for sentence in reindex:
+            library.search_index.add(sentence.id, sentence.text)
+            library.frecency.update(sentence)
+        if library is self.library:
+            self.check_empty_state()
 
 
 # --- 5. Run the Application ---
+def report_startup(window, path):
+    """For benchmarks/bench_startup.py: once the first library has loaded,
+    writes when the window first painted and when it became ready (as
+    time.time()) to `path`, then closes the window."""
+    def write(library):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"first_paint": window.first_paint_at, "ready": time.time()}, f)
+        window.close()
+    window.load_finished.connect(write)
+
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = MainWindow()
+    instance_server = InstanceServer(window)
+    instance_server.request_received.connect(window.handle_request)
+    if not NEW_INSTANCE:
+        instance_server.listen()
+    if os.environ.get("COPYCAT_STARTUP_REPORT"):
+        report_startup(window, os.environ["COPYCAT_STARTUP_REPORT"])
     window.show()
+    window.handle_request(LAUNCH_REQUEST)
     sys.exit(app.exec())
\ No newline at end of file
@@ -1,39 +1,91 @@
-# -*- mode: python ; coding: utf-8 -*-
-
-
-a = Analysis(
-    ['CopyCat.py'],
-    pathex=[],
-    binaries=[],
-    datas=[('CopyCat.ico', '.')],
-    hiddenimports=[],
-    hookspath=[],
-    hooksconfig={},
-    runtime_hooks=[],
-    excludes=[],
-    noarchive=False,
-    optimize=0,
-)
-pyz = PYZ(a.pure)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.datas,
-    [],
-    name='CopyCat',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon=['CopyCat.ico'],
-)
+# -*- mode: python ; coding: utf-8 -*-
+# Startup-optimized build:
+#   pyinstaller CopyCat.spec                      -> dist/CopyCat/CopyCat.exe (onedir)
+#   COPYCAT_ONEFILE=1 pyinstaller CopyCat.spec    -> dist/CopyCat.exe (one file)
+# The onedir layout starts faster: a one-file EXE unpacks every bundled DLL to
+# a temp folder on each launch. UPX stays off because decompressing the Qt
+# DLLs costs more at startup than it saves on disk (and breaks some Qt plugins).
+# Time a build with: python benchmarks/bench_startup.py --exe dist/CopyCat/CopyCat.exe
+import os
+
+ONEFILE = os.environ.get("COPYCAT_ONEFILE") == "1"
+
+# CopyCat uses QtCore, QtGui, QtWidgets and QtNetwork (single instance);
+# keep the rest of PySide6 and its plugins out of the bundle
+QT_EXCLUDES = [f"PySide6.{name}" for name in (
+    "Qt3DAnimation", "Qt3DCore", "Qt3DExtras", "Qt3DInput", "Qt3DLogic", "Qt3DRender",
+    "QtBluetooth", "QtCharts", "QtConcurrent", "QtDataVisualization", "QtDBus", "QtDesigner",
+    "QtGraphs", "QtHelp", "QtHttpServer", "QtLocation", "QtMultimedia", "QtMultimediaWidgets",
+    "QtNetworkAuth", "QtNfc", "QtOpenGL", "QtOpenGLWidgets", "QtPdf", "QtPdfWidgets",
+    "QtPositioning", "QtPrintSupport", "QtQml", "QtQuick", "QtQuick3D", "QtQuickControls2",
+    "QtQuickWidgets", "QtRemoteObjects", "QtScxml", "QtSensors", "QtSerialBus", "QtSerialPort",
+    "QtSpatialAudio", "QtSql", "QtStateMachine", "QtSvg", "QtSvgWidgets", "QtTest",
+    "QtTextToSpeech", "QtUiTools", "QtWebChannel", "QtWebEngineCore", "QtWebEngineQuick",
+    "QtWebEngineWidgets", "QtWebSockets", "QtWebView", "QtXml",
+)]
+
+a = Analysis(
+    ['CopyCat.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('CopyCat.ico', '.')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=QT_EXCLUDES + ['tkinter', 'unittest', 'pydoc', 'doctest'],
+    noarchive=False,
+    optimize=2,  # no asserts or docstrings; nothing reads __doc__ at runtime
+)
+pyz = PYZ(a.pure)
+
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name='CopyCat',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        runtime_tmpdir=None,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon=['CopyCat.ico'],
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name='CopyCat',
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=False,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+        icon=['CopyCat.ico'],
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        upx_exclude=[],
+        name='CopyCat',
+    )
@@ -0,0 +1,221 @@
+"""Offscreen benchmarks for CopyCat's load, render, reorder and save paths.
+
+    python benchmarks/bench_copycat.py                  # 1k, 10k and 100k rows
+    python benchmarks/bench_copycat.py --sizes 1000     # just one library size
+    python benchmarks/bench_copycat.py --update-baseline
+
+Each library size runs in its own child process (so peak RSS is per size)
+against a synthetic SQLite library in a temporary data folder. Results are
+compared with benchmarks/baseline.json; a metric slower than the baseline by
+more than --tolerance (and by more than a small absolute slack) fails the
+run. The first run, or --update-baseline, records the baseline instead.
+Baselines are machine-specific, so they are not committed.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+DEFAULT_SIZES = (1000, 10000, 100000)
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+REPEATS = 50
+# Differences below these never count as regressions (timer/RSS noise)
+SLACK_MS = 2.0
+SLACK_KB = 8 * 1024
+
+
+def populate(data_dir, size):
+    """Writes a synthetic library of `size` sentences, split over both columns."""
+    from copycat_core import SqliteSentenceStore, POSITION_STEP
+    store = SqliteSentenceStore(os.path.join(data_dir, "sentences.db"))
+    conn = store._connect()
+    words = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu".split()
+    rows = []
+    for i in range(size):
+        text = " ".join(words[(i * 7 + k) % len(words)] for k in range(4 + i % 9)) + f" #{i}"
+        uses = i % 7 if i % 3 == 0 else 0  # a third copied, for the sort views
+        rows.append((i + 1, i % 2, (i // 2) * POSITION_STEP, text, uses, uses * 3600.0 + i))
+    with conn:
+        conn.executemany("INSERT INTO sentences (id, col, pos, text, uses, last_used) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.close()
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None # Windows: no getrusage
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # macOS reports bytes
+
+
+def run_child(size):
+    """Drives one MainWindow over a `size`-row library; returns {metric: value}."""
+    import contextlib
+    import io
+    sys.path.insert(0, ROOT)
+    from PySide6.QtCore import QObject, QEvent, qInstallMessageHandler
+    from PySide6.QtWidgets import QApplication
+    import CopyCat
+
+    app = QApplication.instance() or QApplication([])
+    qInstallMessageHandler(lambda *args: None)  # offscreen "does not support raise()" etc.
+    results = {}
+    quiet = contextlib.redirect_stdout(io.StringIO())  # the app prints per operation
+
+    def median_ms(action, repeats=REPEATS):
+        samples = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            with quiet:
+                action(i)
+            app.processEvents()  # include the repaint the user waits for
+            samples.append((time.perf_counter() - start) * 1000)
+        return round(statistics.median(samples), 3)
+
+    class FirstPaint(QObject):
+        """Notes when the first column paints with rows in it."""
+        painted_at = None
+
+        def eventFilter(self, obj, event):
+            if (self.painted_at is None and event.type() == QEvent.Type.Paint
+                    and window.library is not None and window.column_1_model.rowCount() > 0):
+                self.painted_at = time.perf_counter()
+            return False
+
+    # --- load_data and time-to-first-paint ---
+    start = time.perf_counter()
+    with quiet:
+        window = CopyCat.MainWindow()
+    index_ready = []
+    window.search_index_ready.connect(lambda: index_ready.append(True))
+    watcher = FirstPaint()
+    window.column_1_view.viewport().installEventFilter(watcher)
+    window.show()
+    while window._loading or watcher.painted_at is None:
+        with quiet:
+            app.processEvents()
+        if time.perf_counter() - start > 120:
+            raise RuntimeError("library did not load within 120 s")
+    results["load_data_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    results["first_paint_ms"] = round((watcher.painted_at - start) * 1000, 3)
+
+    # The search index builds in a thread after loading; time the rest
+    # against an idle window, not one competing with it for the GIL
+    while not index_ready:
+        app.processEvents()
+    results["search_index_ms"] = round((time.perf_counter() - start) * 1000, 3)
+
+    # --- quick-paste palette: open on the hotkey, then close ---
+    def toggle_palette(i):
+        window.toggle_palette()
+        window.toggle_palette()
+    results["palette_open_ms"] = median_ms(toggle_palette)
+
+    # --- add_sentence_card ---
+    results["add_explicit_ms"] = median_ms(lambda i: window.add_sentence_card(f"explicit {i}", 0))
+    results["add_auto_balance_ms"] = median_ms(lambda i: window.add_sentence_card(f"balanced {i}", -1))
+
+    # --- reorder handlers: walk one row in the middle down, then back up ---
+    model = window.column_1_model
+    middle = model.rowCount() // 2
+    results["move_down_ms"] = median_ms(lambda i: window.on_move_down(model.index(middle + i)))
+    results["move_up_ms"] = median_ms(lambda i: window.on_move_up(model.index(middle + REPEATS - i)))
+    results["switch_col_ms"] = median_ms(
+        lambda i: window.on_switch_col(window.column_models[i % 2].index(middle)))
+
+    # --- sort views: re-sort both columns (the sort setting is left alone) ---
+    for order in ("most_used", "recent", "alphabetical"):
+        results[f"sort_{order}_ms"] = median_ms(
+            lambda i: [sort.sort_by(order) for sort in window.column_sorts], repeats=10)
+
+    # --- theme switch and repaint, ending on the theme it started with ---
+    themes = [CopyCat.Theme.load("dark" if window.theme.name == "light" else "light"), window.theme]
+    results["theme_switch_ms"] = median_ms(lambda i: window.apply_theme(themes[i % 2]), repeats=10)
+
+    # --- toggle_edit_mode, on and off ---
+    results["toggle_edit_mode_ms"] = median_ms(lambda i: window.toggle_edit_mode(i % 2 == 0), repeats=REPEATS * 2)
+
+    # --- save_data: queue 100 changed rows and wait for the writer ---
+    batch = [model.sentence(row) for row in range(min(100, model.rowCount()))]
+
+    def save(i):
+        window.save_data(batch)
+        window.store.flush()
+    results["save_data_100_ms"] = median_ms(save, repeats=10)
+
+    with quiet:
+        window.close()
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """Returns the regressions as printable lines."""
+    failures = []
+    for name, value in sorted(current.items()):
+        old = baseline.get(name)
+        if value is None or old is None:
+            continue
+        slack = SLACK_KB if name.endswith("_kb") else SLACK_MS
+        if value > old * (1 + tolerance) and value - old > slack:
+            failures.append(f"{name}: {value} (baseline {old})")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown (0.5 = 50%%)")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        results = run_child(args.child)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f)
+        return 0
+
+    current = {}
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            populate(data_dir, size)
+            out = os.path.join(data_dir, "results.json")
+            env = dict(os.environ, QT_QPA_PLATFORM="offscreen", COPYCAT_DATA_DIR=data_dir, COPYCAT_STORAGE="sqlite")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(size), "--out", out],
+                           env=env, check=True)
+            with open(out, encoding="utf-8") as f:
+                results = json.load(f)
+        label = f"{size // 1000}k" if size % 1000 == 0 else str(size)
+        print(f"--- {label} sentences ---")
+        for name, value in results.items():
+            print(f"  {name:<22} {value}")
+            current[f"{label}.{name}"] = value
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = compare(current, baseline, args.tolerance)
+    for line in failures:
+        print(f"REGRESSION {line}")
+    print("FAILED" if failures else "OK (no regressions against the baseline)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Cold and warm launch times for CopyCat, from process start to first paint
+and to a loaded library.
+
+    python benchmarks/bench_startup.py                          # python CopyCat.py
+    python benchmarks/bench_startup.py --exe dist/CopyCat/CopyCat.exe
+    python benchmarks/bench_startup.py --target-cold-ms 1500 --target-warm-ms 600
+
+Every launch gets --new-instance and a temporary data folder holding a
+synthetic --size sentence library, and exits by itself once the library has
+loaded (COPYCAT_STARTUP_REPORT). The first launch counts as cold. Run it
+right after a reboot or a fresh build for a true cold start; on Linux
+--drop-caches empties the page cache first (needs root). The median of the
+other --runs launches is the warm time. A launch slower than its target
+fails the run.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+TIMEOUT_S = 120
+
+
+def drop_caches():
+    """Empties the Linux page cache; returns False where that isn't allowed."""
+    try:
+        subprocess.run(["sync"], check=True)
+        with open("/proc/sys/vm/drop_caches", "w") as f:
+            f.write("3\n")
+        return True
+    except (OSError, subprocess.CalledProcessError):
+        return False
+
+
+def launch(command, data_dir, offscreen):
+    """Starts the app once; returns {"first_paint_ms", "ready_ms", "exit_ms"}."""
+    report = os.path.join(data_dir, "startup.json")
+    if os.path.exists(report):
+        os.remove(report)
+    env = dict(os.environ, COPYCAT_DATA_DIR=data_dir, COPYCAT_STORAGE="sqlite", COPYCAT_STARTUP_REPORT=report)
+    if offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+    start = time.time()
+    subprocess.run(command + ["--new-instance"], env=env, timeout=TIMEOUT_S, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    exited = time.time()
+    with open(report, encoding="utf-8") as f:
+        times = json.load(f)
+    return {
+        "first_paint_ms": round((times["first_paint"] - start) * 1000, 1),
+        "ready_ms": round((times["ready"] - start) * 1000, 1),
+        "exit_ms": round((exited - start) * 1000, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--exe", help="a built CopyCat executable (default: python CopyCat.py)")
+    parser.add_argument("--runs", type=int, default=10, help="warm launches (default: %(default)s)")
+    parser.add_argument("--size", type=int, default=1000, help="sentences in the library (default: %(default)s)")
+    parser.add_argument("--offscreen", action="store_true", help="use Qt's offscreen platform (headless machines)")
+    parser.add_argument("--drop-caches", action="store_true", help="empty the page cache before the cold launch")
+    parser.add_argument("--target-cold-ms", type=float, help="fail if the cold launch is ready later than this")
+    parser.add_argument("--target-warm-ms", type=float, help="fail if the warm median is ready later than this")
+    args = parser.parse_args(argv)
+
+    command = [os.path.abspath(args.exe)] if args.exe else [sys.executable, os.path.join(ROOT, "CopyCat.py")]
+    from bench_copycat import populate
+    with tempfile.TemporaryDirectory() as data_dir:
+        populate(data_dir, args.size)
+        if args.drop_caches and not drop_caches():
+            print("Could not drop the page cache (Linux only, needs root); the cold launch may be warm")
+        cold = launch(command, data_dir, args.offscreen)
+        warm = [launch(command, data_dir, args.offscreen) for _ in range(args.runs)]
+
+    warm_median = {name: round(statistics.median(run[name] for run in warm), 1) for name in cold}
+    print(f"{'':<16}{'cold':>10}{'warm':>10}")
+    for name in cold:
+        print(f"{name:<16}{cold[name]:>10}{warm_median[name]:>10}")
+
+    failures = []
+    if args.target_cold_ms is not None and cold["ready_ms"] > args.target_cold_ms:
+        failures.append(f"cold ready_ms {cold['ready_ms']} > target {args.target_cold_ms}")
+    if args.target_warm_ms is not None and warm_median["ready_ms"] > args.target_warm_ms:
+        failures.append(f"warm ready_ms {warm_median['ready_ms']} > target {args.target_warm_ms}")
+    for line in failures:
+        print(f"SLOW {line}")
+    if args.target_cold_ms is not None or args.target_warm_ms is not None:
+        print("FAILED" if failures else "OK (within the targets)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    sys.exit(main())
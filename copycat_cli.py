@@ -0,0 +1,243 @@
+"""Command-line access to the CopyCat library, without starting the GUI.
+
+    python copycat_cli.py list [--column 1|2]
+    python copycat_cli.py get ID
+    python copycat_cli.py add TEXT... [--column 1|2]    (TEXT "-" reads stdin)
+    python copycat_cli.py rm ID...
+    python copycat_cli.py copy ID
+    python copycat_cli.py libraries
+    python copycat_cli.py import FILE [--format txt|csv|json]
+    python copycat_cli.py export FILE [--format txt|csv|json]
+    python copycat_cli.py prune-blobs [--min-age DAYS]
+
+Every command takes --library NAME (default: the Default library).
+
+Only copycat_core is imported (no PySide6), so a lookup costs little more
+than starting Python. The storage backend follows COPYCAT_STORAGE and the
+data folder COPYCAT_DATA_DIR, exactly as in the app.
+"""
+import sys
+import argparse
+
+from copycat_core import (
+    DEFAULT_LIBRARY, open_store, list_libraries, TransferProgress, content_key, dedup_rows,
+    iter_import, export_texts, prune_blobs, compile_template
+)
+
+
+def copy_text(text):
+    """Puts `text` on the system clipboard using the platform's own tools."""
+    import shutil # Only `copy` needs these; keep them off the startup path
+    import subprocess
+    if sys.platform == "win32":
+        _copy_windows(text)
+        return
+    if sys.platform == "darwin":
+        commands = [["pbcopy"]]
+    else:
+        commands = [["wl-copy"], ["xclip", "-selection", "clipboard"], ["xsel", "--clipboard", "--input"]]
+    for command in commands:
+        if shutil.which(command[0]):
+            if subprocess.run(command, input=text.encode("utf-8")).returncode != 0:
+                raise OSError(f"{command[0]} failed")
+            return
+    raise OSError("no clipboard tool found (install wl-clipboard, xclip or xsel)")
+
+
+def _copy_windows(text):
+    import ctypes
+    user32 = ctypes.WinDLL("user32", use_last_error=True)
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.GlobalAlloc.restype = ctypes.c_void_p
+    kernel32.GlobalLock.argtypes = [ctypes.c_void_p]
+    kernel32.GlobalLock.restype = ctypes.c_void_p
+    kernel32.GlobalUnlock.argtypes = [ctypes.c_void_p]
+    user32.SetClipboardData.argtypes = [ctypes.c_uint, ctypes.c_void_p]
+    user32.SetClipboardData.restype = ctypes.c_void_p
+    CF_UNICODETEXT, GMEM_MOVEABLE = 13, 0x0002
+
+    data = text.encode("utf-16-le") + b"\0\0"
+    if not user32.OpenClipboard(None):
+        raise ctypes.WinError(ctypes.get_last_error())
+    try:
+        user32.EmptyClipboard()
+        handle = kernel32.GlobalAlloc(GMEM_MOVEABLE, len(data))
+        ctypes.memmove(kernel32.GlobalLock(handle), data, len(data))
+        kernel32.GlobalUnlock(handle)
+        if not user32.SetClipboardData(CF_UNICODETEXT, handle):
+            raise ctypes.WinError(ctypes.get_last_error())
+    finally:
+        user32.CloseClipboard()
+
+
+# --- Commands ---
+def cmd_list(store, args):
+    for s in store.load():
+        if args.column is None or s.column == args.column - 1:
+            print(f"{s.id}\t{s.column + 1}\t{s.text.replace(chr(10), ' ')}")
+    return 0
+
+
+def cmd_get(store, args):
+    sentence = store.get(args.id)
+    if sentence is None:
+        print(f"No sentence with id {args.id}", file=sys.stderr)
+        return 1
+    print(store.full_text(sentence))
+    return 0
+
+
+def cmd_add(store, args):
+    text = sys.stdin.read().rstrip("\n") if args.text == ["-"] else " ".join(args.text)
+    if not text:
+        print("Nothing to add", file=sys.stderr)
+        return 1
+    column = None if args.column is None else args.column - 1
+    print(store.append(text, column).id)
+    return 0
+
+
+def cmd_rm(store, args):
+    found = store.get_many(args.ids) # One read for every id
+    missing = [sentence_id for sentence_id in args.ids if sentence_id not in found]
+    store.delete(list(found))
+    for sentence_id in missing:
+        print(f"No sentence with id {sentence_id}", file=sys.stderr)
+    return 1 if missing else 0
+
+
+def cmd_copy(store, args):
+    sentence = store.get(args.id)
+    if sentence is None:
+        print(f"No sentence with id {args.id}", file=sys.stderr)
+        return 1
+    text = store.full_text(sentence)
+    template = None if sentence.payload else compile_template(text)
+    if sentence.payload:
+        print("Images, HTML and files are copied from the app; copying the text only", file=sys.stderr)
+    elif template is not None:
+        # Prompts are asked on the terminal; {clipboard} is left empty here
+        try:
+            answers = {label: input(f"{label}: ") for label in template.prompts}
+        except EOFError:
+            print("No answer for a template prompt", file=sys.stderr)
+            return 1
+        text = template.expand(counter=sentence.uses + 1, answers=answers)
+    try:
+        copy_text(text)
+    except OSError as e:
+        print(f"Could not copy: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def cmd_libraries(store, args):
+    for name in list_libraries():
+        print(name)
+    return 0
+
+
+def cmd_import(store, args):
+    import csv # For csv.Error only
+    seen = {content_key(store.full_text(s)) for s in store.load()}
+    progress = TransferProgress()
+    try:
+        added = store.append_many(dedup_rows(iter_import(args.file, args.format, progress), seen))
+    except (OSError, ValueError, csv.Error) as e:
+        print(f"Could not import {args.file}: {e}", file=sys.stderr)
+        return 1
+    print(f"Imported {len(added)} sentences ({progress.rows - len(added)} duplicates skipped)")
+    return 0
+
+
+def cmd_export(store, args):
+    try:
+        count = export_texts(args.file, ((s.column, store.full_text(s)) for s in store.load()), args.format)
+    except OSError as e:
+        print(f"Could not export to {args.file}: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {count} sentences to {args.file}")
+    return 0
+
+
+def cmd_prune_blobs(store, args):
+    removed, freed = prune_blobs(min_age=args.min_age * 86400)
+    print(f"Removed {removed} unused blobs ({freed / 1024 / 1024:.1f} MB)")
+    return 0
+
+
+# name: (function, help, [(flags, options) for each argument])
+COMMANDS = {
+    "list": (cmd_list, "print 'id<TAB>column<TAB>text' for every sentence", [
+        (("--column",), dict(type=int, choices=(1, 2))),
+    ]),
+    "get": (cmd_get, "print one sentence", [
+        (("id",), dict(type=int)),
+    ]),
+    "add": (cmd_add, "add a sentence and print its id", [
+        (("text",), dict(nargs="+", help="the sentence, or - to read it from stdin")),
+        (("--column",), dict(type=int, choices=(1, 2), help="default: the shorter column")),
+    ]),
+    "rm": (cmd_rm, "delete sentences", [
+        (("ids",), dict(type=int, nargs="+")),
+    ]),
+    "copy": (cmd_copy, "copy a sentence to the clipboard", [
+        (("id",), dict(type=int)),
+    ]),
+    "libraries": (cmd_libraries, "list the library names", []),
+    "import": (cmd_import, "add the new sentences from a .txt, .csv or .json file", [
+        (("file",), {}),
+        (("--format",), dict(choices=("txt", "csv", "json"), help="default: from the file extension")),
+    ]),
+    "export": (cmd_export, "write every sentence to a .txt, .csv or .json file", [
+        (("file",), {}),
+        (("--format",), dict(choices=("txt", "csv", "json"), help="default: from the file extension")),
+    ]),
+    "prune-blobs": (cmd_prune_blobs, "delete image/HTML/file payloads no library uses any more", [
+        (("--min-age",), dict(type=float, default=7, help="keep blobs newer than this many days (default: %(default)s)")),
+    ]),
+}
+
+
+def requested_command(argv):
+    """The command named in `argv`, or None if there isn't a valid one."""
+    args = iter(argv)
+    for arg in args:
+        if len(arg) > 2 and "--library".startswith(arg):
+            next(args, None) # Its value
+        elif not arg.startswith("-"):
+            return arg if arg in COMMANDS else None
+    return None
+
+
+def build_parser(argv):
+    """Only the requested command's subparser is built; all of them are
+    when there's none (--help, typos), so argparse can list them."""
+    parser = argparse.ArgumentParser(prog="copycat", description="Read and edit the CopyCat library.")
+    parser.add_argument("--library", default=DEFAULT_LIBRARY, help="library to use (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="{" + ",".join(COMMANDS) + "}")
+    wanted = requested_command(argv)
+    for name, (func, help, arguments) in COMMANDS.items():
+        if wanted is None or wanted == name:
+            p = commands.add_parser(name, help=help)
+            for flags, options in arguments:
+                p.add_argument(*flags, **options)
+            p.set_defaults(func=func)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args = build_parser(argv).parse_args(argv)
+    if args.library not in list_libraries():
+        print(f"No library named {args.library}", file=sys.stderr)
+        return 1
+    store = open_store(library=args.library)
+    try:
+        return args.func(store, args)
+    finally:
+        store.close() # Writes anything add/rm queued
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2095 @@
+"""CopyCat's headless core: sentence storage, column ordering and search.
+
+Nothing here imports Qt or touches the file system at import time, so the
+command-line interface (copycat_cli.py) and scripts can use the store
+without paying for PySide6.
+"""
+import sys
+import json
+import os
+import re
+import bisect
+import itertools
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from operator import attrgetter
+
+from copycat_perf import perf
+
+
+# --- Data location ---
+# Same folder as QStandardPaths.AppDataLocation (+ "CopyCat") used to give
+# before the QApplication exists, worked out without Qt.
+def default_data_dir():
+    """Where the library lives; COPYCAT_DATA_DIR overrides it."""
+    override = os.environ.get("COPYCAT_DATA_DIR")
+    if override:
+        return override
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.join(os.path.expanduser("~"), "AppData", "Roaming")
+    elif sys.platform == "darwin":
+        base = os.path.join(os.path.expanduser("~"), "Library", "Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "CopyCat")
+
+
+app_data_dir = default_data_dir()
+DATA_FILE = os.path.join(app_data_dir, "sentences.json")
+DB_FILE = os.path.join(app_data_dir, "sentences.db")
+HISTORY_FILE = os.path.join(app_data_dir, "clipboard_history.db")
+BLOBS_DIR = os.path.join(app_data_dir, "blobs")            # rich snippet payloads, by content hash
+THUMBNAILS_DIR = os.path.join(app_data_dir, "thumbnails")  # previews of the image ones
+LIBRARIES_DIR = os.path.join(app_data_dir, "libraries")
+THEMES_DIR = os.path.join(app_data_dir, "themes")  # user themes, one .json each
+DEFAULT_LIBRARY = "Default"  # the original sentences.db / sentences.json
+POSITION_STEP = 1024.0  # gap between neighbouring row positions
+LARGE_TEXT_CHARS = 4096  # longer texts are stored out of line (SQLite)...
+PREVIEW_CHARS = 1000     # ...keeping this much inline for display and search
+# Ways to show a column; only "manual" is stored, the others are views of it
+SORT_ORDERS = ("manual", "most_used", "recent", "alphabetical")
+
+
+def ensure_data_dir():
+    """Creates the data folder on first use (not on import)."""
+    if not os.path.exists(app_data_dir):
+        try:
+            os.makedirs(app_data_dir)
+        except OSError as e:
+            print(f"Error creating AppData directory: {e}")
+
+
+# --- Storage backends ---
+# Sentences are persisted one change at a time. The GUI thread only queues
+# (id -> row) changes; a writer thread coalesces them and commits each batch
+# in one transaction, so no operation rewrites the whole library.
+class Sentence:
+    """One snippet. `position` orders rows inside a column (lower is higher up);
+    `uses` and `last_used` count copies, for frecency ranking.
+
+    A large snippet keeps only a preview in `text`; `body_size` is then the
+    length of the full text, which the store reads with full_text().
+
+    A rich snippet (image, HTML, files) has a `payload`: its clipboard
+    formats as a JSON {mime type: blob key} (see BlobStore). `text` then is
+    what the card shows and search matches. Plain snippets have None.
+    """
+    __slots__ = ("id", "text", "column", "position", "uses", "last_used", "body_size", "payload")
+
+    def __init__(self, sentence_id, text, column=0, position=0.0, uses=0, last_used=0.0, body_size=0,
+                 payload=None):
+        self.id = sentence_id
+        self.text = text
+        self.column = column
+        self.position = position
+        self.uses = uses
+        self.last_used = last_used
+        self.body_size = body_size
+        self.payload = payload
+
+
+class SentenceColumn:
+    """An ordered column of sentences.
+
+    Rows are kept sorted by `position`, so a sentence's row is found by
+    bisecting the parallel position list (O(log n)), and sentences are
+    looked up by their stable id in O(1). Every mutation returns the
+    sentences whose stored column/position changed, for the store.
+    """
+    def __init__(self, column_index, sentences=()):
+        self.column_index = column_index
+        self.reset(sentences)
+
+    def reset(self, sentences):
+        """Replaces the contents; `sentences` must be sorted by position."""
+        self._items = list(sentences)
+        for s in self._items:
+            s.column = self.column_index
+        self._positions = [s.position for s in self._items]
+        self._by_id = {s.id: s for s in self._items}
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, row):
+        return self._items[row]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def get(self, sentence_id):
+        return self._by_id.get(sentence_id)
+
+    def row_of(self, sentence_id):
+        """Row of a sentence in this column, or -1."""
+        sentence = self._by_id.get(sentence_id)
+        if sentence is None:
+            return -1
+        return bisect.bisect_left(self._positions, sentence.position)
+
+    def extend(self, sentences):
+        """Appends sentences that already sort after the last row."""
+        for s in sentences:
+            s.column = self.column_index
+        self._items.extend(sentences)
+        self._positions.extend(s.position for s in sentences)
+        self._by_id.update((s.id, s) for s in sentences)
+
+    def insert(self, row, sentences):
+        """Inserts a block at `row`, giving it positions between its new
+        neighbours (or renumbering the column if there is no room)."""
+        positions = self._spread(row, len(sentences))
+        for s in sentences:
+            s.column = self.column_index
+            self._by_id[s.id] = s
+        self._items[row:row] = sentences
+        if positions is None:
+            return self._renumber()
+        for s, position in zip(sentences, positions):
+            s.position = position
+        self._positions[row:row] = positions
+        return list(sentences)
+
+    def insertion_row(self, position):
+        """Row a sentence at `position` goes to (see place())."""
+        return bisect.bisect_left(self._positions, position)
+
+    def place(self, sentence):
+        """Inserts a sentence at the row its own position sorts to (one that
+        another process saved). The position is kept unless a row already
+        has it; returns the sentences whose stored column/position changed."""
+        row = self.insertion_row(sentence.position)
+        if row < len(self._positions) and self._positions[row] == sentence.position:
+            return self.insert(row, [sentence])
+        changed = [sentence] if sentence.column != self.column_index else []
+        sentence.column = self.column_index
+        self._items.insert(row, sentence)
+        self._positions.insert(row, sentence.position)
+        self._by_id[sentence.id] = sentence
+        return changed
+
+    def remove(self, row, count=1):
+        """Removes and returns `count` rows starting at `row`."""
+        block = self._items[row:row + count]
+        del self._items[row:row + count]
+        del self._positions[row:row + count]
+        for s in block:
+            del self._by_id[s.id]
+        return block
+
+    def remove_rows(self, rows):
+        """Removes any set of rows in one pass; returns them in row order."""
+        removing = set(rows)
+        block = [self._items[row] for row in sorted(removing)]
+        self._items = [s for row, s in enumerate(self._items) if row not in removing]
+        self._positions = [s.position for s in self._items]
+        for s in block:
+            del self._by_id[s.id]
+        return block
+
+    def move(self, rows, target_row):
+        """Moves the given rows, as one block in their current order, so the
+        block starts at `target_row` of the column without them."""
+        rows = sorted(set(rows))
+        first, last = rows[0], rows[-1]
+        if last - first + 1 == len(rows):
+            # One run (every single-row move): slice it out, no per-row work
+            block = self._items[first:last + 1]
+            del self._items[first:last + 1]
+            del self._positions[first:last + 1]
+        else:
+            moving = set(rows)
+            block = [self._items[row] for row in rows]
+            self._items = [s for row, s in enumerate(self._items) if row not in moving]
+            self._positions = [s.position for s in self._items]
+        target_row = max(0, min(target_row, len(self._items)))
+        positions = self._spread(target_row, len(block))
+        self._items[target_row:target_row] = block
+        if positions is None:
+            return self._renumber()
+        for s, position in zip(block, positions):
+            s.position = position
+        self._positions[target_row:target_row] = positions
+        return block
+
+    def sorted_rows(self, order):
+        """The rows in one of SORT_ORDERS, without reordering the column.
+
+        The sort is stable, so ties (say, every never-copied row) keep their
+        manual order. Keys are gathered with map() and rows sorted by index,
+        which keeps a 25k-row column to a few milliseconds.
+        """
+        items = self._items
+        rows = range(len(items))
+        if order == "most_used":
+            keys = list(map(attrgetter("uses"), items))
+        elif order == "recent":
+            keys = list(map(attrgetter("last_used"), items))
+        elif order == "alphabetical":
+            keys = list(map(str.casefold, map(attrgetter("text"), items)))
+            return sorted(rows, key=keys.__getitem__)
+        else:
+            return list(rows)
+        return sorted(rows, key=keys.__getitem__, reverse=True) # reverse=True is stable too
+
+    def _spread(self, row, count):
+        """`count` increasing positions that fit before the current `row`,
+        or None if the gap is too small for distinct floats."""
+        before = self._positions[row - 1] if row > 0 else None
+        after = self._positions[row] if row < len(self._positions) else None
+        if before is None and after is None:
+            return [i * POSITION_STEP for i in range(count)]
+        if before is None:
+            return [after - (count - i) * POSITION_STEP for i in range(count)]
+        if after is None:
+            return [before + (i + 1) * POSITION_STEP for i in range(count)]
+        step = (after - before) / (count + 1)
+        positions = [before + (i + 1) * step for i in range(count)]
+        if not (before < positions[0] and positions[-1] < after):
+            return None
+        if any(a >= b for a, b in zip(positions, positions[1:])):
+            return None
+        return positions
+
+    def _renumber(self):
+        for i, s in enumerate(self._items):
+            s.position = i * POSITION_STEP
+        self._positions = [s.position for s in self._items]
+        return list(self._items)
+
+
+def contiguous_runs(rows):
+    """Groups row numbers into sorted (first, last) runs."""
+    runs = []
+    for row in sorted(set(rows)):
+        if runs and runs[-1][1] == row - 1:
+            runs[-1][1] = row
+        else:
+            runs.append([row, row])
+    return [tuple(run) for run in runs]
+
+
+def read_legacy_json(path):
+    """Reads the old sentences.json ({"col1", "col2"} dict or flat list).
+
+    Returns (column, text, payload) rows in display order, or None if there
+    is no file. A rich snippet is stored as {"text": ..., "payload": {...}}
+    instead of a plain string.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    def row(column, entry):
+        if isinstance(entry, dict):
+            payload = entry.get("payload")
+            return column, str(entry.get("text", "")), json.dumps(payload, sort_keys=True) if payload else None
+        return column, str(entry), None
+
+    rows = []
+    if isinstance(data, dict):
+        rows.extend(row(0, entry) for entry in data.get("col1", []))
+        rows.extend(row(1, entry) for entry in data.get("col2", []))
+    elif isinstance(data, list): # Legacy support: auto-balance by alternating
+        rows.extend(row(i % 2, entry) for i, entry in enumerate(data))
+    return rows
+
+
+class BatchWriter:
+    """A pending-change queue and the background thread that writes it.
+
+    The calling thread only merges key -> row changes into the queue; the
+    writer thread coalesces them and hands each batch to _write_batch().
+    """
+    FLUSH_DELAY = 0.25  # seconds to wait for more changes before writing
+
+    def __init__(self, path):
+        self.path = path
+        self._cond = threading.Condition()
+        self._pending = {}  # key -> row, or None to delete
+        self._in_flight = {}  # the batch being written
+        self._writing = False
+        self._flush_requested = False
+        self._closed = False
+        self._thread = None
+
+    def _queue(self, changes):
+        """Merges key -> row (None deletes) changes into the pending batch."""
+        if not changes:
+            return
+        with self._cond:
+            self._pending.update(changes)
+            self._wake()
+
+    def flush(self):
+        """Blocks until every queued change has been written."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._has_work() or self._writing:
+                if self._thread is None or not self._thread.is_alive():
+                    break
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+
+    # --- Writer thread ---
+    def _wake(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="CopyCatWriter", daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._has_work() and not self._closed:
+                    self._cond.wait()
+                if not self._has_work():
+                    break
+                # Coalesce: let a burst of clicks land in the same batch
+                deadline = time.monotonic() + self.FLUSH_DELAY
+                while not self._closed and not self._flush_requested:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                work = self._take_work()
+                self._flush_requested = False
+                self._writing = True
+            try:
+                with perf.span("store.write_batch"):
+                    self._write_batch(*work)
+                perf.count("store.rows_written", len(work[0]))
+            except (OSError, sqlite3.Error) as e:
+                print(f"Error saving data: {e}")
+            with self._cond:
+                self._in_flight = {}
+                self._writing = False
+                self._cond.notify_all()
+        self._close_writer()
+
+    def _has_work(self):
+        return bool(self._pending)
+
+    def _take_work(self):
+        """Takes the queue (under the lock); returns _write_batch()'s arguments."""
+        batch, self._pending = self._pending, {}
+        self._in_flight = batch
+        return (batch,)
+
+    # --- Backend hooks ---
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def _close_writer(self):
+        pass
+
+
+class SentenceStore(BatchWriter):
+    """Base class for storage backends.
+
+    Subclasses implement _read_all() and _write_batch(batch, bodies); the
+    queued rows are id -> (column, position, text, uses, last_used,
+    body_size, payload), and large texts travel in a queue of their own.
+    """
+    LARGE_TEXT_CHARS = 0  # 0: every text is stored inline
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._bodies = {}   # id -> full text of a large sentence, or None to delete it
+        self._next_id = 1
+
+    # --- GUI-thread API ---
+    def load(self):
+        """Returns every stored Sentence, sorted by (column, position)."""
+        sentences = self._read_all()
+        sentences.sort(key=lambda s: (s.column, s.position))
+        self._next_id = max(self._next_id, max((s.id for s in sentences), default=0) + 1)
+        return sentences
+
+    def iter_load(self, first_rows=100, batch_size=5000):
+        """Yields (sentences, total) batches for progressive loading.
+
+        The first batch holds the first `first_rows` of each column, so the
+        visible part of the window fills before the rest arrives.
+        """
+        sentences = self.load()
+        columns = [[s for s in sentences if s.column == 0], [s for s in sentences if s.column != 0]]
+        yield columns[0][:first_rows] + columns[1][:first_rows], len(sentences)
+        for column in columns:
+            for start in range(first_rows, len(column), batch_size):
+                yield column[start:start + batch_size], len(sentences)
+
+    def new_id(self):
+        sentence_id = self._next_id
+        self._next_id += 1
+        return sentence_id
+
+    def external_changes(self):
+        """([Sentence], [deleted id]) that other processes wrote since the
+        last call (or since loading). This base version sees none."""
+        return [], []
+
+    # --- Single-row access (the CLI; the GUI keeps everything loaded) ---
+    def get(self, sentence_id):
+        """Returns one Sentence by id, or None."""
+        return self.get_many([sentence_id]).get(sentence_id)
+
+    def get_many(self, sentence_ids):
+        """{id: Sentence} for those of `sentence_ids` that exist."""
+        wanted = set(sentence_ids)
+        return {s.id: s for s in self.load() if s.id in wanted}
+
+    def append(self, text, column=None):
+        """Queues `text` as the last row of `column` (default: the shorter
+        column, like the Add button) and returns the new Sentence."""
+        return self.append_many([(text, column)])[0]
+
+    def append_many(self, rows):
+        """Queues (text, column or None) rows at the ends of the columns as
+        one batch, balancing the rows without a column. Returns the Sentences."""
+        self.flush() # The tails are read from disk
+        tails = self._column_tails()
+        counts = [count for count, _ in tails]
+        lasts = [last for _, last in tails]
+        added = []
+        for text, column in rows:
+            if column not in (0, 1):
+                column = 0 if counts[0] <= counts[1] else 1
+            position = 0.0 if lasts[column] is None else lasts[column] + POSITION_STEP
+            sentence = Sentence(self.new_id(), "", column, position)
+            self.set_text(sentence, text)
+            lasts[column] = position
+            counts[column] += 1
+            added.append(sentence)
+        self.save(added)
+        return added
+
+    # --- Large texts ---
+    def set_text(self, sentence, text):
+        """Sets the text of `sentence`, moving a large one out of line.
+
+        Only the body is queued here; save the sentence as usual.
+        """
+        if self.LARGE_TEXT_CHARS and len(text) > self.LARGE_TEXT_CHARS:
+            sentence.text = text[:PREVIEW_CHARS]
+            sentence.body_size = len(text)
+            self._queue_body(sentence.id, text)
+        else:
+            if sentence.body_size:
+                self._queue_body(sentence.id, None)
+            sentence.text = text
+            sentence.body_size = 0
+
+    def full_text(self, sentence):
+        """The whole text of `sentence`; large ones are read from disk."""
+        if not sentence.body_size:
+            return sentence.text
+        with self._cond:
+            body = self._bodies.get(sentence.id)
+            if body is not None:
+                return body
+            while self._writing: # It may be in the batch being written
+                self._cond.wait()
+        body = self._read_body(sentence.id)
+        return sentence.text if body is None else body
+
+    def _queue_body(self, sentence_id, text):
+        with self._cond:
+            self._bodies[sentence_id] = text
+            self._wake()
+
+    def ensure_exists(self):
+        """Creates an empty library file if there is none yet."""
+        if not os.path.exists(self.path):
+            self._write_batch({}, {})
+
+    def search(self, query, limit=50):
+        """Sentences containing every word of `query`, read from disk.
+
+        This base version scans load(); SQLite answers from its FTS index.
+        """
+        words = SearchIndex.tokenize(query)
+        if not words:
+            return []
+        hits = []
+        for s in self.load():
+            text = s.text.lower()
+            if all(word in text for word in words):
+                hits.append(s)
+                if len(hits) >= limit:
+                    break
+        return hits
+
+    def _column_tails(self):
+        """[(row count, last position or None)] per column."""
+        tails = [(0, None), (0, None)]
+        for s in self.load():
+            column = 1 if s.column else 0
+            tails[column] = (tails[column][0] + 1, s.position)
+        return tails
+
+    def save(self, sentences):
+        """Queues the current state of the given sentences."""
+        self._queue({s.id: (s.column, s.position, s.text, s.uses, s.last_used, s.body_size, s.payload)
+                     for s in sentences})
+
+    def delete(self, sentence_ids):
+        self._queue(dict.fromkeys(sentence_ids))
+
+    # --- Writer thread ---
+    def _has_work(self):
+        return bool(self._pending or self._bodies)
+
+    def _take_work(self):
+        (batch,) = super()._take_work()
+        bodies, self._bodies = self._bodies, {}
+        return batch, bodies
+
+    # --- Backend hooks ---
+    def _read_all(self):
+        raise NotImplementedError
+
+    def _write_batch(self, batch, bodies):
+        raise NotImplementedError
+
+    def _read_body(self, sentence_id):
+        return None
+
+
+class SqliteSentenceStore(SentenceStore):
+    """SQLite in WAL mode: one row per sentence, each batch one transaction.
+
+    An FTS5 table, kept in step by triggers, lets search() run against the
+    file without loading the library (SQLite builds without FTS5 fall back
+    to a LIKE scan).
+
+    Several processes may share the file (the app, the CLI, a second
+    instance). Every batch bumps a revision counter in the meta table and
+    stamps the rows it writes (deletions leave a tombstone), so
+    external_changes() reads just what the others changed; ids come from
+    blocks reserved in the file, so no two processes hand out the same one.
+    """
+    FTS_SCHEMA = (
+        "CREATE VIRTUAL TABLE sentences_fts USING fts5(text, content='sentences', content_rowid='id')",
+        "CREATE TRIGGER sentences_fts_insert AFTER INSERT ON sentences BEGIN"
+        " INSERT INTO sentences_fts (rowid, text) VALUES (new.id, new.text); END",
+        "CREATE TRIGGER sentences_fts_delete AFTER DELETE ON sentences BEGIN"
+        " INSERT INTO sentences_fts (sentences_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+        # Moves rewrite col/pos only; the index is touched when the text changes
+        "CREATE TRIGGER sentences_fts_update AFTER UPDATE OF text ON sentences"
+        " WHEN old.text <> new.text BEGIN"
+        " INSERT INTO sentences_fts (sentences_fts, rowid, text) VALUES ('delete', old.id, old.text);"
+        " INSERT INTO sentences_fts (rowid, text) VALUES (new.id, new.text); END",
+        "INSERT INTO sentences_fts (sentences_fts) VALUES ('rebuild')",
+    )
+    FTS_TRIGGERS = ("sentences_fts_insert", "sentences_fts_delete", "sentences_fts_update")
+    # Bigger batches (imports) rebuild the FTS index once instead of updating
+    # it row by row, which slows down sharply as a batch grows
+    BULK_ROWS = 10000
+
+    COLUMNS = "id, text, col, pos, uses, last_used, body_size, payload"  # Sentence() argument order
+    LARGE_TEXT_CHARS = LARGE_TEXT_CHARS
+    ID_BLOCK = 16         # ids reserved at a time; doubles per reservation...
+    MAX_ID_BLOCK = 65536  # ...up to this, so a big import needs only a few
+
+    def __init__(self, path, legacy_json_path=None):
+        super().__init__(path)
+        self.legacy_json_path = legacy_json_path
+        self._writer_conn = None
+        self._id_limit = 0  # end of the reserved id block
+        self._id_block = self.ID_BLOCK
+        self._synced_revision = 0  # changes up to this revision are loaded
+        self._own_revisions = set()  # revisions this store wrote
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sentences ("
+                " id INTEGER PRIMARY KEY, col INTEGER NOT NULL,"
+                " pos REAL NOT NULL, text TEXT NOT NULL,"
+                " uses INTEGER NOT NULL DEFAULT 0, last_used REAL NOT NULL DEFAULT 0,"
+                " body_size INTEGER NOT NULL DEFAULT 0, rev INTEGER NOT NULL DEFAULT 0, payload TEXT)"
+            )
+            # Full texts of large sentences, read only when copied or edited
+            conn.execute("CREATE TABLE IF NOT EXISTS bodies (id INTEGER PRIMARY KEY, text TEXT NOT NULL)")
+            # 'revision' (bumped per batch) and 'next_id' (the next unreserved id)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS tombstones (id INTEGER PRIMARY KEY, rev INTEGER NOT NULL)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sentences)")}
+            if "uses" not in columns: # Libraries written before copy counts existed
+                conn.execute("ALTER TABLE sentences ADD COLUMN uses INTEGER NOT NULL DEFAULT 0")
+                conn.execute("ALTER TABLE sentences ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+            if "body_size" not in columns: # ...or large texts were stored out of line
+                conn.execute("ALTER TABLE sentences ADD COLUMN body_size INTEGER NOT NULL DEFAULT 0")
+                self._move_large_texts(conn)
+            if "rev" not in columns: # ...or revisions
+                conn.execute("ALTER TABLE sentences ADD COLUMN rev INTEGER NOT NULL DEFAULT 0")
+            if "payload" not in columns: # ...or rich snippets
+                conn.execute("ALTER TABLE sentences ADD COLUMN payload TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS sentences_order ON sentences (col, pos)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sentences_rev ON sentences (rev)")
+            has_fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sentences_fts'").fetchone()
+            if has_fts is None:
+                try:
+                    for statement in self.FTS_SCHEMA:
+                        conn.execute(statement)
+                except sqlite3.OperationalError:
+                    pass # No FTS5 in this SQLite build; search() uses LIKE
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            conn.close()
+            raise
+        return conn
+
+    def _read_connection(self):
+        # Read-only: never creates, migrates or locks a library. The URI is
+        # built by hand; pathlib's as_uri() costs the CLI ~6 ms of imports
+        path = os.path.abspath(self.path).replace(os.sep, "/")
+        if not path.startswith("/"):
+            path = "/" + path # C:/... on Windows
+        path = path.replace("%", "%25").replace("?", "%3f").replace("#", "%23")
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        conn.execute("PRAGMA mmap_size = 268435456") # Large bodies are read from the mapped file
+        return conn
+
+    def _move_large_texts(self, conn):
+        """Moves texts longer than LARGE_TEXT_CHARS into the bodies table."""
+        conn.execute("INSERT OR REPLACE INTO bodies (id, text) SELECT id, text FROM sentences"
+                     " WHERE body_size = 0 AND length(text) > ?", (self.LARGE_TEXT_CHARS,))
+        conn.execute("UPDATE sentences SET body_size = length(text), text = substr(text, 1, ?)"
+                     " WHERE body_size = 0 AND length(text) > ?", (PREVIEW_CHARS, self.LARGE_TEXT_CHARS))
+
+    def ensure_exists(self):
+        self._connect().close()
+
+    @staticmethod
+    def _meta(conn, key):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return 0 if row is None else row[0]
+
+    # --- Sharing the file with other processes ---
+    def new_id(self):
+        if self._next_id >= self._id_limit:
+            self._reserve_ids()
+        return super().new_id()
+
+    def _reserve_ids(self):
+        """Takes the next block of ids from the file."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                # MAX(id) also covers rows written before ids were reserved
+                start = max(self._meta(conn, "next_id"),
+                            (conn.execute("SELECT MAX(id) FROM sentences").fetchone()[0] or 0) + 1)
+                conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)",
+                             (start + self._id_block,))
+        finally:
+            conn.close()
+        self._next_id, self._id_limit = start, start + self._id_block
+        self._id_block = min(self._id_block * 2, self.MAX_ID_BLOCK)
+
+    def external_changes(self):
+        """Rows other processes wrote or deleted since the last call.
+
+        What this store wrote itself is left out, and so are rows with
+        changes still queued here: those are written next and win.
+        """
+        if not os.path.exists(self.path):
+            return [], []
+        conn = self._read_connection()
+        try:
+            conn.execute("BEGIN") # One snapshot for the revision and the rows
+            try:
+                revision = self._meta(conn, "revision")
+            except sqlite3.OperationalError:
+                return [], [] # Written by a version without revisions
+            if revision == self._synced_revision:
+                return [], []
+            rows = conn.execute(f"SELECT {self.COLUMNS}, rev FROM sentences WHERE rev > ?",
+                                (self._synced_revision,)).fetchall()
+            deleted = conn.execute("SELECT id, rev FROM tombstones WHERE rev > ?",
+                                   (self._synced_revision,)).fetchall()
+        finally:
+            conn.close()
+        with self._cond:
+            own, local = self._own_revisions, self._pending.keys() | self._in_flight.keys()
+            sentences = [Sentence(*row[:-1]) for row in rows if row[-1] not in own and row[0] not in local]
+            deleted_ids = [i for i, rev in deleted if rev not in own and i not in local]
+            self._own_revisions = {rev for rev in own if rev > revision}
+            self._synced_revision = revision
+        return sentences, deleted_ids
+
+    def _read_body(self, sentence_id):
+        if not os.path.exists(self.path):
+            return None
+        conn = self._read_connection()
+        try:
+            row = conn.execute("SELECT text FROM bodies WHERE id = ?", (sentence_id,)).fetchone()
+        finally:
+            conn.close()
+        return None if row is None else row[0]
+
+    def search(self, query, limit=50):
+        words = SearchIndex.tokenize(query)
+        if not words or not os.path.exists(self.path):
+            return []
+        conn = self._read_connection()
+        try:
+            try:
+                rows = conn.execute(
+                    "SELECT s.id, s.text, s.col, s.pos, s.uses, s.last_used, s.body_size, s.payload"
+                    " FROM sentences_fts"
+                    " JOIN sentences s ON s.id = sentences_fts.rowid"
+                    " WHERE sentences_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (" AND ".join(f'"{word}"*' for word in words), limit),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                rows = conn.execute(
+                    f"SELECT {self.COLUMNS} FROM sentences WHERE "
+                    + " AND ".join("text LIKE ?" for _ in words) + " LIMIT ?",
+                    [f"%{word}%" for word in words] + [limit],
+                ).fetchall()
+        finally:
+            conn.close()
+        return [Sentence(*row) for row in rows]
+
+    def _read_all(self):
+        conn = self._connect()
+        try:
+            self._synced_revision = self._meta(conn, "revision")
+            rows = conn.execute(f"SELECT {self.COLUMNS} FROM sentences").fetchall()
+            if not rows and self.legacy_json_path and self._migrate(conn):
+                rows = conn.execute(f"SELECT {self.COLUMNS} FROM sentences").fetchall()
+        finally:
+            conn.close()
+        return [Sentence(*row) for row in rows]
+
+    def iter_load(self, first_rows=100, batch_size=5000):
+        # Stream each column straight off the (col, pos) index
+        conn = self._connect()
+        try:
+            total = conn.execute("SELECT COUNT(*) FROM sentences").fetchone()[0]
+            if total == 0 and self.legacy_json_path:
+                total = len(self._migrate(conn))
+            # Later changes may be read twice (here and by external_changes()); that's harmless
+            self._synced_revision = self._meta(conn, "revision")
+            cursors = [
+                conn.execute(f"SELECT {self.COLUMNS} FROM sentences WHERE col = ? ORDER BY pos", (column,))
+                for column in (0, 1)
+            ]
+            rows = cursors[0].fetchmany(first_rows) + cursors[1].fetchmany(first_rows)
+            while rows:
+                yield [Sentence(*row) for row in rows], total
+                rows = cursors[0].fetchmany(batch_size) or cursors[1].fetchmany(batch_size)
+        finally:
+            conn.close()
+
+    def get_many(self, sentence_ids):
+        # A read-only connection: no schema work, and no waiting for the app's writer
+        self._migrate_if_needed()
+        if not os.path.exists(self.path):
+            return {}
+        sentence_ids = list(sentence_ids)
+        found = {}
+        conn = self._read_connection()
+        try:
+            for start in range(0, len(sentence_ids), 500): # Under SQLite's variable limit
+                chunk = sentence_ids[start:start + 500]
+                found.update((row[0], Sentence(*row)) for row in conn.execute(
+                    f"SELECT {self.COLUMNS} FROM sentences WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        finally:
+            conn.close()
+        return found
+
+    def _migrate_if_needed(self):
+        """Imports sentences.json first if it is still there (see _migrate)."""
+        if not self.legacy_json_path or not os.path.exists(self.legacy_json_path):
+            return
+        conn = self._connect()
+        try:
+            if conn.execute("SELECT 1 FROM sentences LIMIT 1").fetchone() is None:
+                self._migrate(conn)
+        finally:
+            conn.close()
+
+    def _column_tails(self):
+        conn = self._connect()
+        try:
+            if self.legacy_json_path and conn.execute("SELECT 1 FROM sentences LIMIT 1").fetchone() is None:
+                self._migrate(conn)
+            tails = [(0, None), (0, None)]
+            for col, count, last in conn.execute("SELECT col, COUNT(*), MAX(pos) FROM sentences GROUP BY col"):
+                tails[1 if col else 0] = (count, last)
+        finally:
+            conn.close()
+        return tails
+
+    def _migrate(self, conn):
+        """One-time import of sentences.json; the old file is kept as .bak."""
+        legacy = read_legacy_json(self.legacy_json_path)
+        if legacy is None:
+            return []
+        rows = [(i + 1, column, float(i) * POSITION_STEP, text, payload)
+                for i, (column, text, payload) in enumerate(legacy)]
+        with conn:
+            conn.executemany("INSERT INTO sentences (id, col, pos, text, payload) VALUES (?, ?, ?, ?, ?)", rows)
+            self._move_large_texts(conn)
+        try:
+            os.replace(self.legacy_json_path, self.legacy_json_path + ".bak")
+        except OSError as e:
+            print(f"Could not rename {self.legacy_json_path}: {e}", file=sys.stderr)
+        # stderr: the CLI's list output is meant for scripts
+        print(f"Migrated {len(rows)} sentences from {self.legacy_json_path}", file=sys.stderr)
+        return rows
+
+    def _write_batch(self, batch, bodies):
+        if self._writer_conn is None:
+            self._writer_conn = self._connect()
+        with self._writer_conn:
+            # Take the write lock first, so the revision bump can't interleave with another process
+            self._writer_conn.execute("BEGIN IMMEDIATE")
+            revision = self._meta(self._writer_conn, "revision") + 1
+            self._writer_conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('revision', ?)", (revision,))
+            upserts = [(sentence_id, *row, revision) for sentence_id, row in batch.items() if row is not None]
+            deletes = [(sentence_id,) for sentence_id, row in batch.items() if row is None]
+            bulk = len(upserts) + len(deletes) > self.BULK_ROWS and self._writer_conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sentences_fts'").fetchone() is not None
+            if bulk:
+                for trigger in self.FTS_TRIGGERS:
+                    self._writer_conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            if bodies:
+                self._writer_conn.executemany(
+                    "INSERT OR REPLACE INTO bodies (id, text) VALUES (?, ?)",
+                    [(sentence_id, text) for sentence_id, text in bodies.items() if text is not None])
+                self._writer_conn.executemany(
+                    "DELETE FROM bodies WHERE id = ?",
+                    [(sentence_id,) for sentence_id, text in bodies.items() if text is None])
+            if deletes:
+                self._writer_conn.executemany("DELETE FROM sentences WHERE id = ?", deletes)
+                self._writer_conn.executemany("DELETE FROM bodies WHERE id = ?", deletes)
+                self._writer_conn.executemany(
+                    "INSERT OR REPLACE INTO tombstones (id, rev) VALUES (?, ?)",
+                    [(sentence_id, revision) for sentence_id, in deletes])
+            if upserts:
+                # An upsert (not OR REPLACE) so the FTS update trigger fires
+                self._writer_conn.executemany(
+                    "INSERT INTO sentences (id, col, pos, text, uses, last_used, body_size, payload, rev)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (id) DO UPDATE SET col = excluded.col, pos = excluded.pos,"
+                    " text = excluded.text, uses = excluded.uses, last_used = excluded.last_used,"
+                    " body_size = excluded.body_size, payload = excluded.payload, rev = excluded.rev", upserts
+                )
+            if bulk: # Put the triggers back and rebuild, in the same transaction
+                for statement in self.FTS_SCHEMA[1:]:
+                    self._writer_conn.execute(statement)
+        with self._cond:
+            self._own_revisions.add(revision)
+
+    def _close_writer(self):
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+
+
+class ClipboardHistoryStore(BatchWriter):
+    """Clipboard history in its own SQLite file, keyed by content hash.
+
+    Shares the writer thread and coalescing of the sentence stores, so
+    recording a copy only queues a row on the GUI thread.
+    """
+    def __init__(self, path):
+        super().__init__(path)
+        self._writer_conn = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, uses INTEGER NOT NULL,"
+            " first_seen REAL NOT NULL, last_seen REAL NOT NULL)"
+        )
+        return conn
+
+    def load(self):
+        """Returns every stored HistoryEntry, least recently used first."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT key, text, uses, first_seen, last_seen FROM history ORDER BY last_seen"
+            ).fetchall()
+        finally:
+            conn.close()
+        return [HistoryEntry(*row) for row in rows]
+
+    def save_entries(self, entries):
+        self._queue({e.key: (e.text, e.uses, e.first_seen, e.last_seen) for e in entries})
+
+    def delete(self, keys):
+        self._queue(dict.fromkeys(keys))
+
+    def _write_batch(self, batch):
+        if self._writer_conn is None:
+            self._writer_conn = self._connect()
+        upserts = [(key, *row) for key, row in batch.items() if row is not None]
+        deletes = [(key,) for key, row in batch.items() if row is None]
+        with self._writer_conn:
+            if deletes:
+                self._writer_conn.executemany("DELETE FROM history WHERE key = ?", deletes)
+            if upserts:
+                self._writer_conn.executemany(
+                    "INSERT OR REPLACE INTO history (key, text, uses, first_seen, last_seen)"
+                    " VALUES (?, ?, ?, ?, ?)", upserts
+                )
+
+    def _close_writer(self):
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+
+
+class JsonSentenceStore(SentenceStore):
+    """The original {"col1": [...], "col2": [...]} file, written atomically.
+
+    Every batch still rewrites the file, but off the GUI thread, coalesced,
+    and via a temp file + os.replace so a crash can't truncate the library.
+
+    The file's (mtime, size) is the version stamp: if it changed since this
+    store last read or wrote it, texts someone else added are taken in
+    before the next write instead of being overwritten. The format has no
+    ids, so other edits and deletions made outside are not merged.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._rows = {}  # writer-side mirror: id -> (column, position, text, payload); no copy counts
+        self._stamp = None
+        self._incoming = []  # Sentences added by someone else, for external_changes()
+        self._file_lock = threading.Lock()  # the mirror, the stamp and the file
+        self._id_lock = threading.Lock()    # new_id() runs on both threads here
+
+    def new_id(self):
+        with self._id_lock:
+            return super().new_id()
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _read_all(self):
+        with self._file_lock:
+            legacy = read_legacy_json(self.path) or []
+            sentences = [Sentence(i + 1, text, column, float(i) * POSITION_STEP, payload=payload)
+                         for i, (column, text, payload) in enumerate(legacy)]
+            self._rows = {s.id: (s.column, s.position, s.text, s.payload) for s in sentences}
+            self._stamp = self._file_stamp()
+            self._incoming = []
+        return sentences
+
+    def external_changes(self):
+        with self._file_lock:
+            self._take_in_external()
+            incoming, self._incoming = self._incoming, []
+        return incoming, []
+
+    def _take_in_external(self):
+        """Adds texts that appeared in the file since we last saw it to the
+        mirror (at the ends of their columns) and to _incoming."""
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return
+        known = {}
+        for _, _, text, _ in self._rows.values():
+            known[text] = known.get(text, 0) + 1
+        legacy = read_legacy_json(self.path)
+        if legacy is None:
+            return # Gone or half-written; look again next time
+        lasts = [None, None]
+        for column, position, _, _ in self._rows.values():
+            if lasts[column] is None or position > lasts[column]:
+                lasts[column] = position
+        for column, text, payload in legacy:
+            if known.get(text):
+                known[text] -= 1
+                continue
+            position = 0.0 if lasts[column] is None else lasts[column] + POSITION_STEP
+            lasts[column] = position
+            sentence = Sentence(self.new_id(), text, column, position, payload=payload)
+            self._rows[sentence.id] = (column, position, text, payload)
+            self._incoming.append(sentence)
+        self._stamp = stamp
+
+    def _write_batch(self, batch, bodies):
+        with self._file_lock:
+            self._take_in_external()
+            for sentence_id, row in batch.items():
+                if row is None:
+                    self._rows.pop(sentence_id, None)
+                else:
+                    column, position, text, _, _, _, payload = row
+                    self._rows[sentence_id] = (column, position, text, payload)
+            ordered = sorted(self._rows.values(), key=lambda row: row[:2])
+            entries = [(column, text if payload is None else {"text": text, "payload": json.loads(payload)})
+                       for column, _, text, payload in ordered]
+            data_to_save = {
+                "col1": [entry for column, entry in entries if column == 0],
+                "col2": [entry for column, entry in entries if column == 1],
+            }
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data_to_save, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._stamp = self._file_stamp()
+
+
+STORAGE_BACKENDS = {
+    "sqlite": lambda library: SqliteSentenceStore(
+        library_path(library, ".db"), legacy_json_path=DATA_FILE if library == DEFAULT_LIBRARY else None),
+    "json": lambda library: JsonSentenceStore(library_path(library, ".json")),
+}
+BACKEND_EXTENSIONS = {"sqlite": ".db", "json": ".json"}
+
+
+def storage_backend(backend=None):
+    backend = backend or os.environ.get("COPYCAT_STORAGE", "sqlite")
+    return backend if backend in STORAGE_BACKENDS else "sqlite"
+
+
+def open_store(backend=None, library=None):
+    """Creates the configured backend (COPYCAT_STORAGE=sqlite|json) for a
+    library (default: the original one)."""
+    ensure_data_dir()
+    return STORAGE_BACKENDS[storage_backend(backend)](library or DEFAULT_LIBRARY)
+
+
+# --- Libraries ---
+# Each named library is its own file in LIBRARIES_DIR; the file name is the
+# library name. The Default library keeps the original sentences.db/.json.
+def library_name(name):
+    """`name` made safe to use as a file name, or "" if nothing is left."""
+    name = re.sub(r'[\\/:*?"<>|\x00-\x1f]', "", name).strip().strip(".")
+    return name[:80]
+
+
+def library_path(library, extension):
+    if library == DEFAULT_LIBRARY:
+        return DB_FILE if extension == ".db" else DATA_FILE
+    return os.path.join(LIBRARIES_DIR, library + extension)
+
+
+def list_libraries(backend=None):
+    """Library names: Default first, then the rest alphabetically."""
+    extension = BACKEND_EXTENSIONS[storage_backend(backend)]
+    try:
+        files = os.listdir(LIBRARIES_DIR)
+    except OSError:
+        files = []
+    names = {f[:-len(extension)] for f in files if f.endswith(extension)}
+    names.discard(DEFAULT_LIBRARY)
+    return [DEFAULT_LIBRARY] + sorted(names, key=str.lower)
+
+
+def create_library(name, backend=None):
+    """Creates an empty library and returns its (sanitised) name."""
+    name = library_name(name)
+    if not name:
+        raise ValueError("library name is empty")
+    ensure_data_dir()
+    os.makedirs(LIBRARIES_DIR, exist_ok=True)
+    store = open_store(backend, name)
+    store.ensure_exists()
+    store.close()
+    return name
+
+
+def search_libraries(query, libraries, backend=None, limit=50):
+    """[(library, Sentence)] matches from each library's file on disk."""
+    hits = []
+    for library in libraries:
+        store = open_store(backend, library)
+        try:
+            hits.extend((library, s) for s in store.search(query, limit))
+        except sqlite3.Error as e:
+            print(f"Error searching {library}: {e}")
+    return hits
+
+
+# --- Themes ---
+# A theme is a set of named colours, which the app compiles once into its
+# stylesheet, window palette and card colours. A user theme is a JSON file in
+# THEMES_DIR giving a built-in "base" and the colours it changes, e.g.
+# {"base": "dark", "accent": "#FF8800"}; anything it leaves out, or gets
+# wrong, comes from the base.
+DEFAULT_THEME = "dark"
+BUILTIN_THEMES = {
+    "dark": {
+        "window": "#000000", "text": "#F0F0F0", "muted_text": "#AAAAAA", "hint_text": "#666666",
+        "placeholder_text": "#555555", "field": "#1A1A1A", "border": "#333333",
+        "button": "#2A2A2A", "button_hover": "#3A3A3A", "button_pressed": "#4A4A4A",
+        "accent": "#007AFF", "accent_hover": "#006DE0", "accent_text": "#FFFFFF",
+        "popup": "#111111", "scrollbar": "#3A3A3A",
+        "card": "#1C1C1C", "card_border": "#333333", "flash": "#FFFFFF",
+        "copy_button": "#3A4C5F", "copy_button_hover": "#4A5C6F",
+        "move_button": "#333333", "move_button_hover": "#444444", "move_button_border": "#444444",
+        "move_button_text": "#AAAAAA", "move_button_text_hover": "#FFFFFF",
+        "delete_button": "#5C2B2B", "delete_button_hover": "#7C3B3B",
+    },
+    "light": {
+        "window": "#F2F2F5", "text": "#1C1C1E", "muted_text": "#6E6E73", "hint_text": "#8E8E93",
+        "placeholder_text": "#AEAEB2", "field": "#FFFFFF", "border": "#D1D1D6",
+        "button": "#E5E5EA", "button_hover": "#D8D8DE", "button_pressed": "#C7C7CC",
+        "accent": "#007AFF", "accent_hover": "#006DE0", "accent_text": "#FFFFFF",
+        "popup": "#FFFFFF", "scrollbar": "#C7C7CC",
+        "card": "#FFFFFF", "card_border": "#D1D1D6", "flash": "#007AFF",
+        "copy_button": "#D6E4F5", "copy_button_hover": "#C2D6EF",
+        "move_button": "#EFEFF4", "move_button_hover": "#E0E0E6", "move_button_border": "#D1D1D6",
+        "move_button_text": "#6E6E73", "move_button_text_hover": "#1C1C1E",
+        "delete_button": "#F6D5D5", "delete_button_hover": "#EFBDBD",
+    },
+}
+THEME_COLOR = re.compile(r"#(?:[0-9A-Fa-f]{3}|[0-9A-Fa-f]{6}|[0-9A-Fa-f]{8})")  # #RGB, #RRGGBB, #AARRGGBB
+
+
+def list_themes():
+    """Theme names: the built-in ones, then the user themes alphabetically."""
+    try:
+        files = os.listdir(THEMES_DIR)
+    except OSError:
+        files = []
+    names = {f[:-len(".json")] for f in files if f.endswith(".json")} - set(BUILTIN_THEMES)
+    return list(BUILTIN_THEMES) + sorted(names, key=str.lower)
+
+
+def load_theme(name):
+    """The colours of theme `name` ({key: "#RRGGBB"}, every key of the
+    built-in themes). Unknown or unreadable themes give the default one."""
+    if name in BUILTIN_THEMES:
+        return dict(BUILTIN_THEMES[name])
+    data = None
+    if name and library_name(name) == name:
+        try:
+            with open(os.path.join(THEMES_DIR, name + ".json"), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not load theme {name}: {e}")
+    if not isinstance(data, dict):
+        return dict(BUILTIN_THEMES[DEFAULT_THEME])
+    colors = dict(BUILTIN_THEMES.get(data.get("base"), BUILTIN_THEMES[DEFAULT_THEME]))
+    for key, value in data.items():
+        if key in colors and isinstance(value, str) and THEME_COLOR.fullmatch(value.strip()):
+            colors[key] = value.strip()
+    return colors
+
+
+# --- Rich snippets ---
+# Images, HTML and file lists are kept out of the library files: every
+# clipboard format is a blob named by the SHA-256 of its bytes, so the same
+# screenshot saved twice, or in two libraries, is stored once. A snippet's
+# row only holds the keys (Sentence.payload); the blobs are read when it is
+# copied, and cards show thumbnails from a cache of their own.
+BLOB_KEY = re.compile(r"[0-9a-f]{64}")
+
+
+class BlobStore:
+    """Content-addressed files under BLOBS_DIR (blobs/ab/cdef...).
+
+    put() hashes on the calling thread and leaves the write to a background
+    one; until the file is there, get() answers from memory.
+    """
+    def __init__(self, root=None):
+        self.root = root or BLOBS_DIR
+        self._lock = threading.Lock()
+        self._unwritten = {}  # key -> bytes not on disk yet
+
+    @staticmethod
+    def key_for(data):
+        import hashlib
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, key):
+        if not BLOB_KEY.fullmatch(key):
+            raise ValueError(f"not a blob key: {key!r}") # Keys come from library files
+        return os.path.join(self.root, key[:2], key[2:])
+
+    def put(self, data):
+        """Stores `data`, unless it is there already, and returns its key."""
+        key = self.key_for(data)
+        with self._lock:
+            if key in self._unwritten or os.path.exists(self.path(key)):
+                return key
+            self._unwritten[key] = data
+        # Not a daemon: exiting waits for the file
+        threading.Thread(target=self._write, args=(key, data), name="CopyCatBlobWriter").start()
+        return key
+
+    def _write(self, key, data):
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error saving blob {key}: {e}") # Kept in memory for this session
+            return
+        with self._lock:
+            self._unwritten.pop(key, None)
+
+    def get(self, key):
+        """The bytes of blob `key`; OSError if it is missing."""
+        with self._lock:
+            data = self._unwritten.get(key)
+        if data is not None:
+            return data
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def stored(self):
+        """(key, path) for every blob on disk."""
+        try:
+            folders = os.listdir(self.root)
+        except OSError:
+            return
+        for folder in folders:
+            try:
+                names = os.listdir(os.path.join(self.root, folder))
+            except OSError:
+                continue
+            for name in names:
+                if BLOB_KEY.fullmatch(folder + name):
+                    yield folder + name, os.path.join(self.root, folder, name)
+
+
+def payload_formats(payload):
+    """{mime type: blob key} of a Sentence.payload ({} for a plain snippet)."""
+    return json.loads(payload) if payload else {}
+
+
+def make_payload(blobs, formats):
+    """Puts {mime type: bytes} in `blobs`; returns the Sentence.payload."""
+    return json.dumps({mime: blobs.put(data) for mime, data in formats.items()}, sort_keys=True)
+
+
+def prune_blobs(blobs=None, min_age=7 * 86400):
+    """Deletes the blobs (and thumbnails) that no library refers to.
+
+    Blobs younger than `min_age` seconds stay: an undo in a running app may
+    still bring back the snippet that used them. Returns (files, bytes) freed.
+    """
+    blobs = blobs or BlobStore()
+    referenced = set()
+    for backend in STORAGE_BACKENDS:
+        for library in list_libraries(backend):
+            store = open_store(backend, library)
+            try:
+                if os.path.exists(store.path):
+                    for s in store.load():
+                        referenced.update(payload_formats(s.payload).values())
+            finally:
+                store.close()
+    now = time.time()
+    removed, freed = 0, 0
+    for key, path in list(blobs.stored()):
+        try:
+            st = os.stat(path)
+            if key in referenced or now - st.st_mtime < min_age:
+                continue
+            os.remove(path)
+        except OSError:
+            continue
+        removed += 1
+        freed += st.st_size
+        try:
+            os.rmdir(os.path.dirname(path)) # Only goes if that was its last blob
+        except OSError:
+            pass
+    try:
+        thumbnails = os.listdir(THUMBNAILS_DIR)
+    except OSError:
+        thumbnails = []
+    for name in thumbnails:
+        key = name.split("-", 1)[0]
+        if key not in referenced and BLOB_KEY.fullmatch(key) and not os.path.exists(blobs.path(key)):
+            try:
+                os.remove(os.path.join(THUMBNAILS_DIR, name))
+            except OSError:
+                pass
+    return removed, freed
+
+
+# --- Templates ---
+# A snippet containing {date}, {time}, {clipboard}, {counter} or {prompt:...}
+# is a template, filled in each time it is copied. Other braces (code, JSON)
+# are left alone, and {{date}} copies as a literal {date}.
+TEMPLATE_FIELDS = ("date", "time", "clipboard", "counter", "prompt")
+TEMPLATE_FIELD = re.compile(
+    r"\{\{((?:%s)(?::[^{}]*)?)\}\}|\{(%s)(?::([^{}]*))?\}" % (("|".join(TEMPLATE_FIELDS),) * 2))
+DEFAULT_FORMATS = {"date": "%Y-%m-%d", "time": "%H:%M"}
+
+
+class Template:
+    """A snippet's text split once into literal text and fields.
+
+    `parts` holds strings and (field, argument) pairs; `fields` is the set
+    of field names used, and `prompts` lists the {prompt:Label} labels in
+    order, each asked once per copy.
+    """
+    __slots__ = ("parts", "fields", "prompts")
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.fields = frozenset(part[0] for part in parts if not isinstance(part, str))
+        self.prompts = list(dict.fromkeys(part[1] for part in parts
+                                          if not isinstance(part, str) and part[0] == "prompt"))
+
+    def expand(self, now=None, clipboard="", counter=1, answers=None):
+        """The text to copy. `counter` is which copy this is (uses + 1), and
+        `answers` maps prompt labels to what the user typed."""
+        now = time.localtime(now)
+        answers = answers or {}
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            field, arg = part
+            if field in DEFAULT_FORMATS:
+                try:
+                    out.append(time.strftime(arg or DEFAULT_FORMATS[field], now))
+                except ValueError: # A directive this platform doesn't know
+                    out.append(arg)
+            elif field == "clipboard":
+                out.append(clipboard or "")
+            elif field == "counter":
+                out.append(str(counter + int(arg) - 1 if arg and arg.lstrip("-").isdigit() else counter))
+            else:
+                out.append(answers.get(arg, ""))
+        return "".join(out)
+
+
+def compile_template(text):
+    """A Template for `text`, or None if it has no fields or escaped
+    fields (most snippets)."""
+    if "{" not in text:
+        return None
+    parts = []
+    last = 0
+    for match in TEMPLATE_FIELD.finditer(text):
+        if match.start() > last:
+            parts.append(text[last:match.start()])
+        if match.group(1) is not None:
+            parts.append("{" + match.group(1) + "}")
+        else:
+            arg = match.group(3)
+            if match.group(2) == "prompt" and not arg:
+                arg = "Value"
+            parts.append((match.group(2), arg))
+        last = match.end()
+    if not parts:
+        return None
+    if last < len(text):
+        parts.append(text[last:])
+    return Template(parts)
+
+
+class TemplateCache:
+    """Compiled templates by sentence id, least recently copied dropped first.
+
+    An entry remembers the text it was compiled from, so an edited snippet
+    is compiled again the next time it is copied; discard() drops one at
+    once. Plain snippets are cached as None, so copying them costs one
+    lookup.
+    """
+    MAX_ITEMS = 1024
+
+    def __init__(self):
+        self._entries = OrderedDict()  # sentence id -> (text, Template or None)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, sentence_id, text):
+        entry = self._entries.get(sentence_id)
+        if entry is not None and (entry[0] is text or entry[0] == text):
+            self._entries.move_to_end(sentence_id)
+            return entry[1]
+        template = compile_template(text)
+        self._entries[sentence_id] = (text, template)
+        self._entries.move_to_end(sentence_id)
+        if len(self._entries) > self.MAX_ITEMS:
+            self._entries.popitem(last=False)
+        return template
+
+    def discard(self, sentence_id):
+        self._entries.pop(sentence_id, None)
+
+
+# --- Single instance ---
+# The running app listens on a QLocalServer. A new launch connects to it
+# before importing Qt, sends its request as one JSON line and exits; the
+# client side uses only the standard library, so handing off costs about
+# as much as starting Python. QLocalServer listens on a named pipe on
+# Windows and on a Unix socket at the given path elsewhere.
+def instance_server_name():
+    """Per user and per data folder (COPYCAT_DATA_DIR gets its own instance)."""
+    import getpass
+    import hashlib
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = "user"
+    folder = hashlib.blake2b(os.path.abspath(app_data_dir).encode("utf-8"), digest_size=4).hexdigest()
+    name = re.sub(r"[^\w-]", "_", f"CopyCat-{user}-{folder}")
+    if sys.platform == "win32":
+        return name
+    return os.path.join(os.environ.get("TMPDIR") or "/tmp", name)
+
+
+def launch_request(argv):
+    """Parses the app's command line into (request, new_instance).
+
+    The request is what the instance that ends up handling it should do:
+    {"show": True} by default, or any of "add", "copy" and "palette".
+    """
+    import argparse # Only the app's own startup needs it
+    parser = argparse.ArgumentParser(
+        prog="CopyCat", description="If CopyCat is already running, the request goes to it.")
+    parser.add_argument("--add", metavar="TEXT", help="add a sentence to the open library")
+    parser.add_argument("--copy", metavar="QUERY", help="copy the best match for QUERY")
+    parser.add_argument("--palette", action="store_true", help="open the quick-paste palette")
+    parser.add_argument("--new-instance", action="store_true", help="start a separate copy of the app")
+    args, _ = parser.parse_known_args(argv) # Leave Qt's own options alone
+    request = {key: value for key, value in (("add", args.add), ("copy", args.copy), ("palette", args.palette))
+               if value}
+    return request or {"show": True}, args.new_instance
+
+
+def send_to_running_instance(request, timeout=30.0):
+    """Hands `request` to a running CopyCat.
+
+    True if it took the request, False if none is running. None if one is
+    running but hasn't answered within `timeout` (a large library can keep
+    it busy for seconds): it already has the request, so starting a second
+    copy would only apply it twice.
+    """
+    message = json.dumps(request).encode("utf-8") + b"\n"
+    name = instance_server_name()
+    if sys.platform == "win32":
+        try:
+            pipe = open("\\\\.\\pipe\\" + name, "r+b", buffering=0)
+        except FileNotFoundError: # Nobody listening: start normally
+            return False
+        except OSError:
+            return None # All pipe instances busy: it's there
+        try:
+            with pipe:
+                pipe.write(message)
+                return True if pipe.readline().strip() == b"ok" else None
+        except OSError:
+            return None
+    import socket
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(name)
+        except (FileNotFoundError, ConnectionRefusedError): # None, or a socket left by a crash
+            return False
+        except OSError:
+            return None # Bound but not accepting (socket.timeout is an OSError too)
+        try:
+            sock.sendall(message)
+            return True if sock.makefile("rb").readline().strip() == b"ok" else None
+        except OSError:
+            return None
+
+
+# --- Import / export ---
+# Plain text (one snippet per line), CSV (a "text" column, or the first
+# column) and JSON (the {"col1", "col2"} library format, a list of strings
+# or a list of {"text": ...} objects). Text and CSV are read as a stream.
+TRANSFER_FORMATS = {".txt": "txt", ".csv": "csv", ".json": "json"}
+
+
+def transfer_format(path):
+    """The format for a file name, from its extension (default: txt)."""
+    return TRANSFER_FORMATS.get(os.path.splitext(path)[1].lower(), "txt")
+
+
+def content_key(text):
+    """Hash that identifies a text, for de-duplication."""
+    import hashlib # Loads OpenSSL; most CLI commands never hash
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class TransferProgress:
+    """Shared by an import/export thread and whoever shows its progress."""
+    __slots__ = ("total", "done", "rows", "cancelled")
+
+    def __init__(self, total=0):
+        self.total = total  # bytes (import) or rows (export)
+        self.done = 0
+        self.rows = 0       # rows read or written so far
+        self.cancelled = False
+
+
+def _read_lines(path, progress):
+    with open(path, "rb") as f:
+        for i, raw in enumerate(f):
+            if progress.cancelled:
+                return
+            progress.done += len(raw)
+            line = raw.decode("utf-8", "replace")
+            yield line.lstrip("\ufeff") if i == 0 else line
+
+
+def iter_import(path, fmt=None, progress=None):
+    """Yields (text, column or None) from an import file, without reading
+    text or CSV files into memory. Stops once progress.cancelled is set."""
+    fmt = fmt or transfer_format(path)
+    progress = progress or TransferProgress()
+    progress.total = os.path.getsize(path)
+    if fmt == "json":
+        rows = _json_rows(path)
+        progress.done = progress.total
+    elif fmt == "csv":
+        rows = _csv_rows(_read_lines(path, progress))
+    else:
+        rows = ((line.rstrip("\r\n"), None) for line in _read_lines(path, progress))
+    for text, column in rows:
+        if progress.cancelled:
+            return
+        if text.strip():
+            progress.rows += 1
+            yield text, column
+
+
+def _csv_rows(lines):
+    import csv # Import/export only; keep it off the CLI's startup path
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        return
+    names = [name.strip().lower() for name in header]
+    if "text" in names:
+        text_index = names.index("text")
+        column_index = names.index("column") if "column" in names else None
+    else: # No header: the first row is a snippet too
+        text_index, column_index = 0, None
+        if header:
+            yield header[0], None
+    for record in reader:
+        if len(record) <= text_index:
+            continue
+        column = None
+        if column_index is not None and column_index < len(record) and record[column_index].strip() in ("1", "2"):
+            column = int(record[column_index]) - 1
+        yield record[text_index], column
+
+
+def _json_rows(path):
+    with open(path, "r", encoding="utf-8-sig") as f:
+        data = json.load(f) # The stdlib has no streaming JSON parser
+    if isinstance(data, dict):
+        return ([(_json_text(item), 0) for item in data.get("col1", [])]
+                + [(_json_text(item), 1) for item in data.get("col2", [])])
+    if isinstance(data, list):
+        return [(_json_text(item), None) for item in data]
+    raise ValueError("expected a list or a {\"col1\", \"col2\"} object")
+
+
+def _json_text(item):
+    # Rich snippets are {"text": ..., "payload": {...}} (see read_legacy_json);
+    # only their text is imported
+    return str(item.get("text", "")) if isinstance(item, dict) else str(item)
+
+
+def dedup_rows(rows, seen):
+    """Drops (text, column) rows whose text is in `seen` (a set of
+    content_key()s) or repeats an earlier row; `seen` grows as it goes."""
+    for text, column in rows:
+        key = content_key(text)
+        if key not in seen:
+            seen.add(key)
+            yield text, column
+
+
+def export_texts(path, rows, fmt=None, progress=None):
+    """Writes (column, text) rows to `path` via a temp file and returns the
+    count, or None if progress.cancelled stopped it (nothing is written)."""
+    fmt = fmt or transfer_format(path)
+    progress = progress or TransferProgress()
+    tmp_path = path + ".tmp"
+    columns = ([], [])
+    if fmt == "csv":
+        import csv
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer is not None:
+            writer.writerow(["text", "column"])
+        for column, text in rows:
+            if progress.cancelled:
+                break
+            if writer is not None:
+                writer.writerow([text, column + 1])
+            elif fmt == "json":
+                columns[1 if column else 0].append(text)
+            else: # One per line, so line breaks inside a snippet become spaces
+                f.write(" ".join(text.splitlines()) + "\n")
+            progress.rows += 1
+            progress.done = progress.rows
+        if fmt == "json" and not progress.cancelled:
+            json.dump({"col1": columns[0], "col2": columns[1]}, f, indent=4, ensure_ascii=False)
+    if progress.cancelled:
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+    return progress.rows
+
+
+# --- Undo history ---
+# A command keeps, for each sentence it touched, the state before and after:
+# (column, row, text, uses, last_used, payload), or None where the sentence
+# did not exist. Rows are indices in the column as it was right after (or
+# before) the command, so undoing in order puts every row back exactly,
+# however the positions were renumbered meanwhile. text/uses/last_used are
+# None when the command left them alone, which keeps moves down to a few
+# numbers per row; payload is only given where a rich snippet comes back.
+class UndoCommand:
+    __slots__ = ("label", "before", "after", "merge_key", "size")
+    STATE_BYTES = 150  # dict slot, tuple and numbers, per sentence and side
+
+    def __init__(self, label, before, after, merge_key=None):
+        self.label = label
+        self.before = before  # id -> state or None
+        self.after = after
+        self.merge_key = merge_key
+        self.size = sum(
+            self.STATE_BYTES + (0 if state is None else sum(2 * len(part) for part in (state[2], state[5]) if part))
+            for states in (before, after) for state in states.values()
+        )
+
+
+class UndoStack:
+    """Undo/redo for the sentence operations, capped by memory.
+
+    Pushing a command whose merge_key matches the one on top folds the two
+    into one (repeated moves of the same rows); once the commands take more
+    than `max_bytes`, the oldest are forgotten.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._commands = []
+        self._index = 0  # commands[:index] can be undone, the rest redone
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self._commands)
+
+    def push(self, label, before, after, merge_key=None):
+        """Records a command that has already been carried out. Returns
+        False if it alone is over the memory cap (the history is cleared)."""
+        for command in self._commands[self._index:]:
+            self.bytes -= command.size
+        del self._commands[self._index:]
+        if merge_key is not None and self._commands and self._commands[-1].merge_key == merge_key:
+            top = self._commands.pop()
+            self.bytes -= top.size
+            before = top.before
+        if before == after: # A merge that came back to where it started
+            self._index = len(self._commands)
+            return True
+        command = UndoCommand(label, before, after, merge_key)
+        self._commands.append(command)
+        self.bytes += command.size
+        while self.bytes > self.max_bytes and self._commands:
+            self.bytes -= self._commands.pop(0).size
+        self._index = len(self._commands)
+        return bool(self._commands) and self._commands[-1] is command
+
+    def undo(self):
+        """Steps back; returns the command to revert (apply its `before`), or None."""
+        if self._index == 0:
+            return None
+        self._index -= 1
+        return self._commands[self._index]
+
+    def redo(self):
+        """Steps forward; returns the command to apply again (its `after`), or None."""
+        if self._index == len(self._commands):
+            return None
+        self._index += 1
+        return self._commands[self._index - 1]
+
+    def undo_label(self):
+        return self._commands[self._index - 1].label if self._index > 0 else None
+
+    def redo_label(self):
+        return self._commands[self._index].label if self._index < len(self._commands) else None
+
+    def clear(self):
+        self._commands.clear()
+        self._index = 0
+        self.bytes = 0
+
+
+# --- Clipboard history ---
+class HistoryEntry:
+    __slots__ = ("key", "text", "uses", "first_seen", "last_seen", "size")
+
+    def __init__(self, key, text, uses=1, first_seen=0.0, last_seen=0.0):
+        self.key = key
+        self.text = text
+        self.uses = uses
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.size = len(text.encode("utf-8", "surrogatepass"))
+
+
+class ClipboardHistory:
+    """Recent clipboard texts, deduplicated by content hash.
+
+    Bounded by entry count and total UTF-8 bytes. Entries are kept least
+    recently used first; when over a bound, the least-used entry among the
+    EVICTION_WINDOW oldest is dropped, so a snippet copied often survives a
+    burst of one-off copies (LRU with a frequency tiebreak, i.e. frecency).
+    """
+    MAX_ITEMS = 200
+    MAX_BYTES = 2 * 1024 * 1024
+    MAX_ENTRY_BYTES = 256 * 1024  # bigger copies are not recorded at all
+    EVICTION_WINDOW = 16
+
+    def __init__(self, store=None, max_items=MAX_ITEMS, max_bytes=MAX_BYTES):
+        self.store = store
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> HistoryEntry, least recent first
+        self._bytes = 0
+
+    @staticmethod
+    def key_for(text):
+        return content_key(text)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        """Fills the history from the store (if any), trimming to the bounds."""
+        if self.store is None:
+            return
+        for entry in self.store.load():
+            self._entries[entry.key] = entry
+            self._bytes += entry.size
+        self._evict()
+
+    def record(self, text, now=None):
+        """Adds or refreshes `text`; returns its entry, or None if skipped."""
+        if not text or not text.strip():
+            return None
+        data = text.encode("utf-8", "surrogatepass")
+        if len(data) > self.MAX_ENTRY_BYTES:
+            return None
+        now = time.time() if now is None else now
+        key = self.key_for(text)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = HistoryEntry(key, text, 1, now, now)
+            self._entries[key] = entry
+            self._bytes += entry.size
+        else:
+            entry.uses += 1
+            entry.last_seen = now
+            self._entries.move_to_end(key)
+        if self.store is not None:
+            self.store.save_entries([entry])
+        self._evict()
+        return entry
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+            if self.store is not None:
+                self.store.delete([key])
+        return entry
+
+    def entries(self):
+        """Entries, most recently used first."""
+        return list(reversed(self._entries.values()))
+
+    def _evict(self):
+        evicted = []
+        while self._entries and (len(self._entries) > self.max_items or self._bytes > self.max_bytes):
+            window = itertools.islice(self._entries.values(), self.EVICTION_WINDOW)
+            victim = min(window, key=lambda e: e.uses)  # ties go to the oldest
+            del self._entries[victim.key]
+            self._bytes -= victim.size
+            evicted.append(victim.key)
+        if evicted and self.store is not None:
+            self.store.delete(evicted)
+
+
+# --- Usage stats ---
+class UsageStats:
+    """Copies of a library's sentences that have not been saved yet.
+
+    record() updates the Sentence at once, so rankings and sort orders see
+    the copy, but only notes the id for saving: take() hands over every
+    id copied since the last call, and the caller saves those rows in one
+    batch instead of writing a row per copy. If another process rewrites a
+    row meanwhile, reapply() carries the unsaved copies over to its version.
+    """
+    def __init__(self):
+        self._pending = {}  # sentence id -> [unsaved copies, time of the last one]
+
+    def __len__(self):
+        return len(self._pending)
+
+    def record(self, sentence, now=None):
+        now = time.time() if now is None else now
+        sentence.uses += 1
+        sentence.last_used = now
+        pending = self._pending.get(sentence.id)
+        if pending is None:
+            self._pending[sentence.id] = [1, now]
+        else:
+            pending[0] += 1
+            pending[1] = now
+
+    def reapply(self, incoming, current):
+        """Keeps the unsaved copies of `current` when another process's
+        version of it, `incoming`, replaces it."""
+        if current is not None and current.id in self._pending:
+            incoming.uses = max(incoming.uses, current.uses)
+            incoming.last_used = max(incoming.last_used, current.last_used)
+
+    def take(self):
+        """The ids copied since the last take(), now considered saved."""
+        ids = list(self._pending)
+        self._pending.clear()
+        return ids
+
+
+# --- Frecency ranking ---
+class FrecencyIndex:
+    """Copied sentences, most often and most recently copied first.
+
+    A sentence's key is log2(1 + uses) + last_used / HALF_LIFE, so a week of
+    not being used weighs as much as half the copies. Every key ages at the
+    same rate, which means the order never goes stale: the sorted list is
+    built once and only touched when a copy is recorded. Sentences that were
+    never copied are not ranked at all.
+    """
+    HALF_LIFE = 7 * 24 * 3600.0  # seconds
+
+    def __init__(self):
+        self._keys = {}   # sentence id -> key
+        self._order = []  # sorted (-key, id), best first
+
+    def __len__(self):
+        return len(self._order)
+
+    @classmethod
+    def key(cls, uses, last_used):
+        return math.log2(1 + uses) + last_used / cls.HALF_LIFE if uses else 0.0
+
+    def build(self, sentences):
+        self._keys = {s.id: self.key(s.uses, s.last_used) for s in sentences if s.uses}
+        self._order = sorted((-key, sentence_id) for sentence_id, key in self._keys.items())
+
+    def update(self, sentence):
+        """Re-ranks a sentence after its uses/last_used changed."""
+        self.remove(sentence.id)
+        if sentence.uses:
+            key = self._keys[sentence.id] = self.key(sentence.uses, sentence.last_used)
+            bisect.insort(self._order, (-key, sentence.id))
+
+    def remove(self, sentence_id):
+        key = self._keys.pop(sentence_id, None)
+        if key is not None:
+            del self._order[bisect.bisect_left(self._order, (-key, sentence_id))]
+
+    def top(self, n):
+        """The ids of the `n` best-ranked sentences."""
+        return [sentence_id for _, sentence_id in self._order[:n]]
+
+    def best(self, scores, n):
+        """The `n` best ids of a SearchIndex result: by match score, then frecency."""
+        import heapq # Only the palette ranks; the CLI never does
+        keys = self._keys
+        # Never-copied sentences only compete on score, which needs no Python key
+        candidates = set(heapq.nlargest(n, scores, key=scores.get))
+        small, large = (keys, scores) if len(keys) < len(scores) else (scores, keys)
+        candidates.update(i for i in small if i in large)
+        return heapq.nlargest(n, candidates, key=lambda i: (scores[i], keys.get(i, 0.0)))
+
+
+# --- Search index ---
+# An inverted index from words to sentence ids, plus a trigram index over the
+# vocabulary for typo tolerance. Adds, edits and deletes update it in place,
+# so a keystroke never rescans the library.
+class SearchIndex:
+    WORD_RE = re.compile(r"\w+")
+    MIN_QUERY_LENGTH = 2    # one letter would match a third of the library
+    FUZZY_THRESHOLD = 0.45  # min. trigram Jaccard similarity for a typo match
+    EXACT_SCORE = 3.0
+    PREFIX_SCORE = 2.0
+    FUZZY_SCORE = 1.0       # plus the similarity, so always below a prefix hit
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}      # sentence id -> tuple of unique words
+        self._postings = {}  # word -> set of sentence ids
+        self._vocab = []     # sorted words, for prefix lookups
+        self._trigrams = {}  # trigram -> set of words
+        self._replay = None  # changes made while build() runs in a thread
+
+    @classmethod
+    def tokenize(cls, text):
+        return cls.WORD_RE.findall(text.lower())
+
+    @staticmethod
+    def word_trigrams(word):
+        padded = f" {word} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def build(self, items):
+        """Indexes (id, text) pairs from scratch. Safe to run in a thread."""
+        with self._lock:
+            self._replay = []
+        docs, postings = {}, {}
+        for sentence_id, text in items:
+            words = tuple(set(self.tokenize(text)))
+            docs[sentence_id] = words
+            for word in words:
+                postings.setdefault(word, set()).add(sentence_id)
+        trigrams = {}
+        for word in postings:
+            for gram in self.word_trigrams(word):
+                trigrams.setdefault(gram, set()).add(word)
+        with self._lock:
+            self._docs, self._postings, self._trigrams = docs, postings, trigrams
+            self._vocab = sorted(postings)
+            replay, self._replay = self._replay, None
+            for method, args in replay:
+                method(*args)
+
+    def add(self, sentence_id, text):
+        """Indexes a new sentence, or re-indexes an edited one."""
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((self._add, (sentence_id, text)))
+            self._add(sentence_id, text)
+
+    def add_many(self, items):
+        """add() for a batch of (id, text) pairs, holding the lock once."""
+        with self._lock:
+            for sentence_id, text in items:
+                self.add(sentence_id, text)
+
+    def remove(self, sentence_id):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((self._remove, (sentence_id,)))
+            self._remove(sentence_id)
+
+    def _add(self, sentence_id, text):
+        self._remove(sentence_id)
+        words = tuple(set(self.tokenize(text)))
+        self._docs[sentence_id] = words
+        for word in words:
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                bisect.insort(self._vocab, word)
+                for gram in self.word_trigrams(word):
+                    self._trigrams.setdefault(gram, set()).add(word)
+            ids.add(sentence_id)
+
+    def _remove(self, sentence_id):
+        for word in self._docs.pop(sentence_id, ()):
+            ids = self._postings[word]
+            ids.discard(sentence_id)
+            if ids:
+                continue
+            del self._postings[word]
+            del self._vocab[bisect.bisect_left(self._vocab, word)]
+            for gram in self.word_trigrams(word):
+                words = self._trigrams[gram]
+                words.discard(word)
+                if not words:
+                    del self._trigrams[gram]
+
+    def search(self, query):
+        """Returns {sentence id: score} for sentences matching every word of
+        the query (exact, prefix or typo), or None for an empty query."""
+        tokens = set(self.tokenize(query))
+        if not tokens or len(query.strip()) < self.MIN_QUERY_LENGTH:
+            return None
+        with self._lock:
+            result = None
+            for token in tokens:
+                matches = self._match_token(token)
+                if result is None:
+                    result = matches
+                else:
+                    small, large = (matches, result) if len(matches) < len(result) else (result, matches)
+                    result = {i: score + large[i] for i, score in small.items() if i in large}
+                if not result:
+                    return {}
+            return result
+
+    def _match_token(self, token):
+        vocab, postings = self._vocab, self._postings
+        lo = bisect.bisect_left(vocab, token)
+        hi = bisect.bisect_left(vocab, token + "\uffff")
+        scores = dict.fromkeys(set().union(*(postings[w] for w in vocab[lo:hi])), self.PREFIX_SCORE)
+        if token in postings:
+            scores.update(dict.fromkeys(postings[token], self.EXACT_SCORE))
+        if len(token) < 3:
+            return scores
+
+        grams = self.word_trigrams(token)
+        shared = {}
+        for gram in grams:
+            for word in self._trigrams.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        for word, count in shared.items():
+            if word.startswith(token):
+                continue
+            similarity = count / (len(grams) + len(word) - count)  # a word has len(word) trigrams
+            if similarity < self.FUZZY_THRESHOLD:
+                continue
+            score = self.FUZZY_SCORE + similarity
+            for i in postings[word]:
+                if scores.get(i, 0.0) < score:
+                    scores[i] = score
+        return scores
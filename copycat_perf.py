@@ -0,0 +1,170 @@
+"""Lightweight timing spans and counters for CopyCat's hot paths.
+
+Off by default. While disabled, span() returns one shared do-nothing
+context manager and count() returns after a single attribute check, so the
+instrumented code pays next to nothing. Turn it on with COPYCAT_PERF=1 or
+Ctrl+Shift+P in the app, then export a Chrome trace (chrome://tracing,
+Perfetto) with Ctrl+Shift+E to attach to a bug report.
+
+No snippet text is ever recorded: only operation names, durations and counts.
+"""
+import os
+import sys
+import json
+import functools
+import threading
+import time
+from collections import deque
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("perf", "name", "start")
+
+    def __init__(self, perf, name):
+        self.perf = perf
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.perf.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Perf:
+    """Spans (name, start, duration, thread) and counters, kept in memory.
+
+    Only the last MAX_EVENTS events are kept, so leaving it on is bounded;
+    per-name totals (count, total, max) cover the whole session.
+    """
+    MAX_EVENTS = 50000
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._events = deque(maxlen=self.MAX_EVENTS)  # (kind, name, ts, dur, tid, value)
+        self.stats = {}     # span name -> [count, total seconds, max seconds]
+        self.counters = {}  # counter name -> value
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self.stats.clear()
+            self.counters.clear()
+
+    # --- Recording ---
+    def span(self, name):
+        """`with perf.span("name"):` times the block (when enabled)."""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def timed(self, name=None):
+        """Decorator form of span(); the check happens on every call, so it
+        can be turned on and off at runtime."""
+        def decorate(func):
+            span_name = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.record(span_name, start, time.perf_counter())
+            return wrapper
+        return decorate
+
+    def record(self, name, start, end):
+        """Adds a finished span measured with time.perf_counter()."""
+        if not self.enabled:
+            return
+        duration = end - start
+        with self._lock:
+            stat = self.stats.get(name)
+            if stat is None:
+                self.stats[name] = [1, duration, duration]
+            else:
+                stat[0] += 1
+                stat[1] += duration
+                if duration > stat[2]:
+                    stat[2] = duration
+            self._events.append(("X", name, start, duration, threading.get_ident(), None))
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            value = self.counters.get(name, 0) + n
+            self.counters[name] = value
+            self._events.append(("C", name, time.perf_counter(), 0.0, threading.get_ident(), value))
+
+    # --- Reporting ---
+    def summary(self):
+        """[(name, count, mean ms, max ms)], slowest total first."""
+        with self._lock:
+            rows = [(name, count, total * 1000 / count, peak * 1000, total)
+                    for name, (count, total, peak) in self.stats.items()]
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return [row[:4] for row in rows]
+
+    def chrome_trace(self):
+        """The recorded events in Chrome trace-event format."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            counters = dict(self.counters)
+        trace = []
+        for kind, name, ts, duration, tid, value in events:
+            event = {"name": name, "ph": kind, "ts": round((ts - self._origin) * 1e6, 1), "pid": pid, "tid": tid}
+            if kind == "X":
+                event["cat"] = "copycat"
+                event["dur"] = round(duration * 1e6, 1)
+            else:
+                event["args"] = {"value": value}
+            trace.append(event)
+        return {
+            "traceEvents": trace,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "platform": sys.platform,
+                "python": sys.version.split()[0],
+                "counters": counters,
+                "summary": [
+                    {"name": name, "count": count, "mean_ms": round(mean, 3), "max_ms": round(peak, 3)}
+                    for name, count, mean, peak in self.summary()
+                ],
+            },
+        }
+
+    def export(self, path):
+        """Writes chrome_trace() to `path` as JSON."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+
+perf = Perf()
+if os.environ.get("COPYCAT_PERF") == "1":
+    perf.enable()
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repo, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import copycat_core
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """Points copycat_core's data folder paths at an empty temp folder."""
+    folders = {"app_data_dir": "", "DATA_FILE": "sentences.json", "DB_FILE": "sentences.db",
+               "BLOBS_DIR": "blobs", "THUMBNAILS_DIR": "thumbnails", "LIBRARIES_DIR": "libraries",
+               "THEMES_DIR": "themes"}
+    for name, relative in folders.items():
+        monkeypatch.setattr(copycat_core, name, str(tmp_path / relative))
+    return tmp_path
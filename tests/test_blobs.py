@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from copycat_core import BlobStore, create_library, open_store, prune_blobs
+
+WEEK = 7 * 86400
+
+
+def wait_for_writes():
+    for thread in threading.enumerate():
+        if thread.name == "CopyCatBlobWriter":
+            thread.join()
+
+
+def test_put_get_and_dedup(tmp_path):
+    blobs = BlobStore(str(tmp_path))
+    key = blobs.put(b"\x89PNG pixels")
+    assert key == hashlib.sha256(b"\x89PNG pixels").hexdigest() == BlobStore.key_for(b"\x89PNG pixels")
+    assert blobs.get(key) == b"\x89PNG pixels"  # Maybe still in memory
+    wait_for_writes()
+    assert os.path.exists(blobs.path(key))
+    assert blobs.put(b"\x89PNG pixels") == key
+    assert BlobStore(str(tmp_path)).get(key) == b"\x89PNG pixels"
+    assert list(blobs.stored()) == [(key, blobs.path(key))]
+    with pytest.raises(OSError):
+        blobs.get(BlobStore.key_for(b"never stored"))
+
+
+@pytest.mark.parametrize("key", ["", "../../etc/passwd", "AB" + "0" * 62, "0" * 63])
+def test_path_rejects_what_is_not_a_key(tmp_path, key):
+    with pytest.raises(ValueError):
+        BlobStore(str(tmp_path)).path(key)
+
+
+def test_prune_keeps_used_and_recent_blobs(data_dir):
+    blobs = BlobStore()
+    keys = {}
+    for name in ("in default", "in json library", "unused", "unused but new"):
+        data = name.encode()
+        keys[name] = key = BlobStore.key_for(data)
+        os.makedirs(os.path.dirname(blobs.path(key)), exist_ok=True)
+        with open(blobs.path(key), "wb") as f:
+            f.write(data)
+        if name != "unused but new":
+            old = time.time() - 2 * WEEK
+            os.utime(blobs.path(key), (old, old))
+
+    for backend, library, name in (("sqlite", "Default", "in default"), ("json", "Work", "in json library")):
+        if library != "Default":
+            create_library(library, backend)
+        store = open_store(backend, library)
+        store.load()
+        sentence = store.append(name)
+        sentence.payload = json.dumps({"image/png": keys[name]})
+        store.save([sentence])
+        store.close()
+
+    thumbnails = data_dir / "thumbnails"
+    thumbnails.mkdir()
+    for name in ("in default", "unused"):
+        (thumbnails / f"{keys[name]}-128.png").write_bytes(b"png")
+
+    assert prune_blobs(blobs) == (1, len(b"unused"))
+    assert {key for key, _ in blobs.stored()} == {keys["in default"], keys["in json library"], keys["unused but new"]}
+    assert not os.path.exists(os.path.dirname(blobs.path(keys["unused"])))
+    assert os.listdir(thumbnails) == [f"{keys['in default']}-128.png"]
+    assert prune_blobs(blobs, min_age=0) == (1, len(b"unused but new"))
@@ -0,0 +1,58 @@
+from copycat_core import POSITION_STEP, Sentence, SentenceColumn
+
+
+def make_column(count):
+    return SentenceColumn(0, [Sentence(i, f"s{i}", 0, i * POSITION_STEP) for i in range(1, count + 1)])
+
+
+def ids(column):
+    return [s.id for s in column]
+
+
+def test_insert_goes_between_neighbours():
+    column = make_column(3)
+    block = [Sentence(10, "a"), Sentence(11, "b")]
+    changed = column.insert(1, block)
+    assert changed == block # The other rows keep their positions
+    assert ids(column) == [1, 10, 11, 2, 3]
+    assert column[0].position < block[0].position < block[1].position < column[3].position
+    assert [column.row_of(i) for i in (1, 10, 11, 2, 3)] == [0, 1, 2, 3, 4]
+
+
+def test_insert_at_the_ends():
+    column = make_column(2)
+    column.insert(0, [Sentence(10, "first")])
+    column.insert(len(column), [Sentence(11, "last")])
+    assert ids(column) == [10, 1, 2, 11]
+    positions = [s.position for s in column]
+    assert positions == sorted(positions)
+
+
+def test_insert_renumbers_when_there_is_no_room():
+    column = SentenceColumn(0, [Sentence(1, "a", 0, 0.0), Sentence(2, "b", 0, 5e-324)])
+    changed = column.insert(1, [Sentence(3, "c")])
+    assert ids(changed) == [1, 3, 2] # Every row got a new position
+    assert [s.position for s in column] == [0.0, POSITION_STEP, 2 * POSITION_STEP]
+    assert [column.row_of(i) for i in (1, 3, 2)] == [0, 1, 2]
+
+
+def test_move_keeps_row_lookup_in_step():
+    column = make_column(5)
+    column.move([0, 1], 3)
+    assert ids(column) == [3, 4, 5, 1, 2]
+    assert all(column.row_of(s.id) == row for row, s in enumerate(column))
+
+
+def test_sorted_rows_keep_manual_order_for_ties():
+    column = SentenceColumn(0, [
+        Sentence(1, "banana", 0, 0.0, uses=2, last_used=10.0),
+        Sentence(2, "Apple", 0, 1.0),
+        Sentence(3, "cherry", 0, 2.0, uses=5, last_used=5.0),
+        Sentence(4, "apple", 0, 3.0),
+        Sentence(5, "date", 0, 4.0, uses=2, last_used=20.0),
+    ])
+    assert column.sorted_rows("manual") == [0, 1, 2, 3, 4]
+    assert column.sorted_rows("most_used") == [2, 0, 4, 1, 3]
+    assert column.sorted_rows("recent") == [4, 0, 2, 1, 3]
+    assert column.sorted_rows("alphabetical") == [1, 3, 0, 2, 4]
+    assert ids(column) == [1, 2, 3, 4, 5]  # Only a view
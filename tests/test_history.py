@@ -0,0 +1,51 @@
+from copycat_core import ClipboardHistory, ClipboardHistoryStore
+
+
+def test_same_text_is_one_entry():
+    history = ClipboardHistory()
+    history.record("hello", now=1.0)
+    entry = history.record("hello", now=2.0)
+    assert len(history) == 1
+    assert (entry.uses, entry.first_seen, entry.last_seen) == (2, 1.0, 2.0)
+    assert entry.key == ClipboardHistory.key_for("hello")
+
+
+def test_blank_and_oversized_copies_are_skipped():
+    history = ClipboardHistory()
+    assert history.record("   ") is None
+    assert history.record("x" * (ClipboardHistory.MAX_ENTRY_BYTES + 1)) is None
+    assert len(history) == 0
+
+
+def test_item_bound_keeps_often_copied_entries():
+    history = ClipboardHistory(max_items=3)
+    for _ in range(3):
+        history.record("favourite")
+    for i in range(5):
+        history.record(f"once {i}")
+    texts = [e.text for e in history.entries()]
+    assert len(texts) == 3
+    assert "favourite" in texts
+    assert texts[0] == "once 4" # Most recent first
+
+
+def test_byte_bound():
+    history = ClipboardHistory(max_bytes=100)
+    for i in range(10):
+        history.record(f"{i}" * 30)
+    assert sum(e.size for e in history.entries()) <= 100
+    assert history.entries()[0].text == "9" * 30
+
+
+def test_store_round_trip(tmp_path):
+    path = str(tmp_path / "history.db")
+    history = ClipboardHistory(ClipboardHistoryStore(path), max_items=2)
+    history.load()
+    for text in ("a", "b", "a", "c"): # "b" is evicted
+        history.record(text)
+    history.store.close()
+
+    reloaded = ClipboardHistory(ClipboardHistoryStore(path))
+    reloaded.load()
+    assert [(e.text, e.uses) for e in reloaded.entries()] == [("c", 1), ("a", 2)]
+    reloaded.store.close()
@@ -0,0 +1,85 @@
+from copycat_core import FrecencyIndex, SearchIndex, Sentence
+
+DAY = 24 * 3600.0
+
+
+def make_index():
+    index = SearchIndex()
+    index.build([
+        (1, "Thanks for your order"),
+        (2, "Order number pending"),
+        (3, "Ordering is closed today"),
+        (4, "Kind regards"),
+    ])
+    return index
+
+
+def test_exact_before_prefix_before_typo():
+    index = make_index()
+    scores = index.search("order")
+    assert scores[1] == scores[2] == SearchIndex.EXACT_SCORE
+    assert scores[3] == SearchIndex.PREFIX_SCORE
+    assert 4 not in scores
+
+    typo = index.search("regardz")
+    assert set(typo) == {4}
+    assert SearchIndex.FUZZY_SCORE < typo[4] < SearchIndex.PREFIX_SCORE
+
+
+def test_every_word_must_match():
+    index = make_index()
+    assert set(index.search("order pend")) == {2}
+    assert index.search("order regards") == {}
+
+
+def test_short_queries_match_nothing():
+    index = make_index()
+    assert index.search("o") is None
+    assert index.search("   ") is None
+
+
+def test_edits_and_deletes_update_in_place():
+    index = make_index()
+    index.add(4, "Order received")  # An edit re-indexes the sentence
+    assert 4 in index.search("order")
+    assert index.search("regards") == {}
+    index.remove(1)
+    assert set(index.search("thanks") or {}) == set()
+    assert set(index.search("order")) == {2, 3, 4}
+
+
+# --- FrecencyIndex ---
+def test_often_and_recently_copied_come_first():
+    now = 100 * DAY
+    frecency = FrecencyIndex()
+    frecency.build([
+        Sentence(1, "old favourite", uses=8, last_used=now - 30 * DAY),
+        Sentence(2, "daily", uses=8, last_used=now),
+        Sentence(3, "once today", uses=1, last_used=now),
+        Sentence(4, "never copied"),
+    ])
+    assert frecency.top(10) == [2, 3, 1]  # A month unused outweighs the copies
+    assert len(frecency) == 3
+
+
+def test_update_and_remove_re_rank():
+    frecency = FrecencyIndex()
+    sentences = [Sentence(i, "", uses=1, last_used=i * DAY) for i in (1, 2, 3)]
+    frecency.build(sentences)
+    assert frecency.top(3) == [3, 2, 1]
+
+    sentences[0].uses, sentences[0].last_used = 2, 4 * DAY
+    frecency.update(sentences[0])
+    assert frecency.top(3) == [1, 3, 2]
+    frecency.remove(3)
+    assert frecency.top(3) == [1, 2]
+    frecency.update(Sentence(5, ""))  # Not copied yet: stays unranked
+    assert frecency.top(3) == [1, 2]
+
+
+def test_best_breaks_score_ties_on_frecency():
+    frecency = FrecencyIndex()
+    frecency.build([Sentence(1, "", uses=1, last_used=DAY), Sentence(2, "", uses=5, last_used=DAY)])
+    scores = {1: 3.0, 2: 3.0, 3: 3.0, 4: 5.0}
+    assert frecency.best(scores, 3) == [4, 2, 1]
+    assert frecency.best({7: 1.0, 8: 2.0}, 5) == [8, 7]
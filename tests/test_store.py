@@ -0,0 +1,44 @@
+from copycat_core import LARGE_TEXT_CHARS, PREVIEW_CHARS, JsonSentenceStore, SqliteSentenceStore
+
+
+def test_large_text_is_stored_out_of_line(tmp_path):
+    path = str(tmp_path / "sentences.db")
+    text = "".join(f"line {i}\n" for i in range(LARGE_TEXT_CHARS))
+    store = SqliteSentenceStore(path)
+    store.load()
+    sentence = store.append(text)
+    try:
+        assert sentence.text == text[:PREVIEW_CHARS]
+        assert sentence.body_size == len(text)
+        assert store.full_text(sentence) == text  # Still queued
+        store.flush()
+        assert store.full_text(sentence) == text  # Read back from disk
+    finally:
+        store.close()
+
+    store = SqliteSentenceStore(path)
+    try:
+        (loaded,) = store.load()
+        assert (loaded.text, loaded.body_size) == (text[:PREVIEW_CHARS], len(text))
+        assert store.full_text(loaded) == text
+
+        store.set_text(loaded, "short again")  # An edit that shrinks it
+        store.save([loaded])
+        store.flush()
+        assert loaded.body_size == 0
+        assert store._read_body(loaded.id) is None
+        (loaded,) = store.load()
+        assert (loaded.text, loaded.body_size) == ("short again", 0)
+    finally:
+        store.close()
+
+
+def test_json_store_keeps_every_text_inline(tmp_path):
+    store = JsonSentenceStore(str(tmp_path / "sentences.json"))
+    store.load()
+    text = "x" * (LARGE_TEXT_CHARS + 1)
+    sentence = store.append(text)
+    store.flush()
+    assert (sentence.text, sentence.body_size) == (text, 0)
+    assert store.load()[0].text == text
+    store.close()
@@ -0,0 +1,61 @@
+import json
+
+from copycat_core import POSITION_STEP, JsonSentenceStore, Sentence, SqliteSentenceStore
+
+
+def test_external_changes_skip_own_writes(tmp_path):
+    path = str(tmp_path / "sentences.db")
+    ours = SqliteSentenceStore(path)
+    ours.load()
+    mine = ours.append("mine")
+    ours.flush()
+
+    theirs = SqliteSentenceStore(path) # Another process on the same file
+    theirs.load()
+    other = theirs.append("theirs")
+    theirs.flush()
+    try:
+        sentences, deleted_ids = ours.external_changes()
+        assert [(s.id, s.text) for s in sentences] == [(other.id, "theirs")]
+        assert deleted_ids == []
+        assert ours.external_changes() == ([], []) # Nothing new since
+
+        theirs.delete([mine.id])
+        theirs.flush()
+        ours.delete([other.id])
+        ours.flush()
+        sentences, deleted_ids = ours.external_changes()
+        assert sentences == []
+        assert deleted_ids == [mine.id]
+    finally:
+        theirs.close()
+        ours.close()
+
+
+def test_json_store_keeps_texts_added_elsewhere(tmp_path):
+    path = str(tmp_path / "sentences.json")
+    ours = JsonSentenceStore(path)
+    ours.load()
+    mine = ours.append("mine", 0)
+    ours.flush()
+
+    theirs = JsonSentenceStore(path)
+    theirs.load()
+    theirs.append("theirs", 1)
+    theirs.append("mine", 0) # The same text again is a new snippet
+    theirs.flush()
+    theirs.close()
+
+    # The window saves its own rows, over their version of the file
+    ours.save([Sentence(ours.new_id(), "mine later", 0, mine.position + POSITION_STEP)])
+    ours.flush()
+    try:
+        with open(path, encoding="utf-8") as f:
+            assert json.load(f) == {"col1": ["mine", "mine", "mine later"], "col2": ["theirs"]}
+        sentences, deleted_ids = ours.external_changes()
+        assert sorted((s.column, s.text) for s in sentences) == [(0, "mine"), (1, "theirs")]
+        assert deleted_ids == []
+        assert len({s.id for s in ours.load()}) == 4
+        assert ours.external_changes() == ([], [])
+    finally:
+        ours.close()
@@ -0,0 +1,58 @@
+import time
+
+from copycat_core import TemplateCache, compile_template
+
+NOW = time.mktime((2026, 3, 5, 14, 7, 0, 0, 0, -1))  # 5 March 2026, 14:07 local time
+
+
+def test_plain_text_and_other_braces_are_not_templates():
+    assert compile_template("plain") is None
+    assert compile_template('{"key": [1, 2]} and {name} and {dates}') is None
+    template = compile_template('{"when": "{date}"}')
+    assert template.expand(NOW) == '{"when": "2026-03-05"}'
+
+
+def test_fields_and_prompts():
+    template = compile_template("{prompt:Name}, ticket {prompt:Ticket} for {prompt:Name}? {prompt}")
+    assert template.fields == {"prompt"}
+    assert template.prompts == ["Name", "Ticket", "Value"]
+    answers = {"Name": "Ada", "Ticket": "42", "Value": "yes"}
+    assert template.expand(NOW, answers=answers) == "Ada, ticket 42 for Ada? yes"
+    assert template.expand(NOW) == ", ticket  for ? "
+
+
+def test_expand_fills_every_field():
+    template = compile_template("{date} {time} {date:%d/%m/%Y} #{counter} #{counter:100} [{clipboard}]")
+    assert template.fields == {"date", "time", "counter", "clipboard"}
+    assert template.prompts == []
+    assert template.expand(NOW, clipboard="copied", counter=3) == "2026-03-05 14:07 05/03/2026 #3 #102 [copied]"
+    assert compile_template("{counter:x}").expand(counter=3) == "3"  # Not a number: ignored
+
+
+def test_doubled_braces_are_literal():
+    template = compile_template("{{date}} is {date}, {{prompt:Name}} stays")
+    assert template.prompts == []
+    assert template.expand(NOW) == "{date} is 2026-03-05, {prompt:Name} stays"
+    assert compile_template("only {{time}}").expand(NOW) == "only {time}"
+
+
+def test_cache_compiles_again_after_an_edit():
+    cache = TemplateCache()
+    first = cache.get(1, "Hi {prompt:Name}")
+    assert cache.get(1, "Hi {prompt:Name}") is first
+    assert cache.get(1, "Bye {prompt:Name}").expand(answers={"Name": "Ada"}) == "Bye Ada"
+    assert cache.get(2, "plain") is None  # Cached too, as None
+    assert len(cache) == 2
+    cache.discard(1)
+    assert len(cache) == 1
+
+
+def test_cache_drops_the_least_recently_copied():
+    cache = TemplateCache()
+    cache.MAX_ITEMS = 2
+    cache.get(1, "{date}")
+    cache.get(2, "{time}")
+    cache.get(1, "{date}")
+    cache.get(3, "{counter}")
+    assert len(cache) == 2
+    assert list(cache._entries) == [1, 3]
@@ -0,0 +1,55 @@
+import json
+
+from copycat_core import BUILTIN_THEMES, DEFAULT_THEME, list_themes, load_theme
+
+
+def write_theme(data_dir, name, data):
+    folder = data_dir / "themes"
+    folder.mkdir(exist_ok=True)
+    (folder / f"{name}.json").write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+
+
+def test_builtin_themes_have_the_same_keys():
+    keys = set(BUILTIN_THEMES[DEFAULT_THEME])
+    for name in BUILTIN_THEMES:
+        colors = load_theme(name)
+        assert colors == BUILTIN_THEMES[name] and set(colors) == keys
+        colors["accent"] = "#000"  # A copy, not the table itself
+    assert BUILTIN_THEMES["dark"]["accent"] != "#000"
+
+
+def test_user_theme_overrides_only_valid_colours(data_dir):
+    light = BUILTIN_THEMES["light"]
+    write_theme(data_dir, "Sunset", {
+        "base": "light",
+        "accent": " #FF8800 ",
+        "card": "#8F00FF00",
+        "text": "orange",  # Not a colour: from the base
+        "window": "#12345",
+        "border": 7,
+        "not_a_key": "#FFFFFF",
+    })
+    colors = load_theme("Sunset")
+    assert set(colors) == set(light)
+    assert (colors["accent"], colors["card"]) == ("#FF8800", "#8F00FF00")
+    assert all(colors[key] == light[key] for key in ("text", "window", "border"))
+
+
+def test_unknown_or_broken_themes_fall_back(data_dir):
+    default = BUILTIN_THEMES[DEFAULT_THEME]
+    write_theme(data_dir, "Broken", "{not json")
+    write_theme(data_dir, "List", ["#FFFFFF"])
+    write_theme(data_dir, "NoBase", {"base": "neon", "accent": "#ABC"})
+    assert load_theme("Missing") == default
+    assert load_theme("Broken") == default
+    assert load_theme("List") == default
+    assert load_theme("../themes/NoBase") == default  # Only names inside THEMES_DIR
+    assert load_theme("NoBase") == dict(default, accent="#ABC")
+
+
+def test_list_themes(data_dir):
+    assert list_themes() == list(BUILTIN_THEMES)
+    for name in ("zebra", "Autumn", "light"):
+        write_theme(data_dir, name, {})
+    (data_dir / "themes" / "notes.txt").write_text("", encoding="utf-8")
+    assert list_themes() == list(BUILTIN_THEMES) + ["Autumn", "zebra"]
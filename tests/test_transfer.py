@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from copycat_core import TransferProgress, content_key, dedup_rows, export_texts, iter_import
+
+ROWS = [(0, "first"), (1, "second, with a comma"), (0, 'a "quoted"\nsecond line')]
+
+
+def test_json_import_takes_the_text_of_rich_snippets(tmp_path):
+    # The JSON library format, as JsonSentenceStore writes it
+    path = tmp_path / "library.json"
+    path.write_text(json.dumps({
+        "col1": ["plain", {"text": "hello", "payload": {"image/png": "abc"}}],
+        "col2": [{"text": "files", "payload": {"text/uri-list": "def"}}],
+    }), encoding="utf-8")
+    assert list(iter_import(str(path))) == [("plain", 0), ("hello", 0), ("files", 1)]
+
+
+@pytest.mark.parametrize("ext", ["csv", "json"])
+def test_export_and_import_round_trip(tmp_path, ext):
+    path = str(tmp_path / f"out.{ext}")
+    assert export_texts(path, ROWS) == 3
+    imported = list(iter_import(path))
+    if ext == "json": # Grouped by column, like the library file
+        assert imported == [(ROWS[0][1], 0), (ROWS[2][1], 0), (ROWS[1][1], 1)]
+    else:
+        assert imported == [(text, column) for column, text in ROWS]
+
+
+def test_text_round_trip_joins_lines(tmp_path):
+    path = str(tmp_path / "out.txt")
+    export_texts(path, ROWS)
+    assert list(iter_import(path)) == [
+        ("first", None), ("second, with a comma", None), ('a "quoted" second line', None)]
+
+
+def test_import_skips_blank_lines_and_reads_headerless_csv(tmp_path):
+    txt = tmp_path / "in.txt"
+    txt.write_bytes(b"\xef\xbb\xbfone\r\n\n   \ntwo\n")
+    assert list(iter_import(str(txt))) == [("one", None), ("two", None)]
+
+    csv = tmp_path / "in.csv"
+    csv.write_text("hello,x\nworld,y\n", encoding="utf-8")
+    assert list(iter_import(str(csv))) == [("hello", None), ("world", None)]
+
+    csv.write_text("id,Text,Column\n1,left,1\n2,right,2\n3,nowhere,7\n", encoding="utf-8")
+    assert list(iter_import(str(csv))) == [("left", 0), ("right", 1), ("nowhere", None)]
+
+
+def test_dedup_skips_known_and_repeated_texts():
+    seen = {content_key("old")}
+    rows = [("old", 0), ("new", 0), ("new", 1), ("other", None)]
+    assert list(dedup_rows(rows, seen)) == [("new", 0), ("other", None)]
+    assert content_key("new") in seen
+
+
+def test_cancelled_export_writes_nothing(tmp_path):
+    path = tmp_path / "out.json"
+    progress = TransferProgress()
+    progress.cancelled = True
+    assert export_texts(str(path), ROWS, progress=progress) is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,58 @@
+from copycat_core import POSITION_STEP, Sentence, SentenceColumn, UndoStack
+
+
+def make_column(count):
+    return SentenceColumn(0, [Sentence(i, f"s{i}", 0, i * POSITION_STEP) for i in range(1, count + 1)])
+
+
+def ids(column):
+    return [s.id for s in column]
+
+
+def locations(column, sentence_ids):
+    """Undo states in the shape MainWindow.location_states() gives."""
+    return {i: (column.column_index, column.row_of(i), None, None, None, None) for i in sentence_ids}
+
+
+def move_to(column, states):
+    """Puts each sentence back at the row of its state, like apply_row_states()."""
+    for sentence_id, state in sorted(states.items(), key=lambda item: item[1][1]):
+        column.move([column.row_of(sentence_id)], state[1])
+
+
+def test_repeated_moves_merge_and_undo_redo():
+    column, undo = make_column(5), UndoStack(max_bytes=1 << 20)
+    for target in (1, 2, 3): # Moving sentence 1 down one row at a time
+        before = locations(column, [1])
+        column.move([column.row_of(1)], target)
+        undo.push("Move", before, locations(column, [1]), merge_key=("move", frozenset(before)))
+    assert len(undo) == 1
+    assert ids(column) == [2, 3, 4, 1, 5]
+
+    move_to(column, undo.undo().before)
+    assert ids(column) == [1, 2, 3, 4, 5]
+    assert undo.undo() is None
+
+    move_to(column, undo.redo().after)
+    assert ids(column) == [2, 3, 4, 1, 5]
+    assert undo.redo() is None
+
+
+def test_move_back_to_the_start_leaves_no_step():
+    undo = UndoStack(max_bytes=1 << 20)
+    key = ("move", frozenset([1]))
+    undo.push("Move", {1: (0, 0, None, None, None, None)}, {1: (0, 1, None, None, None, None)}, merge_key=key)
+    undo.push("Move", {1: (0, 1, None, None, None, None)}, {1: (0, 0, None, None, None, None)}, merge_key=key)
+    assert len(undo) == 0
+    assert undo.undo_label() is None
+
+
+def test_oldest_steps_go_over_the_memory_cap():
+    undo = UndoStack(max_bytes=4000)
+    for i in range(20):
+        assert undo.push(f"Edit {i}", {i: (0, i, "x" * 100, 0, 0.0, None)}, {i: (0, i, "y" * 100, 0, 0.0, None)})
+    assert 0 < len(undo) < 20
+    assert undo.bytes <= 4000
+    assert undo.undo_label() == "Edit 19"
+    assert not undo.push("Huge", {0: None}, {0: (0, 0, "z" * 10000, 0, 0.0, None)})
+    assert len(undo) == 0